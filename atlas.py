@@ -0,0 +1,52 @@
+import numpy as np
+
+# Empacotamento de várias imagens em poucas texturas grandes (atlas), por prateleiras:
+# as imagens são ordenadas pela altura e colocadas lado a lado em faixas horizontais.
+# Cada imagem ganha uma margem com as bordas replicadas para o filtro linear não
+# misturar texels das vizinhas.
+
+MARGEM = 2
+
+def empacotar(tamanhos, lado, margem=MARGEM):
+    # tamanhos: {nome: (largura, altura)}. Devolve (paginas, fora), onde cada página é
+    # {"largura", "altura", "posicoes": {nome: (x, y)}} com (x, y) no canto do conteúdo,
+    # e fora lista os nomes que não cabem numa página de lado x lado
+    ordem = sorted(tamanhos, key=lambda n: (-tamanhos[n][1], -tamanhos[n][0], n))
+    paginas, fora = [], []
+    pagina, x, y, altura_faixa = None, 0, 0, 0
+
+    for nome in ordem:
+        w, h = tamanhos[nome]
+        W, H = w + 2 * margem, h + 2 * margem
+        if W > lado or H > lado:
+            fora.append(nome)
+            continue
+        if pagina is not None and x + W > lado:
+            x, y, altura_faixa = 0, y + altura_faixa, 0
+        if pagina is None or y + H > lado:
+            pagina = {"largura": 0, "altura": 0, "posicoes": {}}
+            paginas.append(pagina)
+            x, y, altura_faixa = 0, 0, 0
+
+        pagina["posicoes"][nome] = (x + margem, y + margem)
+        x += W
+        altura_faixa = max(altura_faixa, H)
+        pagina["largura"] = max(pagina["largura"], x)
+        pagina["altura"] = max(pagina["altura"], y + altura_faixa)
+
+    return paginas, fora
+
+def uv(pagina, nome, tamanho):
+    # Retângulo (u0, v0, du, dv) da imagem dentro da página, para a matriz de textura
+    x, y = pagina["posicoes"][nome]
+    W, H = pagina["largura"], pagina["altura"]
+    return x / W, y / H, tamanho[0] / W, tamanho[1] / H
+
+def compor(pagina, imagens, margem=MARGEM):
+    # imagens: {nome: array (altura, largura, 4)} -> array da página inteira
+    saida = np.zeros((pagina["altura"], pagina["largura"], 4), dtype=np.uint8)
+    for nome, img in imagens.items():
+        x, y = pagina["posicoes"][nome]
+        h, w = img.shape[:2]
+        saida[y - margem:y + h + margem, x - margem:x + w + margem] = np.pad(img, ((margem, margem), (margem, margem), (0, 0)), mode="edge")
+    return saida
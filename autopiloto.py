@@ -0,0 +1,107 @@
+import numpy as np
+import meteoros
+import simulacao
+
+# Piloto automático. Mantém um mapa de perigo expandido no tempo, perigo[camada, z, x] =
+# casa ocupada daqui a h+1 passos, projetado do dx/dz de cada meteoro (os que ainda vão
+# nascer não entram). O mapa é um anel de camadas: a cada passo só a camada que venceu
+# é refeita para o fim do horizonte e os meteoros novos são marcados em todas, sem
+# reconstruir tudo. Depois uma programação dinâmica numa janela em volta da nave dá por
+# quantos passos cada casa continua viva, e a nave vai para a vizinha que dura mais.
+# Um movimento por passo, como um jogador.
+
+HORIZONTE = 12   # passos olhados à frente (2,4 s)
+ACOES = ((), (simulacao.ESQUERDA,), (simulacao.DIREITA,), (simulacao.CIMA,), (simulacao.BAIXO,))
+# Deslocamento (dx, dz) de cada ação; ficar parado vem primeiro e ganha os empates
+DESLOCAMENTOS = ((0, 0),) + tuple(simulacao.MOVIMENTOS[a[0]] for a in ACOES[1:])
+
+def novo(horizonte=HORIZONTE):
+    return {"h": horizonte, "perigo": None, "base": 0, "tempo": None, "vistos": 0}
+
+def _marcar(ap, x, z, dx, dz, passos):
+    # Marca as casas ocupadas daqui a cada k de passos (k >= 1) pelos meteoros dados
+    perigo, h = ap["perigo"], ap["h"]
+    _, rows, cols = perigo.shape
+    k = np.asarray(passos)[:, None]
+    px, pz = x[None, :] + dx[None, :] * k, z[None, :] + dz[None, :] * k
+    camada = np.broadcast_to((ap["base"] + k - 1) % h, px.shape)
+    dentro = (px >= 0) & (px < cols) & (pz >= 0) & (pz < rows)
+    perigo[camada[dentro], pz[dentro], px[dentro]] = True
+
+def atualizar(ap, jogo):
+    m, h = jogo["meteoros"], ap["h"]
+    forma = (h, jogo["rows"], jogo["cols"])
+    passos = None if ap["tempo"] is None else (jogo["tempo"] - ap["tempo"]) // simulacao.PASSO_MS
+    if passos == 0: return
+    novos = m["adicionados"] - ap["vistos"]
+    x, z, dx, dz = meteoros.vivos(m)
+
+    if passos == 1 and ap["perigo"] is not None and ap["perigo"].shape == forma and novos <= m["n"]:
+        # Um passo: a camada do passo que acabou de acontecer vira a do fim do horizonte.
+        # Meteoros descartados já estavam fora do tabuleiro e só se afastam dele.
+        ap["base"] += 1
+        ap["perigo"][(ap["base"] + h - 1) % h] = False
+        _marcar(ap, x, z, dx, dz, [h])
+        # Os que nasceram neste passo estão no fim dos arrays (adicionar vem depois de descartar)
+        if novos:
+            _marcar(ap, x[-novos:], z[-novos:], dx[-novos:], dz[-novos:], np.arange(1, h + 1))
+    else:
+        if ap["perigo"] is None or ap["perigo"].shape != forma:
+            ap["perigo"] = np.zeros(forma, dtype=bool)
+        else:
+            ap["perigo"].fill(False)
+        ap["base"] = 0
+        _marcar(ap, x, z, dx, dz, np.arange(1, h + 1))
+    ap["tempo"], ap["vistos"] = jogo["tempo"], m["adicionados"]
+
+def profundidade(ap, jogo):
+    # Janela (2h+1)^2 centrada na nave com, para cada casa, por quantos passos dá para
+    # continuar vivo a partir dela (h = o horizonte inteiro); fora do tabuleiro = 0
+    perigo, h = ap["perigo"], ap["h"]
+    _, rows, cols = perigo.shape
+    sx, sz = jogo["ship_x"], jogo["ship_z"]
+    lado = 2 * h + 1
+    x0, z0 = sx - h, sz - h
+    bx0, bx1 = max(0, x0), min(cols, x0 + lado)
+    bz0, bz1 = max(0, z0), min(rows, z0 + lado)
+
+    # livre com uma borda extra de casas mortas para os deslocamentos não darem a volta
+    livre = np.zeros((h, lado + 2, lado + 2), dtype=bool)
+    camadas = (ap["base"] + np.arange(h)) % h
+    livre[:, bz0 - z0 + 1:bz1 - z0 + 1, bx0 - x0 + 1:bx1 - x0 + 1] = ~perigo[camadas, bz0:bz1, bx0:bx1]
+
+    prof = np.zeros((lado + 2, lado + 2), dtype=np.int16)
+    melhor = np.empty_like(prof)
+    for camada in range(h - 1, -1, -1):
+        # Melhor vizinha (ou a própria casa) no passo seguinte
+        melhor.fill(0)
+        c = melhor[1:-1, 1:-1]
+        np.maximum(prof[1:-1, 1:-1], prof[1:-1, :-2], out=c)
+        np.maximum(c, prof[1:-1, 2:], out=c)
+        np.maximum(c, prof[:-2, 1:-1], out=c)
+        np.maximum(c, prof[2:, 1:-1], out=c)
+        prof = np.where(livre[camada], melhor + 1, 0).astype(np.int16)
+    return prof[1:-1, 1:-1]
+
+def decidir(ap, jogo):
+    # Chamado a cada tick (loop_jogo) ou passo (simulacao.simular); planeja uma vez por passo
+    if jogo["state"] != "jogando" or jogo["tempo"] == ap["tempo"]: return ()
+    atualizar(ap, jogo)
+    prof, h = profundidade(ap, jogo), ap["h"]
+    sx, sz = jogo["ship_x"], jogo["ship_z"]
+    melhor, escolha = None, ()
+    for acao, (dx, dz) in zip(ACOES, DESLOCAMENTOS):
+        # Para fora do tabuleiro a nave não se move: vale o mesmo que ficar parado
+        if not (0 <= sx + dx < jogo["cols"] and 0 <= sz + dz < jogo["rows"]): continue
+        cz, cx = h + dz, h + dx
+        # Empate na profundidade: a casa com mais saídas boas (cantos e bordas prendem a nave)
+        folga = int(prof[cz, cx]) + sum(int(prof[cz + vz, cx + vx]) for vx, vz in DESLOCAMENTOS[1:]
+                                       if 0 <= cz + vz < prof.shape[0] and 0 <= cx + vx < prof.shape[1])
+        valor = (prof[cz, cx], folga)
+        if melhor is None or valor > melhor: melhor, escolha = valor, acao
+    return escolha
+
+def politica(horizonte=HORIZONTE):
+    # Política para simulacao.simular / calibrar.py, e para o modo automático do jogo
+    ap = novo(horizonte)
+    return lambda jogo: decidir(ap, jogo)
@@ -0,0 +1,443 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+# Benchmark reproduzível de renderização. Abre um contexto GL escondido
+# (SDL offscreen + EGL; com --software força o Mesa llvmpipe), roda cada cenário
+# por um número fixo de quadros com semente e relógio fixos e grava JSON.
+#
+#   python benchmark.py --quadros 300 --saida bench.json
+#   python benchmark.py --baseline bench_base.json --limite 15   # falha se piorar >15%
+#   python benchmark.py --alocacoes --orcamento-alocacoes 16      # falha se um quadro alocar mais
+
+CENARIOS = ("menu", "cenario", "jogo_nivel1", "jogo_nivel2", "jogo_nivel3", "mapa",
+            "estresse_300", "estresse_1000", "tabuleiro_64_1000", "tabuleiro_256_5000", "tabuleiro_512_20000")
+DT_FIXO = 16   # ms por quadro entregues ao jogo, independente do tempo real
+DISPLAY = (1280, 720)
+ORCAMENTO_ALOCACOES_KB = 16.0   # pico alocado dentro de um quadro (p95) no regime estável
+# Cenários com orçamento por quadro; nos de estresse os arrays crescem com o número de
+# meteoros e o pico só é relatado (o crescimento vale para todos)
+CENARIOS_ORCAMENTO = ("menu", "cenario", "jogo_nivel1", "jogo_nivel2", "jogo_nivel3", "mapa")
+CRESCIMENTO_MAX_B = 64.0        # memória que continua viva, por quadro, depois do aquecimento
+
+def ler_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de renderização do Space Dodge")
+    parser.add_argument("--cenarios", nargs="+", default=list(CENARIOS), choices=CENARIOS)
+    parser.add_argument("--quadros", type=int, default=300, help="quadros medidos por cenário")
+    parser.add_argument("--aquecimento", type=int, default=20, help="quadros descartados no início")
+    parser.add_argument("--semente", type=int, default=1234)
+    parser.add_argument("--modulo", default="game", choices=("game", "b2"), help="variante do jogo")
+    parser.add_argument("--resolucao", type=int, nargs=2, default=DISPLAY)
+    parser.add_argument("--software", action="store_true", help="força o rasterizador de software do Mesa")
+    parser.add_argument("--janela", action="store_true", help="usa uma janela visível em vez de offscreen")
+    parser.add_argument("--sem-contagem", action="store_true", help="não mede chamadas GL por quadro")
+    parser.add_argument("--orcamento-texturas", type=float, metavar="MB", help="limite de memória de textura")
+    # Mesmas opções de opcoes.py, sem importá-lo (ele importa o OpenGL antes de _preparar_ambiente)
+    parser.add_argument("--render", default="fixo", choices=("fixo", "shader"), help="backend de desenho")
+    parser.add_argument("--cache-fundo", action="store_true", help="cenário de fundo numa textura (cache_fundo.py)")
+    parser.add_argument("--cache-fundo-escala", type=float, default=0.5, help="resolução do cache (fração da janela)")
+    parser.add_argument("--cache-fundo-hz", type=float, default=20.0, help="atualizações do cache por segundo")
+    parser.add_argument("--saida", help="arquivo JSON com o resultado (padrão: stdout)")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--limite", type=float, default=10.0, help="piora máxima aceita em %% (p50/p95)")
+    parser.add_argument("--alocacoes", action="store_true",
+                        help="passagem extra com tracemalloc: quanto cada quadro aloca e quanto fica vivo; "
+                             "falha se passar do orçamento")
+    parser.add_argument("--orcamento-alocacoes", type=float, default=ORCAMENTO_ALOCACOES_KB, metavar="KB",
+                        help="pico alocado num quadro (p95) aceito com --alocacoes nos cenários sem estresse")
+    parser.add_argument("--aquecimento-alocacoes", type=int, default=100,
+                        help="quadros antes de medir as alocações (caches de texto e de malhas enchendo)")
+    return parser.parse_args(argv)
+
+def _preparar_ambiente(args):
+    # Precisa acontecer antes de importar pygame/OpenGL
+    if not args.janela:
+        os.environ.setdefault("SDL_VIDEODRIVER", "offscreen")
+        os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+    if args.software:
+        os.environ["LIBGL_ALWAYS_SOFTWARE"] = "1"
+        os.environ.setdefault("GALLIUM_DRIVER", "llvmpipe")
+
+# --- Controle dos quadros -------------------------------------------------------
+
+def _instalar_flip(execucao):
+    import pygame
+    from OpenGL.GL import glFinish
+    original = pygame.display.flip
+
+    def flip():
+        original()
+        glFinish()
+        t = time.perf_counter()
+        k = execucao["quadro"]
+        if k > execucao["aquecimento"]:
+            execucao["tempos"].append((t - execucao["t"]) * 1000.0)
+        execucao["t"] = t
+        execucao["quadro"] = k + 1
+        if execucao["medidor"]: execucao["medidor"](k)
+        if execucao["roteiro"]: execucao["roteiro"](k)
+        if execucao["quadro"] == execucao["total"]:
+            execucao["parar"] = True
+            pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_ESCAPE))
+
+    pygame.display.flip = flip
+    return original
+
+def _contar_chamadas(modulos, contador):
+    # Troca cada gl*/glu* importado nos módulos por um wrapper que conta as chamadas
+    originais = []
+    for mod in modulos:
+        for nome in dir(mod):
+            if not nome.startswith("gl"): continue
+            func = getattr(mod, nome)
+            if not callable(func) or isinstance(func, type): continue
+            def contar(*a, _f=func, **k):
+                contador[0] += 1
+                return _f(*a, **k)
+            originais.append((mod, nome, func))
+            setattr(mod, nome, contar)
+    return originais
+
+def _restaurar(originais):
+    for mod, nome, func in originais:
+        setattr(mod, nome, func)
+
+# --- Cenários ---------------------------------------------------------------
+
+def _relogio():
+    return SimpleNamespace(tick=lambda fps=0: DT_FIXO)
+
+def _camera_jogo(display):
+    from OpenGL.GL import glClear, GL_COLOR_BUFFER_BIT, GL_DEPTH_BUFFER_BIT
+    import render
+    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+    render.camera(display, 45, 0.1, 200.0, (0, 30, 50), (0, 0, 0))
+
+def _cenario_menu(ctx, execucao):
+    ctx.menu.executar(ctx.display, _relogio())
+
+def _cenario_fundo(ctx, execucao):
+    import pygame
+    tempo = 0
+    while not execucao["parar"]:
+        pygame.event.pump()
+        tempo += DT_FIXO * ctx.fundo.TEMPO_POR_MS
+        _camera_jogo(ctx.display)
+        ctx.cache_fundo.desenhar(tempo, DT_FIXO, ctx.display)
+        pygame.display.flip()
+
+def _cenario_jogo(nivel):
+    def rodar(ctx, execucao):
+        import pygame
+        rng = random.Random(ctx.semente)
+        teclas = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN)
+        def roteiro(k):
+            if k % 12 == 0: pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=rng.choice(teclas)))
+        execucao["roteiro"] = roteiro
+        # Duração longa: o cenário termina pelo número de quadros, não pelo cronômetro
+        ctx.jogo.loop_jogo(ctx.display, 3600, nivel, ctx.semente, _relogio())
+    return rodar
+
+def _cenario_mapa(ctx, execucao):
+    import pygame
+    # Trajeto fixo da câmera: esquerda, frente, direita, sobe; repete
+    trajeto = (pygame.K_LEFT, pygame.K_UP, pygame.K_RIGHT, pygame.K_s)
+    teclas = defaultdict(bool)
+    def roteiro(k):
+        teclas.clear()
+        teclas[trajeto[(k // 60) % len(trajeto)]] = True
+    execucao["roteiro"] = roteiro
+    get_pressed = pygame.key.get_pressed
+    pygame.key.get_pressed = lambda: teclas
+    try:
+        ctx.jogo.visualizar_mapa(ctx.display, _relogio())
+    finally:
+        pygame.key.get_pressed = get_pressed
+
+def _cenario_estresse(n):
+    def rodar(ctx, execucao):
+        import pygame
+        import numpy as np
+        from OpenGL.GL import glEnable, glDisable, GL_TEXTURE_2D
+        import detalhe, render
+        rng = np.random.default_rng(ctx.semente)
+        gx = rng.integers(-4, ctx.jogo.COLS + 4, n)
+        gz = rng.integers(0, 64, n)
+        celula = ctx.jogo.getposition(1, 0)[0] - ctx.jogo.getposition(0, 0)[0]
+        tempo = 0
+        while not execucao["parar"]:
+            pygame.event.pump()
+            tempo += DT_FIXO * ctx.fundo.TEMPO_POR_MS
+            _camera_jogo(ctx.display)
+            ctx.cache_fundo.desenhar(tempo, DT_FIXO, ctx.display)
+            ctx.fundo.desenhar_grade(ctx.jogo.COLS, ctx.jogo.ROWS, celula, ctx.jogo.GRID_Y)
+            glEnable(GL_TEXTURE_2D)
+            z = (gz - execucao["quadro"]) % 64 - 32
+            posicoes = ctx.jogo.getposition_lote(gx, z)
+            niveis = detalhe.escolher(detalhe.raio_projetado(posicoes, 1.0, *render.matrizes_camera()))
+            ctx.instancias.desenhar_meteoros(posicoes, ctx.fundo.METEORO_CFG["id"], niveis=niveis)
+            glDisable(GL_TEXTURE_2D)
+            pygame.display.flip()
+    return rodar
+
+def _cenario_tabuleiro(lado, n):
+    # Partida de nível 3 num tabuleiro lado x lado que já começa com n meteoros espalhados
+    # (encher pela simulação levaria minutos); a nave fica parada e nenhum deles passa
+    # pela coluna nem pela linha dela, então a partida não acaba durante a medição
+    def rodar(ctx, execucao):
+        import numpy as np
+        import meteoros, simulacao
+        nova_partida = simulacao.nova_partida
+        partidas = []
+        def povoada(*a, **k):
+            jogo = nova_partida(*a, **k)
+            rng = np.random.default_rng(ctx.semente)
+            vertical = rng.random(n) < 0.5
+            x = rng.integers(0, lado, n)
+            z = rng.integers(1, lado, n)
+            x[vertical & (x == jogo["ship_x"])] += 1
+            meteoros.adicionar(jogo["meteoros"], x % lado, z, np.where(vertical, 0, rng.choice((-1, 1), n)),
+                               np.where(vertical, -1, 0))
+            partidas.append(jogo)
+            return jogo
+        simulacao.nova_partida = povoada
+        try:
+            ctx.jogo.loop_jogo(ctx.display, 3600, 3, ctx.semente, _relogio(), cols=lado, rows=lado)
+        finally:
+            simulacao.nova_partida = nova_partida
+        execucao["extra"] = {"tabuleiro": [lado, lado], "meteoros": int(partidas[-1]["meteoros"]["n"])}
+    return rodar
+
+EXECUTORES = {
+    "menu": _cenario_menu,
+    "cenario": _cenario_fundo,
+    "jogo_nivel1": _cenario_jogo(1),
+    "jogo_nivel2": _cenario_jogo(2),
+    "jogo_nivel3": _cenario_jogo(3),
+    "mapa": _cenario_mapa,
+    "estresse_300": _cenario_estresse(300),
+    "estresse_1000": _cenario_estresse(1000),
+    "tabuleiro_64_1000": _cenario_tabuleiro(64, 1000),
+    "tabuleiro_256_5000": _cenario_tabuleiro(256, 5000),
+    "tabuleiro_512_20000": _cenario_tabuleiro(512, 20000),
+}
+
+def _rodar(ctx, nome, quadros, aquecimento, medidor=None):
+    import pygame
+    random.seed(ctx.semente)
+    execucao = {"quadro": 0, "total": aquecimento + quadros + 1, "aquecimento": aquecimento,
+                "tempos": [], "t": time.perf_counter(), "roteiro": None, "medidor": medidor,
+                "parar": False, "extra": {}}
+    original = _instalar_flip(execucao)
+    try:
+        EXECUTORES[nome](ctx, execucao)
+    finally:
+        pygame.display.flip = original
+        pygame.event.clear()
+    return execucao
+
+def _medidor_alocacoes(quadros, aquecimento):
+    # Chamado depois de cada flip. O tracemalloc liga no fim do aquecimento; em cada
+    # quadro medido guarda o pico alocado acima do que estava vivo no começo dele. O
+    # crescimento compara o meio e o fim da janela: o que o último quadro ainda segura
+    # aparece nos dois e se cancela. Antes de cada snapshot uma coleta completa esvazia
+    # as free lists do Python (as tuplas dos wrappers do PyOpenGL levam centenas de
+    # quadros para encher e pareceriam crescimento); ela não entra na contagem do gc
+    import gc
+    import tracemalloc
+    import numpy as np
+    m = {"picos": np.zeros(quadros), "n": 0, "inicio": 0, "gc": [0, 0, 0], "base": None, "meio": None, "vivos": None}
+    def coletas():
+        atual = [s["collections"] for s in gc.get_stats()]
+        m["gc"] = [g + a - b for g, a, b in zip(m["gc"], atual, m["base"])]
+    def snapshot():
+        coletas()
+        gc.collect()
+        m["base"] = [s["collections"] for s in gc.get_stats()]
+        return tracemalloc.take_snapshot()
+    def medidor(k):
+        if k == aquecimento:
+            m["base"] = [s["collections"] for s in gc.get_stats()]
+            tracemalloc.start()
+            m["inicio"] = tracemalloc.get_traced_memory()[0]
+        elif k > aquecimento and m["n"] < quadros:
+            atual, pico = tracemalloc.get_traced_memory()
+            m["picos"][m["n"]] = pico - m["inicio"]
+            m["n"] += 1
+            m["inicio"] = atual
+            tracemalloc.reset_peak()
+            if m["n"] == quadros // 2:
+                m["meio"] = snapshot()
+                tracemalloc.reset_peak()
+                m["inicio"] = tracemalloc.get_traced_memory()[0]
+            if m["n"] == quadros:
+                # Fora o próprio tracemalloc e este arquivo (a lista de tempos do benchmark)
+                m["vivos"] = [v for v in snapshot().compare_to(m["meio"], "lineno")
+                              if v.traceback[0].filename not in (tracemalloc.__file__, __file__)]
+                tracemalloc.stop()
+    return m, medidor
+
+def _alocacoes(ctx, nome, quadros, aquecimento):
+    import tracemalloc
+    import numpy as np
+    m, medidor = _medidor_alocacoes(quadros, aquecimento)
+    try:
+        _rodar(ctx, nome, quadros, aquecimento, medidor)
+    finally:
+        tracemalloc.stop()
+    picos = m["picos"][:m["n"]] / 1024.0
+    vivos = m["vivos"] or []
+    metade = max(1, m["n"] - m["n"] // 2)
+    return {
+        "quadros": m["n"],
+        "pico_kb": {"p50": float(np.percentile(picos, 50)), "p95": float(np.percentile(picos, 95)),
+                    "max": float(picos.max())},
+        "crescimento_b_por_quadro": sum(v.size_diff for v in vivos) / metade,
+        "coletas_gc_por_1000_quadros": [1000.0 * c / max(1, m["n"]) for c in m["gc"]],
+        "origens_crescimento": [f"{v.traceback[0].filename}:{v.traceback[0].lineno} {v.size_diff:+d} B"
+                                for v in vivos[:5]],
+    }
+
+def _resumo(tempos):
+    import numpy as np
+    t = np.asarray(tempos)
+    return {
+        "fps": float(1000.0 / t.mean()),
+        "ms": {"media": float(t.mean()), "p50": float(np.percentile(t, 50)),
+               "p95": float(np.percentile(t, 95)), "p99": float(np.percentile(t, 99)),
+               "max": float(t.max())},
+    }
+
+def medir(args):
+    import pygame
+    from pygame.locals import DOUBLEBUF, OPENGL
+    pygame.init()
+    display = tuple(args.resolucao)
+    pygame.display.set_mode(display, DOUBLEBUF | OPENGL)
+
+    from OpenGL.GL import glGetString, GL_RENDERER, GL_VERSION
+    import cache_fundo, fundo, menu, texto, instancias, perfil, render, texturas
+    jogo = __import__(args.modulo)
+    render.iniciar(args.render)
+    cache_fundo.configurar(args.cache_fundo, args.cache_fundo_escala, args.cache_fundo_hz)
+    fundo.init_opengl()
+    t = time.perf_counter()
+    fundo.init_all_textures(orcamento_mb=args.orcamento_texturas)
+    inicio_ms = (time.perf_counter() - t) * 1000.0
+    # Os cenários medem o regime estável: todas as texturas já na GPU
+    texturas.esperar()
+    texturas_ms = (time.perf_counter() - t) * 1000.0
+
+    ctx = SimpleNamespace(display=display, semente=args.semente, fundo=fundo, menu=menu,
+                          jogo=jogo, instancias=instancias, cache_fundo=cache_fundo)
+    resultado = {
+        "ambiente": {
+            "renderer": glGetString(GL_RENDERER).decode(),
+            "versao_gl": glGetString(GL_VERSION).decode(),
+            "python": platform.python_version(),
+            "modulo": args.modulo, "resolucao": list(display),
+            "render": "shader" if render.programavel() else "fixo",
+            "cache_fundo": ({"escala": args.cache_fundo_escala, "hz": args.cache_fundo_hz}
+                            if cache_fundo.ativo() else None),
+            "quadros": args.quadros, "semente": args.semente,
+        },
+        "inicio": {"init_texturas_ms": inicio_ms, "todas_texturas_ms": texturas_ms},
+        "texturas": texturas.relatorio(),
+        "cenarios": {},
+    }
+
+    for nome in args.cenarios:
+        execucao = _rodar(ctx, nome, args.quadros, args.aquecimento)
+        r = _resumo(execucao["tempos"])
+        r["quadros"] = len(execucao["tempos"])
+        r.update(execucao["extra"])
+
+        if not args.sem_contagem:
+            # Passagem separada e curta: os wrappers distorcem o tempo
+            contador = [0]
+            originais = _contar_chamadas([cache_fundo, fundo, menu, texto, instancias, perfil, render, jogo], contador)
+            perfil.ativar(gpu=False)
+            try:
+                curta = _rodar(ctx, nome, 30, 5)
+            finally:
+                _restaurar(originais)
+            r["chamadas_gl_por_quadro"] = contador[0] / max(1, curta["quadro"])
+            r["triangulos_por_quadro"] = perfil.total_contador("triangulos") / max(1, curta["quadro"])
+            perfil.desativar()
+
+        if args.alocacoes:
+            # Outra passagem: o tracemalloc deixa tudo várias vezes mais lento
+            r["alocacoes"] = _alocacoes(ctx, nome, args.quadros, args.aquecimento_alocacoes)
+            a = r["alocacoes"]
+            print(f"{'':<14} alocações: pico/quadro p50 {a['pico_kb']['p50']:6.1f} KB  p95 {a['pico_kb']['p95']:6.1f} KB  "
+                  f"crescimento {a['crescimento_b_por_quadro']:6.1f} B/quadro  "
+                  f"coletas do gc/1000 quadros {a['coletas_gc_por_1000_quadros']}", file=sys.stderr)
+
+        resultado["cenarios"][nome] = r
+        print(f"{nome:<14} {r['fps']:8.1f} fps  p50 {r['ms']['p50']:7.2f} ms  p95 {r['ms']['p95']:7.2f} ms"
+              + (f"  {r['chamadas_gl_por_quadro']:8.0f} chamadas GL/quadro  {r['triangulos_por_quadro']:8.0f} triângulos/quadro"
+                 if "chamadas_gl_por_quadro" in r else ""),
+              file=sys.stderr)
+
+    texturas.encerrar()
+    pygame.quit()
+    return resultado
+
+def comparar(resultado, baseline, limite):
+    regressoes = []
+    for nome, r in resultado["cenarios"].items():
+        base = baseline.get("cenarios", {}).get(nome)
+        if not base: continue
+        for metrica in ("p50", "p95"):
+            atual, antes = r["ms"][metrica], base["ms"][metrica]
+            if atual > antes * (1 + limite / 100.0):
+                regressoes.append(f"{nome}: {metrica} {antes:.2f} ms -> {atual:.2f} ms (+{(atual/antes - 1)*100:.1f}%)")
+    return regressoes
+
+def excessos_alocacao(resultado, orcamento_kb):
+    excessos = []
+    for nome, r in resultado["cenarios"].items():
+        a = r.get("alocacoes")
+        if not a: continue
+        if nome in CENARIOS_ORCAMENTO and a["pico_kb"]["p95"] > orcamento_kb:
+            excessos.append(f"{nome}: pico por quadro p95 {a['pico_kb']['p95']:.1f} KB > {orcamento_kb:.1f} KB")
+        if a["crescimento_b_por_quadro"] > CRESCIMENTO_MAX_B:
+            excessos.append(f"{nome}: {a['crescimento_b_por_quadro']:.0f} B/quadro continuam vivos "
+                            f"(> {CRESCIMENTO_MAX_B:.0f}): " + "; ".join(a["origens_crescimento"]))
+    return excessos
+
+def main(argv=None):
+    args = ler_argumentos(argv)
+    _preparar_ambiente(args)
+    resultado = medir(args)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressoes = comparar(resultado, json.load(f), args.limite)
+        resultado["regressoes"] = regressoes
+    if args.alocacoes:
+        resultado["excessos_alocacao"] = excessos_alocacao(resultado, args.orcamento_alocacoes)
+
+    saida = json.dumps(resultado, indent=2)
+    if args.saida:
+        with open(args.saida, "w") as f: f.write(saida)
+    else:
+        print(saida)
+
+    falhou = False
+    for r in resultado.get("regressoes", []):
+        print(f"REGRESSÃO {r}", file=sys.stderr)
+        falhou = True
+    for e in resultado.get("excessos_alocacao", []):
+        print(f"ALOCAÇÃO {e}", file=sys.stderr)
+        falhou = True
+    return 1 if falhou else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
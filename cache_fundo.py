@@ -0,0 +1,221 @@
+from OpenGL.GL import *
+import numpy as np
+import fundo
+import render
+
+# Cache do sistema solar numa textura. O cenário de fundo (sol, planetas, lua e anéis)
+# é desenhado num FBO com resolução reduzida e só é refeito algumas vezes por segundo;
+# nos outros quadros a cor e a profundidade guardadas são copiadas para a tela, e a
+# grade, os meteoros e o HUD são desenhados por cima com o teste de profundidade certo.
+# A cópia não é um quad de tela cheia: só os retângulos de tela dos corpos desenhados,
+# porque fora deles o cache tem o mesmo fundo limpo que a tela já tem (em rasterizador
+# de software a tela cheia custava mais que as próprias esferas).
+# Com a câmera andando (mapa) o cache seria refeito todo quadro, então enquanto ela se
+# move o cenário é desenhado direto na tela, e o cache volta quando ela para.
+#
+# Desligado por padrão (--cache-fundo). Precisa de OpenGL 3.3 para o FBO e o shader
+# que escreve a profundidade; sem isso desenhar() desenha o cenário direto, como antes.
+
+ESCALA_PADRAO = 0.5   # fração da resolução da janela
+HZ_PADRAO = 20.0      # atualizações por segundo (0 = todo quadro, só com a resolução menor)
+
+VERTEX = """
+#version 330
+layout(location = 0) in vec3 posicao;
+layout(location = 2) in vec2 texcoord;
+out vec2 st;
+void main() {
+    gl_Position = vec4(posicao, 1.0);
+    st = texcoord;
+}
+"""
+
+FRAGMENT = """
+#version 330
+uniform sampler2D cor;
+uniform sampler2D profundidade;
+uniform bool usar_profundidade;
+in vec2 st;
+out vec4 saida;
+void main() {
+    saida = texture(cor, st);
+    // Sem profundidade o fundo fica atrás de tudo, como depois de um glClear
+    gl_FragDepth = usar_profundidade ? texture(profundidade, st).r : 1.0;
+}
+"""
+
+# Cantos do cubo em volta de uma esfera de raio 1, e os 2 triângulos de um retângulo
+# (índices em x0, y0, x1, y1)
+_CUBO = np.array([(x, y, z) for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype=float)
+_TRIANGULOS = np.array([(0, 1), (2, 1), (2, 3), (0, 1), (2, 3), (0, 3)])
+
+_c = {
+    "ligado": False, "pronto": None, "forcada": None, "escala": ESCALA_PADRAO, "hz": HZ_PADRAO,
+    "fbo": None, "cor": None, "profundidade": None, "tamanho": None, "programa": None,
+    "vao": None, "vbo": None, "vertices": 0, "desde": 0.0, "camera": None, "anterior": None,
+    "atualizacoes": 0,
+}
+
+def configurar(ativo=True, escala=ESCALA_PADRAO, hz=HZ_PADRAO):
+    # Chamado depois de render.iniciar (precisa do contexto GL)
+    liberar()
+    _c.update(ligado=ativo, escala=escala, hz=hz)
+    if ativo: _preparar()
+
+def forcar_escala(escala):
+    # Resolução imposta pelo governador de qualidade.py, mesmo com o cache desligado
+    # na linha de comando; None volta ao que configurar() definiu
+    if escala is not None and not _preparar(): return
+    _c["forcada"] = escala
+
+def _preparar():
+    # Programa e VAO do quad, uma vez; False se o GL não tem o necessário
+    if _c["pronto"] is not None: return _c["pronto"]
+    _c["pronto"] = False
+    if not render.suporta_shaders():
+        print("Cache do fundo indisponível (requer OpenGL 3.3), desenhando o cenário direto")
+        return False
+    try:
+        _c["programa"] = render.compilar_programa(VERTEX, ("cor", "profundidade", "usar_profundidade"), FRAGMENT)
+    except Exception as e:
+        print(f"Shader do cache do fundo não compilou, desenhando o cenário direto: {e}")
+        return False
+    p = _c["programa"]
+    glUseProgram(p["id"])
+    glUniform1i(p["cor"], 0)
+    glUniform1i(p["profundidade"], 1)
+    glUseProgram(0)
+    _c["vao"], _c["vbo"] = glGenVertexArrays(1), glGenBuffers(1)
+    glBindVertexArray(_c["vao"])
+    glBindBuffer(GL_ARRAY_BUFFER, _c["vbo"])
+    render.configurar_atributos(GL_T2F_V3F)
+    glBindVertexArray(0)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    _c["pronto"] = True
+    return True
+
+def ativo():
+    return bool(_c["pronto"]) and (_c["ligado"] or _c["forcada"] is not None)
+
+def liberar():
+    if _c["fbo"] is not None:
+        glDeleteFramebuffers(1, [_c["fbo"]])
+        glDeleteTextures([_c["cor"], _c["profundidade"]])
+    _c.update(fbo=None, cor=None, profundidade=None, tamanho=None, camera=None, anterior=None)
+
+def _textura(formato_interno, formato, tipo, filtro, tamanho):
+    tex = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, tex)
+    glTexImage2D(GL_TEXTURE_2D, 0, formato_interno, *tamanho, 0, formato, tipo, None)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, filtro)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, filtro)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+    return tex
+
+def _criar(tamanho):
+    liberar()
+    # Cor filtrada na ampliação; profundidade sem filtro (média de profundidades não existe)
+    _c["cor"] = _textura(GL_RGBA8, GL_RGBA, GL_UNSIGNED_BYTE, GL_LINEAR, tamanho)
+    _c["profundidade"] = _textura(GL_DEPTH_COMPONENT24, GL_DEPTH_COMPONENT, GL_UNSIGNED_INT, GL_NEAREST, tamanho)
+    glBindTexture(GL_TEXTURE_2D, 0)
+    _c["fbo"] = glGenFramebuffers(1)
+    glBindFramebuffer(GL_FRAMEBUFFER, _c["fbo"])
+    glFramebufferTexture2D(GL_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, _c["cor"], 0)
+    glFramebufferTexture2D(GL_FRAMEBUFFER, GL_DEPTH_ATTACHMENT, GL_TEXTURE_2D, _c["profundidade"], 0)
+    completo = glCheckFramebufferStatus(GL_FRAMEBUFFER) == GL_FRAMEBUFFER_COMPLETE
+    glBindFramebuffer(GL_FRAMEBUFFER, 0)
+    if not completo:
+        liberar()
+        _c["pronto"] = False
+        print("FBO do cache do fundo incompleto, desenhando o cenário direto")
+        return False
+    _c["tamanho"] = tamanho
+    return True
+
+def retangulos(centros, raios, vista_proj):
+    # Retângulos (x0, y0, x1, y1) em coordenadas normalizadas de tela que contêm cada
+    # esfera: projeção dos cantos do cubo envolvente. Esfera atrás ou em volta da câmera
+    # ocupa a tela inteira.
+    cantos = centros[:, None, :] + raios[:, None, None] * _CUBO
+    clip = np.concatenate((cantos, np.ones(cantos.shape[:2] + (1,))), axis=2) @ vista_proj.T
+    w = clip[..., 3:]
+    ndc = clip[..., :2] / np.where(w > 0, w, 1.0)
+    r = np.concatenate((ndc.min(axis=1), ndc.max(axis=1)), axis=1)
+    r[(w[..., 0] <= 0).any(axis=1)] = (-1, -1, 1, 1)
+    r = np.clip(r, -1, 1)
+    return r[(r[:, 0] < r[:, 2]) & (r[:, 1] < r[:, 3])]
+
+def _enviar_retangulos():
+    # GL_T2F_V3F: a coordenada de textura é a própria posição na tela levada para [0, 1]
+    vista, projecao, _ = render.matrizes_camera()
+    r = retangulos(*fundo.esferas_desenhadas(), projecao @ vista)
+    xy = np.stack((r[:, _TRIANGULOS[:, 0]], r[:, _TRIANGULOS[:, 1]]), axis=2).reshape(-1, 2)
+    dados = np.zeros((len(xy), 5), dtype=np.float32)
+    dados[:, :2] = (xy + 1) / 2
+    dados[:, 2:4] = xy
+    glBindBuffer(GL_ARRAY_BUFFER, _c["vbo"])
+    glBufferData(GL_ARRAY_BUFFER, dados.nbytes, dados, GL_DYNAMIC_DRAW)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    _c["vertices"] = len(dados)
+
+def _atualizar(tempo, display, tamanho):
+    glBindFramebuffer(GL_FRAMEBUFFER, _c["fbo"])
+    glViewport(0, 0, *tamanho)
+    glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+    fundo.desenhar_cenario(tempo)
+    glBindFramebuffer(GL_FRAMEBUFFER, 0)
+    glViewport(0, 0, *display)
+    _enviar_retangulos()
+    _c["atualizacoes"] += 1
+
+def _compor(profundidade):
+    if not _c["vertices"]: return
+    p = _c["programa"]
+    glUseProgram(p["id"])
+    if p["valores"].get("usar_profundidade") != profundidade:
+        glUniform1i(p["usar_profundidade"], int(profundidade))
+        p["valores"]["usar_profundidade"] = profundidade
+    glActiveTexture(GL_TEXTURE1)
+    glBindTexture(GL_TEXTURE_2D, _c["profundidade"])
+    glActiveTexture(GL_TEXTURE0)
+    glBindTexture(GL_TEXTURE_2D, _c["cor"])
+    # Os retângulos escrevem a profundidade guardada sem serem testados
+    glDepthFunc(GL_ALWAYS)
+    glBindVertexArray(_c["vao"])
+    glDrawArrays(GL_TRIANGLES, 0, _c["vertices"])
+    glBindVertexArray(0)
+    glDepthFunc(GL_LESS)
+    glActiveTexture(GL_TEXTURE1)
+    glBindTexture(GL_TEXTURE_2D, 0)
+    glActiveTexture(GL_TEXTURE0)
+    glBindTexture(GL_TEXTURE_2D, 0)
+    glUseProgram(0)
+
+def desenhar(tempo, dt, display, profundidade=True):
+    # No lugar de fundo.desenhar_cenario(tempo), com a câmera já definida por render.camera.
+    # dt: ms reais desde o quadro anterior (a taxa de atualização é em tempo real, não
+    # no tempo do cenário, que anda mais devagar no menu).
+    # profundidade=False: o fundo fica atrás de tudo (tabuleiros grandes, que limpavam
+    # o depth depois do cenário)
+    if not ativo():
+        fundo.desenhar_cenario(tempo)
+        return
+    escala = _c["escala"] if _c["forcada"] is None else _c["forcada"]
+    tamanho = (max(1, round(display[0] * escala)), max(1, round(display[1] * escala)))
+    # render.camera devolve as mesmas matrizes enquanto a câmera não muda
+    vista, projecao, _ = render.matrizes_camera()
+    anterior = _c["anterior"]
+    parada = anterior is not None and anterior[0] is vista and anterior[1] is projecao
+    if parada and _c["tamanho"] != tamanho: parada = _criar(tamanho)
+    if not parada:
+        _c["anterior"], _c["camera"] = (vista, projecao), None
+        fundo.desenhar_cenario(tempo)
+        return
+    camera = _c["anterior"]
+    _c["desde"] += dt
+    if (_c["camera"] is not camera
+            or _c["desde"] >= (1000.0 / _c["hz"] if _c["hz"] > 0 else 0)):
+        _atualizar(tempo, display, tamanho)
+        _c["camera"], _c["desde"] = camera, 0.0
+    _compor(profundidade)
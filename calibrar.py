@@ -0,0 +1,146 @@
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import time
+from multiprocessing import Pool
+from statistics import NormalDist
+import numpy as np
+import autopiloto
+import meteoros
+import simulacao
+
+# Calibração de dificuldade por Monte Carlo: milhões de partidas com semente, sem janela,
+# divididas entre processos. Uma partida com a duração máxima dá a sobrevivência para
+# todas as durações menores (até o fim, a duração não muda nada na simulação), então
+# cada nível roda uma vez e sai a curva inteira, com intervalo de confiança de Wilson.
+#
+#   python calibrar.py --jogos 100000 --duracao-max 60 --politica esquiva --saida curvas.csv
+
+def _parado(semente):
+    return lambda jogo: ()
+
+def _aleatoria(semente):
+    # RNG próprio: a política não pode consumir números do RNG da partida
+    rng = random.Random(semente)
+    opcoes = ((), (simulacao.ESQUERDA,), (simulacao.DIREITA,), (simulacao.CIMA,), (simulacao.BAIXO,))
+    return lambda jogo: rng.choice(opcoes)
+
+def _esquiva(semente):
+    # Gulosa: se a casa da nave vai ser ocupada no próximo passo, vai para a primeira
+    # vizinha livre (na ordem de MOVIMENTOS)
+    def politica(jogo):
+        x, z, dx, dz = meteoros.vivos(jogo["meteoros"])
+        proximas = set(zip((x + dx).tolist(), (z + dz).tolist()))
+        sx, sz = jogo["ship_x"], jogo["ship_z"]
+        if (sx, sz) not in proximas: return ()
+        for mov, (mx, mz) in simulacao.MOVIMENTOS.items():
+            nx, nz = sx + mx, sz + mz
+            if 0 <= nx < jogo["cols"] and 0 <= nz < jogo["rows"] and (nx, nz) not in proximas:
+                return (mov,)
+        return ()
+    return politica
+
+def _autopiloto(semente):
+    return autopiloto.politica()
+
+POLITICAS = {"parado": _parado, "aleatoria": _aleatoria, "esquiva": _esquiva, "autopiloto": _autopiloto}
+
+def _lote(tarefa):
+    # Roda jogos [inicio, inicio + n) de um nível; devolve o histograma do passo da
+    # derrota (último índice = sobreviveu até a duração máxima) e o tempo de CPU
+    nivel, duracao, politica, semente, inicio, n, cols, rows = tarefa
+    passos = duracao * 1000 // simulacao.PASSO_MS
+    derrotas = np.zeros(passos + 1, dtype=np.int64)
+    t = time.process_time()
+    for i in range(inicio, inicio + n):
+        s = semente + i
+        jogo = simulacao.simular(nivel, duracao, s, POLITICAS[politica](s), cols, rows)
+        derrotas[jogo["tempo"] // simulacao.PASSO_MS if jogo["state"] == "Derrota" else passos] += 1
+    return nivel, derrotas, time.process_time() - t
+
+def wilson(k, n, z):
+    # Intervalo de Wilson para a proporção k/n (arrays)
+    p = k / n
+    centro = (p + z * z / (2 * n)) / (1 + z * z / n)
+    meia = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return p, centro - meia, centro + meia
+
+def curvas(derrotas, duracao, confianca):
+    # Sobreviver a uma partida de d segundos = não perder em nenhum passo com tempo < d*1000
+    z = NormalDist().inv_cdf(0.5 + confianca / 2)
+    n = int(derrotas.sum())
+    passo = simulacao.PASSO_MS
+    duracoes = np.arange(1, duracao + 1)
+    # Derrota no passo j acontece com tempo j*PASSO_MS; conta para d se j*PASSO_MS < d*1000
+    perdidas = np.cumsum(derrotas[:-1])[np.minimum((duracoes * 1000 - 1) // passo, len(derrotas) - 2)]
+    p, inf, sup = wilson(n - perdidas, n, z)
+    return {"duracao": duracoes.tolist(), "jogos": n, "sobreviventes": (n - perdidas).tolist(),
+            "sobrevivencia": p.tolist(), "ic_inferior": inf.tolist(), "ic_superior": sup.tolist()}
+
+def calibrar(niveis, jogos, duracao, politica="aleatoria", semente=0, processos=None, lote=2000,
+             cols=8, rows=8, confianca=0.95):
+    processos = processos or os.cpu_count() or 1
+    tarefas = [(nivel, duracao, politica, semente, inicio, min(lote, jogos - inicio), cols, rows)
+               for nivel in niveis for inicio in range(0, jogos, lote)]
+    derrotas = {nivel: 0 for nivel in niveis}
+    cpu, inicio = 0.0, time.perf_counter()
+    with Pool(processos) as pool:
+        for nivel, hist, t in pool.imap_unordered(_lote, tarefas):
+            derrotas[nivel] = derrotas[nivel] + hist
+            cpu += t
+    total = time.perf_counter() - inicio
+
+    n = jogos * len(niveis)
+    return {
+        "parametros": {"niveis": list(niveis), "jogos": jogos, "duracao_max": duracao, "politica": politica,
+                       "semente": semente, "tabuleiro": [cols, rows], "confianca": confianca,
+                       "passo_ms": simulacao.PASSO_MS,
+                       "intervalo_spawn_ms": {nivel: simulacao.intervalo_spawn(nivel) for nivel in niveis}},
+        "desempenho": {"processos": processos, "segundos": total, "jogos_por_s": n / total,
+                       "jogos_por_s_por_processo": n / total / processos,
+                       "jogos_por_s_cpu": n / max(cpu, 1e-9)},
+        "curvas": {nivel: curvas(derrotas[nivel], duracao, confianca) for nivel in niveis},
+    }
+
+def gravar_csv(resultado, arquivo):
+    w = csv.writer(arquivo)
+    w.writerow(["nivel", "duracao", "jogos", "sobreviventes", "sobrevivencia", "ic_inferior", "ic_superior"])
+    for nivel, c in resultado["curvas"].items():
+        for i, d in enumerate(c["duracao"]):
+            w.writerow([nivel, d, c["jogos"], c["sobreviventes"][i], f"{c['sobrevivencia'][i]:.6f}",
+                        f"{c['ic_inferior'][i]:.6f}", f"{c['ic_superior'][i]:.6f}"])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Curvas de sobrevivência do Space Dodge por Monte Carlo")
+    parser.add_argument("--niveis", type=int, nargs="+", default=[1, 2, 3], choices=(1, 2, 3))
+    parser.add_argument("--jogos", type=int, default=10000, help="partidas por nível")
+    parser.add_argument("--duracao-max", type=int, default=60, help="curva de 1 até este número de segundos")
+    parser.add_argument("--politica", default="aleatoria", choices=sorted(POLITICAS))
+    parser.add_argument("--semente", type=int, default=0, help="a partida i usa semente + i")
+    parser.add_argument("--processos", type=int, help="padrão: um por núcleo")
+    parser.add_argument("--lote", type=int, default=2000, help="partidas por tarefa enviada a um processo")
+    parser.add_argument("--tabuleiro", type=int, nargs=2, default=(8, 8), metavar=("COLS", "ROWS"))
+    parser.add_argument("--confianca", type=float, default=0.95)
+    parser.add_argument("--saida", help="arquivo .json ou .csv (padrão: JSON no stdout)")
+    args = parser.parse_args(argv)
+
+    resultado = calibrar(args.niveis, args.jogos, args.duracao_max, args.politica, args.semente,
+                         args.processos, args.lote, *args.tabuleiro, args.confianca)
+    d = resultado["desempenho"]
+    print(f"{args.jogos * len(args.niveis)} partidas em {d['segundos']:.1f} s com {d['processos']} processos: "
+          f"{d['jogos_por_s']:.0f} partidas/s, {d['jogos_por_s_por_processo']:.0f} por processo "
+          f"({d['jogos_por_s_cpu']:.0f} por s de CPU)", file=sys.stderr)
+
+    if args.saida and args.saida.endswith(".csv"):
+        with open(args.saida, "w", newline="") as f: gravar_csv(resultado, f)
+    elif args.saida:
+        with open(args.saida, "w") as f: json.dump(resultado, f, indent=2)
+    else:
+        print(json.dumps(resultado, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
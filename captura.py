@@ -0,0 +1,196 @@
+from OpenGL.GL import *
+import ctypes
+import os
+import queue
+import shlex
+import subprocess
+import threading
+import time
+import numpy as np
+from PIL import Image
+
+# Gravação da partida sem travar o quadro. quadro() pede a cópia do back buffer para
+# um pixel buffer object (glReadPixels com PBO volta na hora; a GPU copia quando
+# chegar lá) e segue. Alguns quadros depois, quando a fence do buffer já passou, ele é
+# mapeado e o ponteiro vai direto para a thread de escrita, sem cópia; ela devolve o
+# buffer quando termina e só então ele é desmapeado e volta ao anel (o GL só na thread
+# dele). Se nenhum buffer do anel está livre (GPU atrasada ou escrita lenta), o quadro
+# é descartado e contado, em vez de o jogo esperar.
+#
+# Formatos: "png" (uma imagem por quadro numa pasta), "raw" (RGBA cru num arquivo só,
+# linhas de baixo para cima, como o GL entrega) ou "pipe" (os mesmos bytes crus na
+# entrada de um comando, por exemplo um codificador local):
+#
+#   python game.py --gravar captura --gravar-formato png
+#   python game.py --gravar video.mp4 --gravar-formato pipe --gravar-comando \
+#       "ffmpeg -y -f rawvideo -pix_fmt rgba -s {largura}x{altura} -r {fps} -i - -vf vflip {saida}"
+
+FORMATOS = ("png", "raw", "pipe")
+BUFFERS = 4         # PBOs no anel
+ATRASO = 2          # sem fences: quadros até mapear um buffer (o driver já terminou a cópia)
+FPS_PADRAO = 30.0   # quadros gravados por segundo real (0 = todos)
+
+_ativo = False
+_g = None
+
+def _suporta_pbo():
+    try:
+        major, minor = map(int, glGetString(GL_VERSION).split()[0].split(b".")[:2])
+    except Exception:
+        return False
+    return (major, minor) >= (3, 0) and bool(glMapBufferRange)
+
+def ativar(saida, display, formato="png", fps=FPS_PADRAO, comando=None, buffers=BUFFERS):
+    # Chamado com o contexto GL criado. False (e uma mensagem) se não dá para gravar
+    global _ativo, _g
+    if not _suporta_pbo():
+        print("Gravação indisponível (requer OpenGL 3.0 com glMapBufferRange)")
+        return False
+    largura, altura = display
+    tamanho = largura * altura * 4
+    if formato == "pipe":
+        args = shlex.split((comando or "").format(largura=largura, altura=altura, fps=fps or 60, saida=saida))
+        if not args:
+            print("Gravação em pipe precisa de --gravar-comando")
+            return False
+        destino = subprocess.Popen(args, stdin=subprocess.PIPE)
+    elif formato == "raw":
+        destino = open(saida, "wb")
+    else:
+        os.makedirs(saida, exist_ok=True)
+        destino = saida
+
+    pbos = glGenBuffers(buffers)
+    for pbo in np.atleast_1d(pbos):
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, int(pbo))
+        glBufferData(GL_PIXEL_PACK_BUFFER, tamanho, None, GL_STREAM_READ)
+    glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+    _g = {
+        "formato": formato, "destino": destino, "display": (largura, altura), "tamanho": tamanho,
+        "periodo": 1.0 / fps if fps else 0.0, "proximo": time.perf_counter(),
+        "fences": bool(glFenceSync),
+        # Cada buffer: "livre", "lendo" (cópia pedida, com a fence e o quadro do pedido)
+        # ou "escrevendo" (mapeado, com a thread de escrita)
+        "anel": [{"pbo": int(p), "estado": "livre", "fence": None, "quadro": 0, "numero": 0}
+                 for p in np.atleast_1d(pbos)],
+        "quadro": 0, "pedidos": 0, "gravados": 0, "descartados": 0, "erro": None,
+        "fila": queue.Queue(), "devolvidos": queue.Queue(),
+    }
+    _g["thread"] = threading.Thread(target=_escrever, name="captura", daemon=True)
+    _g["thread"].start()
+    _ativo = True
+    return True
+
+def ativo():
+    return _ativo
+
+def _escrever():
+    # Thread de escrita: recebe (buffer, número, pixels mapeados), devolve o buffer
+    g = _g
+    largura, altura = g["display"]
+    while True:
+        item = g["fila"].get()
+        if item is None: return
+        buf, numero, pixels = item
+        try:
+            if g["erro"] is None:
+                if g["formato"] == "png":
+                    # flipud é só uma vista; o PIL copia ao montar a imagem
+                    Image.fromarray(np.flipud(pixels.reshape(altura, largura, 4)), "RGBA").save(
+                        os.path.join(g["destino"], f"quadro_{numero:06d}.png"), compress_level=1)
+                elif g["formato"] == "raw":
+                    g["destino"].write(pixels)
+                else:
+                    g["destino"].stdin.write(pixels)
+        except Exception as e:
+            g["erro"] = e
+        g["devolvidos"].put(buf)
+
+def _devolver():
+    # Buffers que a escrita terminou: desmapeia e volta ao anel
+    g = _g
+    while True:
+        try:
+            buf = g["devolvidos"].get_nowait()
+        except queue.Empty:
+            return
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, buf["pbo"])
+        glUnmapBuffer(GL_PIXEL_PACK_BUFFER)
+        buf["estado"] = "livre"
+        if g["erro"] is None: g["gravados"] += 1
+
+def _pronto(buf):
+    if not _g["fences"]: return _g["quadro"] - buf["quadro"] >= ATRASO
+    return glClientWaitSync(buf["fence"], 0, 0) in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED)
+
+def _mapear():
+    # Buffers cuja cópia já terminou vão para a thread de escrita, em ordem de pedido
+    g = _g
+    for buf in sorted((b for b in g["anel"] if b["estado"] == "lendo"), key=lambda b: b["numero"]):
+        if not _pronto(buf): return
+        if buf["fence"] is not None:
+            glDeleteSync(buf["fence"])
+            buf["fence"] = None
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, buf["pbo"])
+        ptr = glMapBufferRange(GL_PIXEL_PACK_BUFFER, 0, g["tamanho"], GL_MAP_READ_BIT)
+        pixels = np.ctypeslib.as_array((ctypes.c_ubyte * g["tamanho"]).from_address(int(ptr)))
+        buf["estado"] = "escrevendo"
+        g["fila"].put((buf, buf["numero"], pixels))
+
+def quadro():
+    # Antes do flip, com a cena inteira no back buffer
+    if not _ativo: return
+    g = _g
+    g["quadro"] += 1
+    _devolver()
+    _mapear()
+    glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+    agora = time.perf_counter()
+    if agora < g["proximo"]: return
+    # Na grade do período; atrasado mais de um período, a grade recomeça
+    g["proximo"] = max(g["proximo"] + g["periodo"], agora - g["periodo"])
+    buf = next((b for b in g["anel"] if b["estado"] == "livre"), None)
+    if buf is None:
+        g["descartados"] += 1
+        return
+    glBindBuffer(GL_PIXEL_PACK_BUFFER, buf["pbo"])
+    glPixelStorei(GL_PACK_ALIGNMENT, 1)
+    glReadPixels(0, 0, *g["display"], GL_RGBA, GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+    glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+    if g["fences"]: buf["fence"] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+    buf.update(estado="lendo", quadro=g["quadro"], numero=g["pedidos"])
+    g["pedidos"] += 1
+
+def resumo():
+    if not _g: return None
+    return {"pedidos": _g["pedidos"], "gravados": _g["gravados"], "descartados": _g["descartados"],
+            "erro": str(_g["erro"]) if _g["erro"] else None}
+
+def encerrar():
+    # Espera a GPU e a escrita dos quadros já pedidos, fecha o destino e libera os PBOs
+    global _ativo
+    if not _ativo: return resumo()
+    _ativo = False
+    g = _g
+    glFinish()
+    g["quadro"] += ATRASO
+    _mapear()
+    g["fila"].put(None)
+    g["thread"].join()
+    _devolver()
+    for buf in g["anel"]:
+        if buf["fence"] is not None: glDeleteSync(buf["fence"])
+    glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+    glDeleteBuffers(len(g["anel"]), [b["pbo"] for b in g["anel"]])
+    if g["formato"] == "raw":
+        g["destino"].close()
+    elif g["formato"] == "pipe":
+        g["destino"].stdin.close()
+        g["destino"].wait()
+    return resumo()
+
+def texto_resumo():
+    r = resumo()
+    if not r: return None
+    msg = f"gravação: {r['gravados']} quadros gravados, {r['descartados']} descartados"
+    return msg + (f" (erro na escrita: {r['erro']})" if r["erro"] else "")
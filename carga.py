@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import numpy as np
+import servidor
+import simulacao
+
+# Gerador de carga para o servidor.py. Para cada número de sessões pedido, mantém esse
+# tanto de partidas abertas (as que terminam são substituídas), espalhadas por algumas
+# conexões, com movimentos aleatórios; depois do aquecimento mede por --segundos e
+# mostra, do servidor, o atraso dos ticks em relação à grade e a CPU usada, daí as
+# sessões por núcleo, e, do lado do cliente, o jitter do intervalo entre estados de
+# uma sessão (deveria ser PASSO_MS). O gerador também gasta CPU: na mesma máquina,
+# o jitter do cliente inclui a demora dele.
+#
+#   python servidor.py --porta 7777 &
+#   python carga.py --porta 7777 --sessoes 250 500 1000 2000 --segundos 10 --saida carga.json
+
+INTERVALO = 0.1   # s entre rodadas de movimentos e reposição de sessões de cada conexão
+
+async def _conectar(host, porta, unix):
+    if unix: return await asyncio.open_unix_connection(unix)
+    return await asyncio.open_connection(host, porta)
+
+RESPOSTAS = {b"E": servidor.ESTADO, b"C": servidor.CRIADA, b"R": servidor.RECUSADA, b"F": servidor.FIM,
+             b"Q": servidor.TAMANHO}
+
+def _processar(c, carga, buf, agora):
+    # Mensagens completas do começo de buf; devolve quantos bytes foram usados
+    i = 0
+    while i < len(buf):
+        tipo = bytes(buf[i:i + 1])
+        formato = RESPOSTAS.get(tipo)
+        if formato is None: raise ValueError(f"mensagem desconhecida do servidor: {tipo!r}")
+        if i + formato.size > len(buf): break
+        campos = formato.unpack_from(buf, i)
+        extra = (campos[5] * servidor.METEORO.itemsize if tipo == b"E" else campos[1] if tipo == b"Q" else 0)
+        fim = i + formato.size + extra
+        if fim > len(buf): break
+        if tipo == b"E":
+            sid, tempo = campos[1], campos[2]
+            anterior = c["sessoes"].get(sid)
+            if anterior is None or tempo != anterior[1]:
+                if anterior is not None: carga["jitter"].append(abs((agora - anterior[0]) * 1000 - (tempo - anterior[1])))
+                c["sessoes"][sid] = (agora, tempo)
+        elif tipo == b"C":
+            c["sessoes"][campos[2]] = None
+            c["pedidas"] -= 1
+        elif tipo == b"R":
+            c["pedidas"] -= 1
+            carga["recusadas"] += 1
+        elif tipo == b"F":
+            c["sessoes"].pop(campos[1], None)
+            carga["fins"][campos[2]] = carga["fins"].get(campos[2], 0) + 1
+        else:
+            c["consulta"].set_result(json.loads(bytes(buf[i + formato.size:fim])))
+        i = fim
+    return i
+
+async def _ler(c, carga):
+    # Lê em blocos e separa as mensagens sem um await por mensagem: o gerador divide a
+    # CPU com o servidor e não pode pesar na medição
+    leitor, buf = c["leitor"], bytearray()
+    while True:
+        dados = await leitor.read(1 << 16)
+        if not dados: raise ConnectionError("o servidor fechou a conexão")
+        buf += dados
+        del buf[:_processar(c, carga, buf, time.perf_counter())]
+
+async def _jogar(c, carga, args):
+    # Repõe as sessões da cota desta conexão e manda os movimentos sorteados, numa
+    # escrita por rodada
+    rng, p = np.random.default_rng(carga["rng"].getrandbits(32)), args.movimentos_por_s * INTERVALO
+    while True:
+        saida = bytearray()
+        for _ in range(c["cota"] - len(c["sessoes"]) - c["pedidas"]):
+            saida += servidor.NOVA.pack(b"N", 0, carga["rng"].getrandbits(32), args.nivel, args.duracao, *args.tabuleiro)
+            c["pedidas"] += 1
+        ids = np.fromiter(c["sessoes"], dtype=np.int64, count=len(c["sessoes"]))
+        escolhidos = ids[rng.random(len(ids)) < p]
+        for sid, mov in zip(escolhidos.tolist(), rng.integers(len(simulacao.MOVIMENTOS), size=len(escolhidos)).tolist()):
+            saida += servidor.MOVER.pack(b"M", sid, mov)
+        c["escritor"].write(saida)
+        await asyncio.sleep(INTERVALO)
+
+async def _consultar(c):
+    c["consulta"] = asyncio.get_running_loop().create_future()
+    c["escritor"].write(servidor.CONSULTA.pack(b"Q"))
+    await asyncio.wait((c["consulta"], c["leitura"]), return_when=asyncio.FIRST_COMPLETED)
+    if c["leitura"].done(): c["leitura"].result()   # o erro da leitura, se a conexão caiu
+    return c["consulta"].result()
+
+def _cotas(conexoes, sessoes):
+    for i, c in enumerate(conexoes):
+        c["cota"] = sessoes // len(conexoes) + (i < sessoes % len(conexoes))
+
+def _percentis(a):
+    if not len(a): return None
+    return {"p50": float(np.percentile(a, 50)), "p99": float(np.percentile(a, 99)), "max": float(np.max(a))}
+
+async def _medir(args):
+    carga = {"rng": random.Random(args.semente), "jitter": [], "fins": {}, "recusadas": 0}
+    conexoes = []
+    for _ in range(args.conexoes):
+        leitor, escritor = await _conectar(args.host, args.porta, args.unix)
+        conexoes.append({"leitor": leitor, "escritor": escritor, "sessoes": {}, "pedidas": 0, "cota": 0,
+                         "consulta": None})
+    tarefas = []
+    for c in conexoes:
+        c["leitura"] = asyncio.create_task(_ler(c, carga))
+        tarefas += [c["leitura"], asyncio.create_task(_jogar(c, carga, args))]
+    resultados = []
+    try:
+        for sessoes in args.sessoes:
+            _cotas(conexoes, sessoes)
+            # Espera as sessões abrirem (e começarem nas fases delas) antes de medir
+            limite = time.perf_counter() + 10
+            while sum(len(c["sessoes"]) for c in conexoes) < sessoes and time.perf_counter() < limite:
+                await asyncio.sleep(INTERVALO)
+            await asyncio.sleep(args.aquecimento)
+            await _consultar(conexoes[0])
+            carga["jitter"].clear()
+            carga["fins"], carga["recusadas"] = {}, 0
+            await asyncio.sleep(args.segundos)
+            est = await _consultar(conexoes[0])
+            uso = est["cpu_s"] / max(est["parede_s"], 1e-9)
+            r = {"sessoes": est["sessoes"], "servidor": est, "uso_cpu": uso,
+                 "sessoes_por_nucleo": est["sessoes"] / max(uso, 1e-9),
+                 "acompanha": est["ticks_descartados"] == 0 and est["atraso_ms"]["p99"] <= est["tick_ms"],
+                 "jitter_cliente_ms": _percentis(carga["jitter"]), "partidas_encerradas": dict(carga["fins"]),
+                 "recusadas": carga["recusadas"]}
+            resultados.append(r)
+            a, j = est["atraso_ms"], r["jitter_cliente_ms"] or {"p50": 0.0, "p99": 0.0}
+            print(f"{r['sessoes']:6d} sessões  CPU do servidor {uso:6.1%} ({r['sessoes_por_nucleo']:7.0f} por núcleo)  "
+                  f"atraso do tick p50 {a['p50']:5.2f} p99 {a['p99']:6.2f} max {a['max']:6.2f} ms  "
+                  f"trabalho p99 {est['trabalho_ms']['p99']:5.2f} ms ({est['trabalho_cpu_ms']['p99']:5.2f} de CPU)  jitter no cliente p50 {j['p50']:5.2f} "
+                  f"p99 {j['p99']:6.2f} ms{'' if r['acompanha'] else '  NÃO ACOMPANHA'}", file=sys.stderr)
+    finally:
+        for t in tarefas: t.cancel()
+        for c in conexoes: c["escritor"].close()
+    return {"parametros": {"conexoes": args.conexoes, "nivel": args.nivel, "duracao": args.duracao,
+                           "tabuleiro": list(args.tabuleiro), "movimentos_por_s": args.movimentos_por_s,
+                           "segundos": args.segundos, "semente": args.semente},
+            "niveis": resultados}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gerador de carga para o servidor de partidas do Space Dodge")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=7777)
+    parser.add_argument("--unix", metavar="CAMINHO", help="socket Unix no lugar do TCP")
+    parser.add_argument("--sessoes", type=int, nargs="+", default=[100, 500, 1000], help="sessões abertas em cada medição")
+    parser.add_argument("--conexoes", type=int, default=8)
+    parser.add_argument("--segundos", type=float, default=10.0, help="duração de cada medição")
+    parser.add_argument("--aquecimento", type=float, default=1.0, metavar="S")
+    parser.add_argument("--nivel", type=int, default=1, choices=(1, 2, 3))
+    parser.add_argument("--duracao", type=int, default=60, help="segundos de cada partida")
+    parser.add_argument("--tabuleiro", type=int, nargs=2, default=(8, 8), metavar=("COLS", "ROWS"))
+    parser.add_argument("--movimentos-por-s", type=float, default=2.0, help="por sessão")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--saida", help="arquivo .json (padrão: JSON no stdout)")
+    args = parser.parse_args(argv)
+
+    resultado = asyncio.run(_medir(args))
+    if args.saida:
+        with open(args.saida, "w") as f: json.dump(resultado, f, indent=2)
+    else:
+        print(json.dumps(resultado, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
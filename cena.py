@@ -0,0 +1,90 @@
+import numpy as np
+
+# Grafo de cena do sistema solar. Cada corpo é um nó com pai, órbita (eixo, velocidade
+# ou ângulo fixo, distância) e giro próprio; os filhos (lua, anéis) herdam o referencial
+# da órbita do pai, mas não o giro dele. As matrizes de todos os nós saem de uma passada
+# vetorizada por quadro e os nós fora do frustum são descartados antes de qualquer
+# chamada GL. Os nós ficam em ordem de profundidade (pai seguido dos filhos), que é
+# também a ordem de desenho.
+
+def _no(tipo, cfg, raio, **extra):
+    no = {"tipo": tipo, "cfg": cfg, "raio": raio, "pai": -1, "dist": 0.0, "vel": 0.0,
+          "eixo": (0.0, 1.0, 0.0), "angulo": 0.0, "giro": 0.0, "emissivo": False, "blend": False}
+    no.update(extra)
+    return no
+
+def montar(sol, planetas, filhos):
+    # filhos: configs com "pai" = nome do planeta; "tipo" "aneis" vira disco, o resto esfera
+    nos = [_no("esfera", sol, sol["raio"], emissivo=True)]
+    for p in planetas:
+        pai = len(nos)
+        nos.append(_no("esfera", p, p["raio"], dist=p["dist"], vel=p["vel"], giro=2.0))
+        for f in filhos:
+            if f["pai"] != p["nome"]: continue
+            if f.get("tipo") == "aneis":
+                interno, externo = p["raio"] + f["interno"], p["raio"] + f["externo"]
+                nos.append(_no("disco", f, externo, pai=pai, eixo=(1.0, 0.0, 0.0), angulo=f["inclinacao"],
+                               interno=interno, externo=externo, blend=True))
+            else:
+                nos.append(_no("esfera", f, f["raio"], pai=pai, dist=f["dist"], vel=f["vel"],
+                               eixo=f.get("eixo", (0.0, 1.0, 0.0))))
+
+    pai = np.array([n["pai"] for n in nos])
+    profundidade = np.zeros(len(nos), dtype=int)
+    for i, p in enumerate(pai):
+        if p >= 0: profundidade[i] = profundidade[p] + 1
+    eixo = np.array([n["eixo"] for n in nos], dtype=float)
+    eixo /= np.linalg.norm(eixo, axis=1)[:, None]
+    x, y, z = eixo.T
+    zero = np.zeros(len(nos))
+    antissimetrica = np.zeros((len(nos), 4, 4))
+    antissimetrica[:, :3, :3] = np.stack([zero, -z, y, z, zero, -x, -y, x, zero], axis=1).reshape(-1, 3, 3)
+    externo = np.zeros((len(nos), 4, 4))
+    externo[:, :3, :3] = eixo[:, :, None] * eixo[:, None, :]
+    return {
+        "nos": nos,
+        "pai": pai,
+        "niveis": [np.flatnonzero(profundidade == d) for d in range(1, profundidade.max() + 1)],
+        "identidade": np.diag([1.0, 1.0, 1.0, 0.0]),
+        "canto": np.diag([0.0, 0.0, 0.0, 1.0]),
+        "antissimetrica": antissimetrica,
+        "externo": externo,
+        "vel": np.array([n["vel"] for n in nos], dtype=float),
+        "angulo": np.array([n["angulo"] for n in nos], dtype=float),
+        "dist": np.array([n["dist"] for n in nos], dtype=float),
+        "giro": np.array([n["giro"] for n in nos], dtype=float),
+        "raio": np.array([n["raio"] for n in nos], dtype=float),
+    }
+
+def _rotacoes(cena, graus):
+    # Lote de matrizes 4x4 iguais às do glRotate: R = c*I + s*K + (1-c)*a*aT, com K e a*aT
+    # de cada eixo pré-calculados em montar()
+    a = np.radians(graus)[:, None, None]
+    c = np.cos(a)
+    return cena["identidade"] * c + cena["antissimetrica"] * np.sin(a) + cena["externo"] * (1 - c) + cena["canto"]
+
+def atualizar(cena, tempo):
+    # Matrizes de modelo (n, 4, 4) de todos os nós, já com o giro próprio
+    m = _rotacoes(cena, (tempo * cena["vel"]) % 360 + cena["angulo"])
+    m[:, :3, 3] = m[:, :3, 0] * cena["dist"][:, None]   # R @ T(dist, 0, 0)
+    for idx in cena["niveis"]:
+        m[idx] = m[cena["pai"][idx]] @ m[idx]
+
+    # Giro em y: M @ Ry só mistura as colunas 0 e 2
+    g = np.radians(tempo * cena["giro"])[:, None]
+    c, s = np.cos(g), np.sin(g)
+    x, z = m[:, :, 0].copy(), m[:, :, 2]
+    m[:, :, 0] = c * x - s * z
+    m[:, :, 2] = s * x + c * z
+    return m
+
+# Planos do frustum: linha 3 da matriz de clip somada/subtraída das linhas 0, 1 e 2
+_LINHAS_PLANOS = np.array([0, 0, 1, 1, 2, 2])
+_SINAIS_PLANOS = np.array([1, -1, 1, -1, 1, -1])[:, None]
+
+def visiveis(cena, modelos, vista_proj):
+    # Esferas envolventes contra os 6 planos do frustum (extraídos de projeção @ vista)
+    planos = vista_proj[3] + _SINAIS_PLANOS * vista_proj[_LINHAS_PLANOS]
+    planos /= np.sqrt((planos[:, :3] ** 2).sum(axis=1))[:, None]
+    dist = modelos[:, :3, 3] @ planos[:, :3].T + planos[:, 3]
+    return (dist >= -cena["raio"][:, None]).all(axis=1)
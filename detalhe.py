@@ -0,0 +1,40 @@
+import numpy as np
+
+# Nível de detalhe pelo tamanho na tela. Cada objeto tem algumas malhas pré-calculadas
+# (o nível 0 é a malha original) e escolhe uma pelo raio projetado em pixels. Com
+# histerese: só muda de nível depois de passar o limiar com folga, então um objeto
+# parado perto do limiar não fica alternando de malha.
+
+NIVEIS_ESFERA = ((20, 20), (14, 14), (10, 10), (6, 6))   # (fatias, pilhas)
+NIVEIS_DISCO = (40, 24, 16, 8)                           # fatias
+LIMIARES_PX = np.array([40.0, 16.0, 6.0])                # raio mínimo, em pixels, dos níveis 0, 1 e 2
+HISTERESE = 0.2                                          # folga relativa em torno de cada limiar
+
+# Fator aplicado ao raio projetado antes de escolher: abaixo de 1 toda a cena usa
+# malhas mais simples (governador de qualidade.py)
+_d = {"fator": 1.0}
+
+def definir_fator(fator):
+    _d["fator"] = fator
+
+def raio_projetado(centros, raios, vista, projecao, altura):
+    # Raio em pixels de esferas (centros no mundo) numa projeção perspectiva; vista,
+    # projeção e altura como em render.matrizes_camera()
+    profundidade = -(centros @ vista[2, :3] + vista[2, 3])
+    return raios * projecao[1, 1] * (altura / 2) / np.maximum(profundidade, 1e-3)
+
+def escolher(raio_px, anterior=None):
+    # Índice do nível para cada objeto; anterior < 0 (ou None) escolhe sem histerese
+    r = raio_px[:, None] * _d["fator"]
+    direto = (r < LIMIARES_PX).sum(axis=1)
+    if anterior is None: return direto
+    grosso = (r < LIMIARES_PX * (1 + HISTERESE)).sum(axis=1)
+    fino = (r < LIMIARES_PX * (1 - HISTERESE)).sum(axis=1)
+    # Dentro da faixa [fino, grosso] o nível anterior continua valendo
+    return np.where(anterior < 0, direto, np.clip(anterior, fino, grosso))
+
+def triangulos_esfera(fatias, pilhas):
+    return 2 * fatias * pilhas
+
+def triangulos_disco(fatias):
+    return 2 * fatias
@@ -1,8 +1,16 @@
 import pygame
 from OpenGL.GL import *
 from OpenGL.GLU import *
-import os
-from PIL import Image
+import numpy as np
+import cena
+import detalhe
+import malhas
+import matrizes
+import pacote_texturas
+import perfil
+import render
+import tabuleiro
+import texturas
 
 PLANETAS = [
     {"nome": "Mercurio", "raio": 0.4, "dist": 6,  "vel": 4.5, "tex": "mercurio.jpg", "id": None},
@@ -14,102 +22,230 @@ PLANETAS = [
     {"nome": "Urano",    "raio": 0.9, "dist": 38, "vel": 0.6, "tex": "urano.png",   "id": None},
     {"nome": "Netuno",   "raio": 0.9, "dist": 45, "vel": 0.4, "tex": "netuno.png",  "id": None},
 ]
-LUA_TERRA = {"raio": 0.2, "dist": 1.8, "vel": 10.0, "tex": "lua.png", "id": None}
+LUA_TERRA = {"raio": 0.2, "dist": 1.8, "vel": 10.0, "eixo": (0.1, 1, 0), "pai": "Terra", "tex": "lua.png", "id": None}
 SOL_CFG = {"raio": 3.5, "tex": "sol.png", "id": None}
-ANEIS_SATURNO = {"tex": "anelSaturno.png", "id": None}
+# interno/externo somados ao raio do planeta
+ANEIS_SATURNO = {"tipo": "aneis", "pai": "Saturno", "inclinacao": 45, "interno": 0.3, "externo": 1.5,
+                 "tex": "anelSaturno.png", "id": None}
 NAVE_CFG = {"tex": "nave.jpg", "id": None}
 METEORO_CFG = {"tex": "meteoro.jpg", "id": None}
 
-def load_texture(filename):
-    filepath = os.path.join("assets", filename)
-    if not os.path.exists(filepath):
-        print(f"Erro: {filename} não encontrado.")
-        return None
-
-    tex_id = glGenTextures(1)
-    glBindTexture(GL_TEXTURE_2D, tex_id)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-    
-    try:
-        img = Image.open(filepath).convert("RGBA")
-        img_data = img.tobytes("raw", "RGBA", 0, -1)
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, img.width, img.height, 0, GL_RGBA, GL_UNSIGNED_BYTE, img_data)
-        return tex_id
-    except Exception as e:
-        print(f"Erro ao carregar textura {filename}: {e}")
-        return None
+# Unidades de tempo de desenhar_cenario por ms real: as órbitas andam na mesma
+# velocidade com qualquer taxa de quadros (0.5 por quadro a 60 fps)
+TEMPO_POR_MS = 0.03
+
+# Emissão do sol no pipeline fixo (arrays prontos: uma lista nova por quadro era lixo)
+EMISSAO_SOL = np.array([1, 1, 1, 1], dtype=np.float32)
+SEM_EMISSAO = np.array([0, 0, 0, 1], dtype=np.float32)
 
 def init_opengl():
     glEnable(GL_DEPTH_TEST)
+    if render.programavel(): return   # luz e material ficam nos shaders
     glEnable(GL_LIGHTING)
     glEnable(GL_LIGHT0)
     glEnable(GL_COLOR_MATERIAL) 
-    glLightfv(GL_LIGHT0, GL_AMBIENT, [0.2, 0.2, 0.2, 1.0])
-    glLightfv(GL_LIGHT0, GL_DIFFUSE, [1.0, 1.0, 1.0, 1.0])
+    glLightfv(GL_LIGHT0, GL_AMBIENT, [render.LUZ_AMBIENTE] * 3 + [1.0])
+    glLightfv(GL_LIGHT0, GL_DIFFUSE, [render.LUZ_DIFUSA] * 3 + [1.0])
     glShadeModel(GL_SMOOTH)
 
-def init_all_textures():
+def init_all_textures(pacote=pacote_texturas.ARQUIVO_PADRAO, progressivo=None, orcamento_mb=None):
+    # Não bloqueia: cada "id" começa como placeholder e é trocado em texturas.processar()
     glEnable(GL_TEXTURE_2D)
-    SOL_CFG["id"] = load_texture(SOL_CFG["tex"])
-    LUA_TERRA["id"] = load_texture(LUA_TERRA["tex"])
-    ANEIS_SATURNO["id"] = load_texture(ANEIS_SATURNO["tex"])
-    NAVE_CFG["id"] = load_texture(NAVE_CFG["tex"])
-    METEORO_CFG["id"] = load_texture(METEORO_CFG["tex"])
-    for p in PLANETAS:
-        p["id"] = load_texture(p["tex"])
-
-def desenhar_esfera(raio, tex_id):
-    quad = gluNewQuadric()
-    if tex_id:
-        glBindTexture(GL_TEXTURE_2D, tex_id)
-        gluQuadricTexture(quad, GL_TRUE)
-    gluSphere(quad, raio, 20, 20)
-    gluDeleteQuadric(quad)
+    texturas.iniciar(pacote, progressivo, orcamento_mb)
+    for cfg in (SOL_CFG, ANEIS_SATURNO, NAVE_CFG, METEORO_CFG):
+        texturas.registrar(cfg)
+    # Planetas e lua dividem um atlas: uma troca de textura só por página no cenário
+    for cfg in (LUA_TERRA, *PLANETAS):
+        texturas.registrar(cfg, "corpos")
+    texturas.carregar()
 
-def desenhar_cenario(tempo):
-    glPushMatrix()
-    glEnable(GL_TEXTURE_2D)
-    glColor3f(1, 1, 1)
+# Cache de malhas já enviadas ao driver: chave -> display list
+_malhas = {}
 
-    # Sol
-    glPushMatrix()
-    glMaterialfv(GL_FRONT, GL_EMISSION, [1, 1, 1, 1]) 
-    desenhar_esfera(SOL_CFG["raio"], SOL_CFG["id"])
-    glMaterialfv(GL_FRONT, GL_EMISSION, [0, 0, 0, 1])
-    glPopMatrix()
+def compilar_malha(dados, indices, formato=GL_T2F_N3F_V3F, modo=GL_TRIANGLES):
+    lista = glGenLists(1)
+    glNewList(lista, GL_COMPILE)
+    glPushClientAttrib(GL_CLIENT_VERTEX_ARRAY_BIT)
+    glInterleavedArrays(formato, 0, dados)
+    if indices is None:
+        glDrawArrays(modo, 0, len(dados))
+    else:
+        glDrawElements(modo, len(indices), GL_UNSIGNED_INT, indices)
+    glPopClientAttrib()
+    glEndList()
+    return lista
 
-    for p in PLANETAS:
-        glPushMatrix() 
-        glRotate((tempo * p["vel"]) % 360, 0, 1, 0)
-        glTranslate(p["dist"], 0, 0)
-        
-        glPushMatrix() # Rotação do planeta
-        glRotate(tempo * 2, 0, 1, 0) 
-        desenhar_esfera(p["raio"], p["id"])
-        glPopMatrix()
+def obter_malha(chave, construir):
+    lista = _malhas.get(chave)
+    if lista is None:
+        lista = _malhas[chave] = compilar_malha(*construir())
+    return lista
+
+def liberar_malhas():
+    for lista in _malhas.values():
+        glDeleteLists(lista, 1)
+    _malhas.clear()
 
-        if p["nome"] == "Terra": # Lua
+def desenhar_esfera(raio, tex_id, fatias=20, pilhas=20):
+    if tex_id: glBindTexture(GL_TEXTURE_2D, tex_id)
+    glCallList(obter_malha(("esfera", raio, fatias, pilhas), lambda: malhas.esfera(raio, fatias, pilhas)))
+    perfil.somar("triangulos", detalhe.triangulos_esfera(fatias, pilhas))
+
+def desenhar_disco(interno, externo, tex_id, fatias=40):
+    if tex_id: glBindTexture(GL_TEXTURE_2D, tex_id)
+    glCallList(obter_malha(("disco", interno, externo, fatias), lambda: malhas.disco(interno, externo, fatias)))
+    perfil.somar("triangulos", detalhe.triangulos_disco(fatias))
+
+def _blocos_grade(cols, rows, tamanho, regiao):
+    # Blocos de tabuleiro.LADO_BLOCO casas que tocam a região (casas x0, z0, x1, z1):
+    # (largura, altura, deslocamento x, deslocamento z do centro do bloco)
+    x0, z0, x1, z1 = regiao
+    lado, blocos = tabuleiro.LADO_BLOCO, []
+    for bz in range(max(0, z0) // lado, min(rows - 1, z1) // lado + 1):
+        for bx in range(max(0, x0) // lado, min(cols - 1, x1) // lado + 1):
+            c0, r0 = bx * lado, bz * lado
+            w, h = min(lado, cols - c0), min(lado, rows - r0)
+            blocos.append((w, h, (c0 + w / 2 - cols / 2) * tamanho, (r0 + h / 2 - rows / 2) * tamanho))
+    return blocos
+
+def desenhar_grade(cols, rows, tamanho, y, cor=(0, 1, 0), regiao=None):
+    # A chave inclui as dimensões: mudar COLS/ROWS/tamanho gera uma nova malha
+    # regiao: casas visíveis (tabuleiro.casas_visiveis); com ela só os blocos que aparecem
+    # são desenhados, e blocos do mesmo tamanho compartilham a malha
+    blocos = [(cols, rows, 0.0, 0.0)] if regiao is None else _blocos_grade(cols, rows, tamanho, regiao)
+    programavel = render.programavel()
+    if not programavel:
+        glDisable(GL_TEXTURE_2D); glColor3f(*cor)
+    for w, h, dx, dz in blocos:
+        chave = ("grade", w, h, tamanho, y)
+        construir = lambda: (malhas.grade(w, h, tamanho, y), None, GL_V3F, GL_LINES)
+        if programavel:
+            render.desenhar(render.obter_malha(chave, construir), matrizes.translacao(dx, 0, dz), (*cor, 1),
+                            textura=False, iluminado=False)
+        elif dx == dz == 0:
+            glCallList(obter_malha(chave, construir))
+        else:
             glPushMatrix()
-            glRotate((tempo * LUA_TERRA["vel"]) % 360, 0.1, 1, 0) 
-            glTranslate(LUA_TERRA["dist"], 0, 0)
-            desenhar_esfera(LUA_TERRA["raio"], LUA_TERRA["id"])
+            glTranslatef(dx, 0, dz)
+            glCallList(obter_malha(chave, construir))
             glPopMatrix()
 
-        if p["nome"] == "Saturno": 
-            glPushMatrix()
-            glRotate(45, 1, 0, 0) 
+# Textura ligada por _usar_textura dentro de desenhar_cenario: (id, uv)
+_ligada = None
+
+def _usar_textura(cfg):
+    # Só troca a textura (e o retângulo do atlas na matriz de textura) quando muda
+    # Sem textura (arquivo ausente) mantém a anterior, como antes
+    global _ligada
+    atual = (cfg["id"], cfg.get("uv"))
+    if atual[0] is None or atual == _ligada: return
+    if atual[0] != (_ligada and _ligada[0]): glBindTexture(GL_TEXTURE_2D, atual[0])
+    _ligada = atual
+    if render.programavel(): return   # o retângulo vai como uniform em render.desenhar
+    glMatrixMode(GL_TEXTURE)
+    glLoadIdentity()
+    if atual[1]:
+        u0, v0, du, dv = atual[1]
+        glTranslatef(u0, v0, 0)
+        glScalef(du, dv, 1)
+    glMatrixMode(GL_MODELVIEW)
+
+_cena = None
+_filhos = True   # lua e anéis (nós com pai); desligados pelo governador de qualidade.py
+
+def mostrar_filhos(sim):
+    global _filhos
+    _filhos = sim
+
+def _cfg_textura(no):
+    # Filho sem textura (anelSaturno.png não existe) usa a do pai, como quando era
+    # desenhado logo depois dele
+    return no["cfg"] if no["cfg"]["id"] is not None or no["pai"] < 0 else _cena["nos"][no["pai"]]["cfg"]
+
+def _montar_cena():
+    c = cena.montar(SOL_CFG, PLANETAS, [LUA_TERRA, ANEIS_SATURNO])
+    c["nivel"] = np.full(len(c["nos"]), -1)   # nível de detalhe do último quadro
+    c["modelos_gl"] = np.zeros((len(c["nos"]), 4, 4), dtype=np.float32)   # reaproveitado a cada quadro
+    # Compila todos os níveis de uma vez para a troca de nível não travar um quadro
+    for no in c["nos"]:
+        for k in range(len(detalhe.NIVEIS_ESFERA)):
+            _malha_no(no, k)
+    return c
+
+def _malha_no(no, nivel):
+    # Malha do nó no nível de detalhe (VAO no backend de shaders, display list no fixo)
+    obter = render.obter_malha if render.programavel() else obter_malha
+    if no["tipo"] == "disco":
+        f = detalhe.NIVEIS_DISCO[nivel]
+        return obter(("disco", no["interno"], no["externo"], f), lambda: malhas.disco(no["interno"], no["externo"], f))
+    f, p = detalhe.NIVEIS_ESFERA[nivel]
+    return obter(("esfera", no["raio"], f, p), lambda: malhas.esfera(no["raio"], f, p))
+
+def _triangulos_no(no, nivel):
+    if no["tipo"] == "disco": return detalhe.triangulos_disco(detalhe.NIVEIS_DISCO[nivel])
+    return detalhe.triangulos_esfera(*detalhe.NIVEIS_ESFERA[nivel])
+
+def desenhar_cenario(tempo):
+    global _ligada, _cena
+    _ligada = None   # outros módulos ligam texturas entre um quadro e outro
+    if _cena is None: _cena = _montar_cena()
+
+    # projeção @ vista dá os planos do frustum
+    vista, projecao, altura = render.matrizes_camera()
+    modelos = cena.atualizar(_cena, tempo)
+    visiveis = np.flatnonzero(cena.visiveis(_cena, modelos, projecao @ vista))
+    if not _filhos: visiveis = visiveis[_cena["pai"][visiveis] < 0]
+    _cena["desenhadas"] = (modelos[visiveis, :3, 3], _cena["raio"][visiveis])
+    niveis = _cena["nivel"]
+    niveis[visiveis] = detalhe.escolher(
+        detalhe.raio_projetado(modelos[visiveis, :3, 3], _cena["raio"][visiveis], vista, projecao, altura),
+        niveis[visiveis])
+    if render.programavel():
+        _desenhar_cenario_shader(visiveis, modelos, niveis)
+        return
+    modelos_gl = _cena["modelos_gl"]
+    np.copyto(modelos_gl, modelos.transpose(0, 2, 1))   # coluna-maior
+
+    glPushMatrix()
+    glEnable(GL_TEXTURE_2D)
+    glColor3f(1, 1, 1)
+
+    for i in visiveis:
+        no = _cena["nos"][i]
+        glPushMatrix()
+        glMultMatrixf(modelos_gl[i])
+        _usar_textura(_cfg_textura(no))
+        if no["tipo"] == "disco":
             glEnable(GL_BLEND)
             glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-            if ANEIS_SATURNO["id"]: glBindTexture(GL_TEXTURE_2D, ANEIS_SATURNO["id"])
-            q = gluNewQuadric()
-            gluQuadricTexture(q, GL_TRUE)
-            gluDisk(q, p["raio"] + 0.3, p["raio"] + 1.5, 40, 1)
-            gluDeleteQuadric(q)
+            desenhar_disco(no["interno"], no["externo"], None, detalhe.NIVEIS_DISCO[niveis[i]])
             glDisable(GL_BLEND)
-            glPopMatrix()
-        
+        elif no["emissivo"]:
+            glMaterialfv(GL_FRONT, GL_EMISSION, EMISSAO_SOL)
+            desenhar_esfera(no["raio"], None, *detalhe.NIVEIS_ESFERA[niveis[i]])
+            glMaterialfv(GL_FRONT, GL_EMISSION, SEM_EMISSAO)
+        else:
+            desenhar_esfera(no["raio"], None, *detalhe.NIVEIS_ESFERA[niveis[i]])
         glPopMatrix()
-    
+
+    if _ligada and _ligada[1]:
+        glMatrixMode(GL_TEXTURE); glLoadIdentity(); glMatrixMode(GL_MODELVIEW)
     glDisable(GL_TEXTURE_2D)
-    glPopMatrix()
\ No newline at end of file
+    glPopMatrix()
+
+def esferas_desenhadas():
+    # (centros, raios) das esferas envolventes dos nós desenhados no último desenhar_cenario
+    if _cena is None or "desenhadas" not in _cena: return np.zeros((0, 3)), np.zeros(0)
+    return _cena["desenhadas"]
+
+def _desenhar_cenario_shader(visiveis, modelos, niveis):
+    for i in visiveis:
+        no = _cena["nos"][i]
+        _usar_textura(_cfg_textura(no))
+        if no["blend"]:
+            glEnable(GL_BLEND)
+            glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        render.desenhar(_malha_no(no, niveis[i]), modelos[i], uv=_ligada and _ligada[1],
+                        emissao=1.0 if no["emissivo"] else 0.0)
+        perfil.somar("triangulos", _triangulos_no(no, niveis[i]))
+        if no["blend"]: glDisable(GL_BLEND)
@@ -2,212 +2,291 @@ import pygame
 from pygame.locals import *
 from OpenGL.GL import *
 from OpenGL.GLU import *
-import random
 import math
+import numpy as np
 import fundo
 import menu
+import simulacao
+import meteoros
+import autopiloto
+import cache_fundo
+import captura
+import detalhe
+import instancias
+import latencia
+import matrizes
+import perfil
+import qualidade
+import render
+import replay
+import tabuleiro
+import texturas
+import opcoes
 
 COLS, ROWS = 8, 8
 tamanho_quadrado = 4.0 
 GRID_Y = 5.0 
+VELOCIDADE_CAMERA = 0.06   # unidades por ms no modo observador (1 por quadro a 60 fps)
+ESPERA_DEMO_MS = 3000      # tela final no modo automático antes de recomeçar
 
-def getposition(gx, gz):
-    wx = (gx - (COLS-1)/2.0) * tamanho_quadrado
-    wz = (gz - (ROWS-1)/2.0) * tamanho_quadrado 
+TECLAS = {K_LEFT: simulacao.ESQUERDA, K_RIGHT: simulacao.DIREITA,
+          K_UP: simulacao.CIMA, K_DOWN: simulacao.BAIXO}
+
+def getposition(gx, gz, cols=COLS, rows=ROWS):
+    wx = (gx - (cols-1)/2.0) * tamanho_quadrado
+    wz = (gz - (rows-1)/2.0) * tamanho_quadrado 
     return wx, GRID_Y, wz
 
-def desenhar_nave(texture_id=None):
-    glEnable(GL_TEXTURE_2D) if texture_id else glDisable(GL_TEXTURE_2D)
+def getposition_lote(gx, gz, cols=COLS, rows=ROWS):
+    # Versão vetorizada de getposition: arrays de casas -> array (n, 3) de posições
+    pos = np.empty((len(gx), 3), dtype=np.float32)
+    pos[:, 0] = (gx - (cols-1)/2.0) * tamanho_quadrado
+    pos[:, 1] = GRID_Y
+    pos[:, 2] = (gz - (rows-1)/2.0) * tamanho_quadrado
+    return pos
+
+# Triângulo da nave em GL_T2F_N3F_V3F
+NAVE_VERTICES = [
+    (0.5, 1.0, 0, 1, 0,  0.0, 0.0, -1.5),
+    (0.0, 0.0, 0, 1, 0, -1.0, 0.0,  1.5),
+    (1.0, 0.0, 0, 1, 0,  1.0, 0.0,  1.5),
+]
+
+def desenhar_nave(posicao, texture_id=None):
+    construir = lambda: (np.array(NAVE_VERTICES, dtype=np.float32), None)
     if texture_id: glBindTexture(GL_TEXTURE_2D, texture_id)
+    if render.programavel():
+        render.desenhar(render.obter_malha("nave", construir), matrizes.translacao(*posicao), textura=bool(texture_id))
+        return
+    glPushMatrix()
+    glTranslate(*posicao)
+    glEnable(GL_TEXTURE_2D) if texture_id else glDisable(GL_TEXTURE_2D)
     glColor3f(1, 1, 1)
-    
-    glBegin(GL_TRIANGLES)
-    glNormal3f(0, 1, 0)
-    glTexCoord2f(0.5, 1.0); glVertex3f(0.0, 0.0, -1.5)
-    glTexCoord2f(0.0, 0.0); glVertex3f(-1.0, 0.0, 1.5)
-    glTexCoord2f(1.0, 0.0); glVertex3f(1.0, 0.0, 1.5)
-    glEnd()
+    glCallList(fundo.obter_malha("nave", construir))
     glDisable(GL_TEXTURE_2D)
+    glPopMatrix()
 
-def visualizar_mapa(display):
-    clock = pygame.time.Clock()
+def visualizar_mapa(display, relogio=None):
+    clock = relogio or pygame.time.Clock()
     cam_x, cam_y, cam_z = 0, 30, 60
     tempo = 0
     while True:
-        clock.tick(60)
-        tempo += 0.5
+        dt = clock.tick()
+        tempo += dt * fundo.TEMPO_POR_MS
+        passo = dt * VELOCIDADE_CAMERA
+        perfil.marcar("eventos")
         for event in pygame.event.get():
             if event.type == QUIT: return False 
             if event.type == KEYDOWN and event.key == K_ESCAPE: return True 
+            if event.type == KEYDOWN and event.key == K_F3: perfil.alternar_overlay()
 
         keys = pygame.key.get_pressed()
-        if keys[K_LEFT]: cam_x -= 1
-        if keys[K_RIGHT]: cam_x += 1
-        if keys[K_UP]: cam_z -= 1
-        if keys[K_DOWN]: cam_z += 1
-        if keys[K_w]: cam_y -= 1 
-        if keys[K_s]: cam_y += 1 
+        if keys[K_LEFT]: cam_x -= passo
+        if keys[K_RIGHT]: cam_x += passo
+        if keys[K_UP]: cam_z -= passo
+        if keys[K_DOWN]: cam_z += passo
+        if keys[K_w]: cam_y -= passo
+        if keys[K_s]: cam_y += passo
+
+        perfil.marcar("texturas")
+        texturas.processar()
 
+        perfil.marcar("cenario")
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        glLoadIdentity(); gluPerspective(45, (display[0]/display[1]), 0.1, 400.0)
-        glMatrixMode(GL_MODELVIEW); glLoadIdentity()
-        gluLookAt(cam_x, cam_y, cam_z, cam_x, 0, cam_z - 40, 0, 1, 0)
+        render.camera(display, 45, 0.1, 400.0, (cam_x, cam_y, cam_z), (cam_x, 0, cam_z - 40))
 
-        fundo.desenhar_cenario(tempo)
+        cache_fundo.desenhar(tempo, dt, display)
         
-        glDisable(GL_TEXTURE_2D); glColor3f(0, 1, 0)
-        glBegin(GL_LINES)
-        sz = ROWS * tamanho_quadrado
-        sx = COLS * tamanho_quadrado
-        start_x, start_z = -sx/2, -sz/2
-        for i in range(COLS + 1):
-            glVertex3f(start_x + i*tamanho_quadrado, GRID_Y, start_z)
-            glVertex3f(start_x + i*tamanho_quadrado, GRID_Y, start_z + sz)
-        for i in range(ROWS + 1):
-            glVertex3f(start_x, GRID_Y, start_z + i*tamanho_quadrado)
-            glVertex3f(start_x + sx, GRID_Y, start_z + i*tamanho_quadrado)
-        glEnd()
+        perfil.marcar("grade")
+        fundo.desenhar_grade(COLS, ROWS, tamanho_quadrado, GRID_Y)
 
+        perfil.marcar("hud")
         menu.desenhar_texto("MODO OBSERVADOR", 10, display[1]-40, display, 32, (0,255,255,255))
+        perfil.desenhar_overlay(display)
+        perfil.marcar("flip")
+        captura.quadro()
         pygame.display.flip()
+        perfil.fim_quadro()
 
-def loop_jogo(display, duracao, nivel):
-    ship_x, ship_z = 4, 0
-    meteoros = []
-    state = "jogando"
-    start_t = pygame.time.get_ticks()
-    last_spawn = 0
-    move_timer = 0
+def loop_jogo(display, duracao, nivel, semente=None, relogio=None, replays=None, reproducao=None,
+              cols=COLS, rows=ROWS, automatico=False):
+    # replays: pasta onde a partida é gravada ao sair (None = não grava)
+    # reproducao: replay.novo_reprodutor(...); as entradas vêm dele em vez do teclado
+    # cols, rows: tabuleiros maiores que 8x8 usam a câmera que segue a nave
+    # automatico: o autopiloto joga e, no fim, a partida recomeça sozinha (modo demonstração)
+    jogo = simulacao.nova_partida(nivel, duracao, semente, cols, rows)
+    gravacao = replay.novo_gravador(jogo)
+    if reproducao is not None: reproducao["jogo"] = jogo
     tempo_fundo = 0
-    clock = pygame.time.Clock()
+    clock = relogio or pygame.time.Clock()
+    # A simulação anda em ticks fixos de TICK_MS, independente da taxa de quadros: as
+    # teclas do quadro ficam pendentes até o próximo tick, e o que sobra no acumulador
+    # vira a fração de interpolação do desenho
+    pendentes, acumulado = [], 0
+    nave_anterior = (jogo["ship_x"], jogo["ship_z"])
+    segue = tabuleiro.grande(cols, rows)
+    nx, _, nz = getposition(jogo["ship_x"], jogo["ship_z"], cols, rows)
+    alvo, regiao = (nx, 0.0, nz), None
+    piloto = autopiloto.politica() if automatico else None
+    fim_ms = 0   # tempo na tela final, para o recomeço automático
+    hud, hud_tempo = None, None   # o texto do HUD só é refeito quando o tempo restante muda
 
-    tex_meteoro = fundo.METEORO_CFG["id"]
-    tex_nave = fundo.NAVE_CFG["id"]
+    try:
+        while True:
+            dt = clock.tick()
+            tempo_fundo += dt * fundo.TEMPO_POR_MS
+            now = pygame.time.get_ticks()
 
-    while True:
-        dt = clock.tick(60)
-        tempo_fundo += 0.5
-        now = pygame.time.get_ticks()
-        
-        if state == "jogando":
-            time_left = max(0, duracao - int((now - start_t) / 1000.0))
-            if time_left == 0: state = "Vitoria"
-
-        for event in pygame.event.get():
-            if event.type == QUIT: return False
-            if event.type == KEYDOWN:
-                if state == "jogando":
-                    if event.key == K_ESCAPE: return "MENU"
-                    if event.key == K_LEFT and ship_x > 0: ship_x -= 1
-                    if event.key == K_RIGHT and ship_x < COLS-1: ship_x += 1
-                    if event.key == K_UP and ship_z > 0: ship_z -= 1
-                    if event.key == K_DOWN and ship_z < ROWS-1: ship_z += 1
-                else:
+            perfil.marcar("eventos")
+            for event in pygame.event.get():
+                if event.type == QUIT: return False
+                if event.type == KEYDOWN:
                     if event.key == K_ESCAPE: return "MENU"
-                    if event.key in (K_RETURN, K_KP_ENTER): return "RESTART"
+                    if event.key == K_F3: perfil.alternar_overlay()
+                    if jogo["state"] == "jogando":
+                        if event.key in TECLAS and reproducao is None and piloto is None:
+                            pendentes.append(TECLAS[event.key])
+                            latencia.evento(event)
+                    elif event.key in (K_RETURN, K_KP_ENTER): return "RESTART"
 
-        if state == "jogando":
-            if now - last_spawn > (800 if nivel < 3 else 400):
-                meteoros.append({'x': random.randint(0, COLS-1), 'z': ROWS, 'dx':0, 'dz':-1})
-                if nivel >= 2 and random.choice([True, False]):
-                    lado = random.choice([0, 1]) 
-                    
-                    if lado == 0: 
-                        start_x = -1
-                        move_x = 1
-                    else:         
-                        start_x = COLS
-                        move_x = -1
-                        
-                    meteoros.append({
-                        'x': start_x, 
-                        'z': random.randint(0, ROWS-1), 
-                        'dx': move_x, 
-                        'dz': 0
-                    })
-                
-                last_spawn = now
-            
-            move_timer += dt
-            if move_timer > 200:
-                move_timer = 0
-                for m in meteoros:
-                    m['x'] += m['dx']; m['z'] += m['dz']
-                    if m['x'] == ship_x and m['z'] == ship_z: state = "Derrota"
-                meteoros = [m for m in meteoros if -2 <= m['z'] <= ROWS+1 and -2 <= m['x'] <= COLS+1]
+            perfil.marcar("simulacao")
+            acumulado = min(acumulado + dt, simulacao.ATRASO_MAX_MS)
+            while acumulado >= simulacao.TICK_MS:
+                if reproducao is not None:
+                    if replay.terminou(reproducao): return "MENU"
+                    pendentes = replay.proximas_entradas(reproducao)
+                elif piloto is not None:
+                    pendentes = list(piloto(jogo))
+                nave_anterior = (jogo["ship_x"], jogo["ship_z"])
+                replay.registrar(gravacao, pendentes)
+                simulacao.step(jogo, pendentes, simulacao.TICK_MS)
+                if pendentes: latencia.entradas_aplicadas()
+                pendentes = []
+                acumulado -= simulacao.TICK_MS
+            # Em baixa latência a nave aparece já na casa simulada, sem esperar a interpolação
+            alfa = 1.0 if latencia.baixa() else acumulado / simulacao.TICK_MS
+            state = jogo["state"]
+            ship_x = nave_anterior[0] + (jogo["ship_x"] - nave_anterior[0]) * alfa
+            ship_z = nave_anterior[1] + (jogo["ship_z"] - nave_anterior[1]) * alfa
+            time_left = simulacao.tempo_restante(jogo)
+            if state != "jogando" and piloto is not None:
+                fim_ms += dt
+                if fim_ms >= ESPERA_DEMO_MS: return "RESTART"
 
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-        glLoadIdentity(); gluPerspective(45, (display[0]/display[1]), 0.1, 200.0)
-        glMatrixMode(GL_MODELVIEW); glLoadIdentity()
-        gluLookAt(0, 30, 50, 0, 0, 0, 0, 1, 0)
+            perfil.marcar("texturas")
+            texturas.processar()
+
+            perfil.marcar("cenario")
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+            render.camera(display, 45, 0.1, 200.0, (0, 30, 50), (0, 0, 0))
 
-        fundo.desenhar_cenario(tempo_fundo)
+            cache_fundo.desenhar(tempo_fundo, dt, display, profundidade=not segue)
+            if segue:
+                # O sistema solar fica parado ao fundo e o tabuleiro passa por cima dele
+                nx, _, nz = getposition(ship_x, ship_z, cols, rows)
+                alvo = tabuleiro.seguir(alvo, (nx, 0.0, nz), dt)
+                glClear(GL_DEPTH_BUFFER_BIT)
+                render.camera(display, 45, 0.1, 200.0, tabuleiro.olho(alvo), alvo)
+                vista, projecao, _ = render.matrizes_camera()
+                regiao = tabuleiro.casas_visiveis(tabuleiro.regiao_visivel(projecao @ vista, GRID_Y),
+                                                  cols, rows, tamanho_quadrado)
         
-        glDisable(GL_TEXTURE_2D); glColor3f(0, 1, 0)
-        glBegin(GL_LINES)
-        sz, sx = ROWS * tamanho_quadrado, COLS * tamanho_quadrado
-        st_x, st_z = -sx/2, -sz/2
-        for i in range(COLS+1): glVertex3f(st_x+i*tamanho_quadrado, GRID_Y, st_z); glVertex3f(st_x+i*tamanho_quadrado, GRID_Y, st_z+sz)
-        for i in range(ROWS+1): glVertex3f(st_x, GRID_Y, st_z+i*tamanho_quadrado); glVertex3f(st_x+sx, GRID_Y, st_z+i*tamanho_quadrado)
-        glEnd()
-
-        if state != "Derrota" or (now % 500 < 250):
-            nx, ny, nz = getposition(ship_x, ship_z)
-            glPushMatrix()
-            glTranslate(nx, ny + math.sin(tempo_fundo*0.1)*0.2, nz)
-            desenhar_nave(tex_nave)
-            glPopMatrix()
-
-        glEnable(GL_TEXTURE_2D) 
-        for m in meteoros:
-            mx, my, mz = getposition(m['x'], m['z'])
-            glPushMatrix()
-            glTranslate(mx, my, mz)
-            fundo.desenhar_esfera(1.0, tex_meteoro)
-            glPopMatrix()
-        glDisable(GL_TEXTURE_2D)
-
-        if state == "jogando":
-            menu.desenhar_texto(f"Tempo: {time_left}s | Nivel: {nivel}", 10, display[1]-40, display)
-        else:
-            # tela final
-            cx, cy = display[0]//2, display[1]//2
-            msg = "VITORIA!" if state == "Vitoria" else "GAME OVER"
-            c = (0, 255, 0, 255) if state == "Vitoria" else (255, 0, 0, 255)
-            menu.desenhar_texto(msg, cx-80, cy+50, display, 60, c)
-            menu.desenhar_texto("[ENTER] Jogar Novamente", cx-140, cy-20, display)
-            menu.desenhar_texto("[ESC] Voltar ao Menu", cx-110, cy-60, display, 24, (200, 200, 200, 255))
+            perfil.marcar("grade")
+            fundo.desenhar_grade(cols, rows, tamanho_quadrado, GRID_Y, regiao=regiao)
 
-        pygame.display.flip()
+            perfil.marcar("nave")
+            if state != "Derrota" or (now % 500 < 250):
+                nx, ny, nz = getposition(ship_x, ship_z, cols, rows)
+                desenhar_nave((nx, ny + math.sin(tempo_fundo*0.1)*0.2, nz), fundo.NAVE_CFG["id"])
+
+            perfil.marcar("meteoros")
+            glEnable(GL_TEXTURE_2D)
+            m = jogo["meteoros"]
+            visiveis = slice(None) if regiao is None else meteoros.na_regiao(m, *regiao)
+            xs, zs = simulacao.meteoros_interpolados(jogo, simulacao.TICK_MS - acumulado, visiveis)
+            posicoes = getposition_lote(xs, zs, cols, rows)
+            vista, projecao, altura = render.matrizes_camera()
+            niveis = m["nivel"][:m["n"]]
+            niveis[visiveis] = detalhe.escolher(detalhe.raio_projetado(posicoes, 1.0, vista, projecao, altura),
+                                                niveis[visiveis])
+            instancias.desenhar_meteoros(posicoes, fundo.METEORO_CFG["id"], niveis=niveis[visiveis])
+            glDisable(GL_TEXTURE_2D)
+
+            perfil.marcar("hud")
+            if state == "jogando":
+                if time_left != hud_tempo:
+                    hud, hud_tempo = f"Tempo: {time_left}s | Nivel: {nivel}" + (" | AUTOPILOTO" if piloto else ""), time_left
+                menu.desenhar_texto(hud, 10, display[1]-40, display, dinamico=True)
+            else:
+                # tela final
+                cx, cy = display[0]//2, display[1]//2
+                msg = "VITORIA!" if state == "Vitoria" else "GAME OVER"
+                c = (0, 255, 0, 255) if state == "Vitoria" else (255, 0, 0, 255)
+                menu.desenhar_texto(msg, cx-80, cy+50, display, 60, c)
+                menu.desenhar_texto("[ENTER] Jogar Novamente", cx-140, cy-20, display)
+                menu.desenhar_texto("[ESC] Voltar ao Menu", cx-110, cy-60, display, 24, (200, 200, 200, 255))
+            perfil.desenhar_overlay(display)
 
-def main():
+            perfil.marcar("flip")
+            captura.quadro()
+            latencia.antes_flip()
+            pygame.display.flip()
+            latencia.apos_flip()
+            perfil.fim_quadro()
+    finally:
+        if replays: replay.salvar(gravacao, replays)
+
+
+def main(argv=None):
+    args = opcoes.ler_argumentos(argv)
     pygame.init()
     display = (1280, 720)
-    pygame.display.set_mode(display, DOUBLEBUF | OPENGL)
+    opcoes.abrir_janela(display, args.vsync)
     pygame.display.set_caption("Space Dodge")
 
+    render.iniciar(args.render)
+    cache_fundo.configurar(args.cache_fundo, args.cache_fundo_escala, args.cache_fundo_hz)
     fundo.init_opengl()
-    fundo.init_all_textures() 
+    fundo.init_all_textures(progressivo=opcoes.PROGRESSIVO[args.texturas], orcamento_mb=args.orcamento_texturas)
+    if args.perfil: perfil.ativar(saida=args.perfil_saida)
+    if args.qualidade: qualidade.ativar(args.qualidade_alvo)
+    if args.latencia: latencia.ativar()
+    latencia.configurar(args.baixa_latencia, args.fila_gpu)
+    if args.gravar: captura.ativar(args.gravar, display, args.gravar_formato, args.gravar_fps, args.gravar_comando)
+    relogio = opcoes.relogio(args.fps, args.baixa_latencia, 1000.0 / args.hz_monitor if args.vsync else None)
+    tabuleiro_jogo = tuple(args.tabuleiro)
 
-    while True:
-        res = menu.executar(display)
-        if not res or res[0] is None: break
-        cmd, tempo, nivel = res
-        
-        if cmd == "JOGAR":
-            while True: 
-                status = loop_jogo(display, tempo, nivel)
-                
-                if status == "MENU": 
-                    break 
-                elif status == False: 
-                    pygame.quit() 
-                    return
-                
-        elif cmd == "MAPA":
-            if not visualizar_mapa(display): break 
+    try:
+        while True:
+            res = menu.executar(display, relogio, tabuleiro_jogo)
+            if not res or res[0] is None: break
+            cmd, tempo, nivel, tabuleiro_jogo = res
             
-    pygame.quit()
+            if cmd == "JOGAR":
+                while True: 
+                    status = loop_jogo(display, tempo, nivel, relogio=relogio, replays=args.replays or None,
+                                       cols=tabuleiro_jogo[0], rows=tabuleiro_jogo[1], automatico=args.autopiloto)
+                    
+                    if status == "MENU": 
+                        break 
+                    elif status == False: 
+                        return
+                    
+            elif cmd == "MAPA":
+                if not visualizar_mapa(display, relogio): break 
+    finally:
+        texturas.encerrar()
+        caminho = perfil.exportar()
+        if caminho: print(f"Perfil gravado em {caminho}")
+        if args.latencia: print(latencia.texto_resumo())
+        if captura.ativo():
+            captura.encerrar()
+            print(captura.texto_resumo())
+        resumo = qualidade.resumo()
+        if resumo:
+            print(f"qualidade: nível estável {resumo['nivel_estavel']}, final {resumo['nivel_final']}, "
+                  f"{resumo['trocas']} trocas")
+        pygame.quit()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
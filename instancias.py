@@ -0,0 +1,175 @@
+from OpenGL.GL import *
+from OpenGL.GL import shaders
+import ctypes
+import numpy as np
+import detalhe
+import malhas
+import perfil
+import render
+
+# Todos os meteoros em uma chamada de desenho por nível de detalhe: uma malha de esfera
+# compartilhada por nível e um buffer com a posição de cada instância. Sem suporte a
+# shaders/instancing, cai para um lote montado na CPU (ainda um glDrawElements por nível).
+
+# Mesmos locais de atributo das malhas do render (0-3) e o deslocamento da instância em 4
+VERTEX_SHADER = """
+#version 330
+layout(location = 0) in vec3 posicao;
+layout(location = 1) in vec3 normal;
+layout(location = 2) in vec2 texcoord;
+layout(location = 3) in vec4 cor;
+layout(location = 4) in vec3 deslocamento;
+uniform mat4 vista;
+uniform mat4 projecao;
+uniform vec3 luz;
+uniform float ambiente;
+uniform float difusa;
+out vec4 cor_vertice;
+out vec2 st;
+void main() {
+    gl_Position = projecao * vista * vec4(posicao + deslocamento, 1.0);
+    st = texcoord;
+
+    // Mesma iluminação do pipeline fixo: GL_LIGHT0 + GL_COLOR_MATERIAL
+    vec3 n = normalize(mat3(vista) * normal);
+    vec3 c = cor.rgb * (ambiente + difusa * max(dot(n, luz), 0.0));
+    cor_vertice = vec4(clamp(c, 0.0, 1.0), cor.a);
+}
+"""
+LOC_DESLOCAMENTO = 4
+
+_estado = None
+
+def _suporta_instancing():
+    try:
+        major, minor = map(int, glGetString(GL_VERSION).split()[0].split(b".")[:2])
+    except Exception:
+        return False
+    return (major, minor) >= (3, 3) and bool(glDrawElementsInstanced) and bool(glVertexAttribDivisor)
+
+def liberar():
+    global _estado
+    if _estado and _estado["programa"]:
+        glDeleteBuffers(1, [_estado["instancias"]])
+        for malha in _estado["malhas"]:
+            glDeleteVertexArrays(1, [malha["vao"]])
+            glDeleteBuffers(2, [malha["vbo"], malha["ibo"]])
+        glDeleteProgram(_estado["programa"])
+    _estado = None
+
+def _iniciar(raio):
+    # Uma malha por nível de detalhe.NIVEIS_ESFERA, todas com o mesmo raio
+    global _estado
+    liberar()
+    _estado = {"raio": raio, "programa": None,
+               "malhas": [dict(zip(("dados", "indices"), malhas.esfera(raio, f, p))) for f, p in detalhe.NIVEIS_ESFERA]}
+    if not _suporta_instancing(): return
+
+    try:
+        programa = shaders.compileProgram(
+            shaders.compileShader(VERTEX_SHADER, GL_VERTEX_SHADER),
+            shaders.compileShader(render.FRAGMENT, GL_FRAGMENT_SHADER))
+    except Exception as e:
+        print(f"Instancing indisponível, usando lote na CPU: {e}")
+        return
+
+    instancias = glGenBuffers(1)
+    for malha in _estado["malhas"]:
+        malha["vao"] = glGenVertexArrays(1)
+        malha["vbo"], malha["ibo"] = glGenBuffers(2)
+        glBindVertexArray(malha["vao"])
+        glBindBuffer(GL_ARRAY_BUFFER, malha["vbo"])
+        glBufferData(GL_ARRAY_BUFFER, malha["dados"].nbytes, malha["dados"], GL_STATIC_DRAW)
+        render.configurar_atributos(GL_T2F_N3F_V3F)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, malha["ibo"])
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, malha["indices"].nbytes, malha["indices"], GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, instancias)
+        glEnableVertexAttribArray(LOC_DESLOCAMENTO)
+        glVertexAttribDivisor(LOC_DESLOCAMENTO, 1)
+    glBindVertexArray(0)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+
+    locais = {u: glGetUniformLocation(programa, u) for u in ("vista", "projecao", "textura", "usar_textura")}
+    glUseProgram(programa)
+    glUniform3f(glGetUniformLocation(programa, "luz"), *render.LUZ_DIRECAO)
+    glUniform1f(glGetUniformLocation(programa, "ambiente"), render.LUZ_AMBIENTE + render.AMBIENTE_GLOBAL)
+    glUniform1f(glGetUniformLocation(programa, "difusa"), render.LUZ_DIFUSA)
+    glUniform1i(locais["textura"], 0)
+    glUseProgram(0)
+    _estado.update({"programa": programa, "instancias": instancias, "locais": locais})
+
+def _desenhar_instanciado(posicoes, tex_id, grupos, cor):
+    e = _estado
+    vista, projecao, _ = render.matrizes_camera()
+    glUseProgram(e["programa"])
+    glUniformMatrix4fv(e["locais"]["vista"], 1, GL_TRUE, vista.astype(np.float32))
+    glUniformMatrix4fv(e["locais"]["projecao"], 1, GL_TRUE, projecao.astype(np.float32))
+    glUniform1i(e["locais"]["usar_textura"], 1 if tex_id else 0)
+    render.usar_cor(cor)
+
+    # Buffer de instâncias reenviado inteiro a cada quadro (orphaning), já ordenado por
+    # nível: cada nível desenha uma faixa contígua dele
+    glBindBuffer(GL_ARRAY_BUFFER, e["instancias"])
+    glBufferData(GL_ARRAY_BUFFER, posicoes.nbytes, posicoes, GL_STREAM_DRAW)
+
+    for nivel, inicio, n in grupos:
+        malha = e["malhas"][nivel]
+        glBindVertexArray(malha["vao"])
+        glVertexAttribPointer(LOC_DESLOCAMENTO, 3, GL_FLOAT, GL_FALSE, 0, ctypes.c_void_p(inicio * posicoes.itemsize * 3))
+        glDrawElementsInstanced(GL_TRIANGLES, len(malha["indices"]), GL_UNSIGNED_INT, None, n)
+
+    glBindVertexArray(0)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glUseProgram(0)
+
+def _lote(malha, n):
+    # Cópias da malha e índices para n meteoros, guardados entre quadros: só as posições
+    # são reescritas. A capacidade dobra quando falta, como em meteoros.py
+    cap = malha.get("capacidade", 0)
+    if cap < n:
+        while cap < n: cap = max(16, cap * 2)
+        dados, indices = malha["dados"], malha["indices"]
+        malha["lote"] = np.repeat(dados[None], cap, axis=0)
+        malha["lote_indices"] = (indices[None, :] + (np.arange(cap, dtype=np.uint32) * len(dados))[:, None]).ravel()
+        malha["capacidade"] = cap
+    return malha["lote"][:n], malha["lote_indices"][:n * len(malha["indices"])]
+
+def _desenhar_lote(posicoes, tex_id, grupos):
+    # Pipeline fixo: replica a malha deslocada para cada meteoro e desenha cada nível junto
+    for nivel, inicio, n in grupos:
+        malha = _estado["malhas"][nivel]
+        lote, idx = _lote(malha, n)
+        np.add(malha["dados"][None, :, 5:8], posicoes[inicio:inicio + n, None, :], out=lote[:, :, 5:8])
+
+        glPushClientAttrib(GL_CLIENT_VERTEX_ARRAY_BIT)
+        glInterleavedArrays(GL_T2F_N3F_V3F, 0, lote)
+        glDrawElements(GL_TRIANGLES, len(idx), GL_UNSIGNED_INT, idx)
+        glPopClientAttrib()
+
+def desenhar_meteoros(posicoes, tex_id, raio=1.0, niveis=None):
+    # posicoes: array (n, 3) float32 com o centro de cada meteoro no mundo
+    # niveis: índice em detalhe.NIVEIS_ESFERA de cada meteoro (None = todos no nível 0)
+    # A câmera vem de render.matrizes_camera(); a cor é a corrente do GL, como era com
+    # glColor no pipeline fixo (branca no backend de shaders, que não usa glColor)
+    if _estado is None or _estado["raio"] != raio:
+        _iniciar(raio)
+    if len(posicoes) == 0: return
+
+    if tex_id: glBindTexture(GL_TEXTURE_2D, tex_id)
+    posicoes = np.ascontiguousarray(posicoes, dtype=np.float32)
+    if niveis is None:
+        grupos = [(0, 0, len(posicoes))]
+    else:
+        ordem = np.argsort(niveis, kind="stable")
+        posicoes = posicoes[ordem]
+        contagem = np.bincount(niveis, minlength=len(detalhe.NIVEIS_ESFERA))
+        inicios = np.cumsum(contagem) - contagem
+        grupos = [(k, int(inicios[k]), int(contagem[k])) for k in np.flatnonzero(contagem)]
+
+    for nivel, _, n in grupos:
+        perfil.somar("triangulos", n * detalhe.triangulos_esfera(*detalhe.NIVEIS_ESFERA[nivel]))
+    if _estado["programa"]:
+        _desenhar_instanciado(posicoes, tex_id, grupos, glGetFloatv(GL_CURRENT_COLOR))
+    else:
+        _desenhar_lote(posicoes, tex_id, grupos)
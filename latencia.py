@@ -0,0 +1,259 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+import numpy as np
+
+# Latência da tecla até a tela. Cada tecla que vira entrada guarda o instante do evento;
+# o tick que a aplica e a troca de buffers que primeiro mostra o resultado completam a
+# amostra (evento -> tick -> tela). Eventos reais do pygame não trazem horário, então
+# contam a partir de quando saem da fila; os injetados (main() abaixo) trazem o do post.
+#
+# Modo de baixa latência (--baixa-latencia): o relógio dorme antes de ler a entrada em
+# vez de o flip esperar depois dela. Termina a GPU antes da troca (glFinish), mede quanto
+# o quadro leva e acorda só a tempo de ler, simular e desenhar até o próximo vsync (ou
+# limite de --fps). A nave é desenhada na posição simulada, sem a interpolação do tick.
+# --fila-gpu N limita os quadros enfileirados no driver com fences, em qualquer modo.
+#
+#   python latencia.py --modos normal baixa --vsync-simulado 60 --segundos 20
+
+MARGEM_MS = 2.0   # folga entre o fim estimado do quadro e o vsync
+JANELA = 60       # quadros usados na estimativa do tempo de trabalho
+
+_ativo = False
+_l = None
+# Pacing e fila: valem mesmo sem a medição ligada
+_m = {"baixa": False, "fila_max": None, "fila": deque(), "inicio": None, "antes_flip": None,
+      "fim_flip": None, "trabalho": deque(maxlen=JANELA)}
+
+def ativar():
+    global _ativo, _l
+    _l = {"pendentes": [], "aplicados": [], "amostras": []}
+    _ativo = True
+
+def desativar():
+    global _ativo
+    _ativo = False
+
+def configurar(baixa=False, fila_max=None):
+    _m.update(baixa=baixa, fila_max=fila_max)
+    _m["trabalho"].clear()
+
+def baixa():
+    return _m["baixa"]
+
+def evento(ev):
+    # KEYDOWN que virou entrada pendente
+    if _ativo: _l["pendentes"].append(getattr(ev, "t", None) or time.perf_counter())
+
+def entradas_aplicadas():
+    # Chamado no tick que aplicou as entradas pendentes
+    if not _ativo or not _l["pendentes"]: return
+    agora = time.perf_counter()
+    _l["aplicados"].extend((t, agora) for t in _l["pendentes"])
+    _l["pendentes"].clear()
+
+def antes_flip():
+    if _m["baixa"]:
+        from OpenGL.GL import glFinish
+        glFinish()   # o flip passa a esperar só o vsync, e o trabalho medido é o real
+    _m["antes_flip"] = time.perf_counter()
+
+def apos_flip():
+    agora = time.perf_counter()
+    if _m["inicio"] is not None and _m["antes_flip"] is not None:
+        _m["trabalho"].append((_m["antes_flip"] - _m["inicio"]) * 1000.0)
+    _m["fim_flip"] = agora
+    if _m["fila_max"] is not None: _limitar_fila(_m["fila_max"])
+    if _ativo and _l["aplicados"]:
+        _l["amostras"].extend((t0, t1, agora) for t0, t1 in _l["aplicados"])
+        _l["aplicados"].clear()
+
+def _limitar_fila(n):
+    # No máximo n quadros ainda não terminados pela GPU depois da troca (0 = glFinish)
+    from OpenGL.GL import (glFenceSync, glClientWaitSync, glDeleteSync, glFinish,
+                           GL_SYNC_GPU_COMMANDS_COMPLETE, GL_SYNC_FLUSH_COMMANDS_BIT)
+    if n == 0 or not bool(glFenceSync):
+        glFinish()
+        return
+    fila = _m["fila"]
+    fila.append(glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0))
+    while len(fila) > n:
+        antiga = fila.popleft()
+        glClientWaitSync(antiga, GL_SYNC_FLUSH_COMMANDS_BIT, 1_000_000_000)
+        glDeleteSync(antiga)
+
+def relogio(periodo_ms, vsync=False):
+    # Relógio do modo de baixa latência, no lugar do de opcoes.relogio. periodo_ms: 1000/fps
+    # ou o do monitor com vsync (None = sem limite, nada a esperar). Se o laço não marcou o
+    # flip (menu, mapa), faz o mesmo que o Clock.tick: completa o período desde o último tick.
+    # Sem vsync nada segura o flip, então o período desde o último tick também é o mínimo
+    r = {"ultimo": time.perf_counter(), "trabalho": 0}
+    def tick():
+        agora = time.perf_counter()
+        if periodo_ms:
+            acordar = r["ultimo"] + periodo_ms / 1000.0
+            if _m["fim_flip"] is not None and _m["trabalho"]:
+                trabalho = float(np.percentile(_m["trabalho"], 90))
+                antes = _m["fim_flip"] + (periodo_ms - trabalho - MARGEM_MS) / 1000.0
+                acordar = antes if vsync else max(antes, acordar)
+            if acordar > agora:
+                time.sleep(acordar - agora)
+                agora = time.perf_counter()
+        dt = round((agora - r["ultimo"]) * 1000.0)
+        r["trabalho"] = _m["trabalho"][-1] if _m["fim_flip"] is not None and _m["trabalho"] else dt
+        r["ultimo"] = _m["inicio"] = agora
+        _m["fim_flip"] = _m["antes_flip"] = None
+        return dt
+    # trabalho(): ms do último quadro sem a espera, para o governador de qualidade
+    return SimpleNamespace(tick=tick, trabalho=lambda: r["trabalho"])
+
+def amostras():
+    # (n, 3) em ms: evento -> tick, tick -> tela, evento -> tela
+    a = np.asarray(_l["amostras"] if _l else [], dtype=float).reshape(-1, 3)
+    return np.stack((a[:, 1] - a[:, 0], a[:, 2] - a[:, 1], a[:, 2] - a[:, 0]), axis=1) * 1000.0
+
+def percentis():
+    a = amostras()
+    if not len(a): return None
+    return {"amostras": len(a), **{nome: {"media": float(col.mean()),
+                                          **{f"p{p}": float(np.percentile(col, p)) for p in (50, 95, 99)},
+                                          "max": float(col.max())}
+                                   for nome, col in zip(("evento_tick", "tick_tela", "evento_tela"), a.T)}}
+
+def texto_resumo():
+    r = percentis()
+    if not r: return "latência: nenhuma tecla medida"
+    t = r["evento_tela"]
+    return (f"latência tecla -> tela ({r['amostras']} teclas): p50 {t['p50']:.1f} ms, p95 {t['p95']:.1f} ms, "
+            f"p99 {t['p99']:.1f} ms (até o tick p50 {r['evento_tick']['p50']:.1f} ms)")
+
+# --- Medição sem janela ---------------------------------------------------------
+
+def _injetar(parar, segundos, semente, intervalo_ms):
+    # Teclas de movimento em instantes aleatórios, com o horário do post; ENTER de tempos
+    # em tempos recomeça depois de uma derrota; ESC no fim volta ao "menu" e encerra
+    import pygame
+    rng = np.random.default_rng(semente)
+    teclas = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_DOWN)
+    fim = time.perf_counter() + segundos
+    proximo_enter = time.perf_counter() + 1.0
+    while time.perf_counter() < fim and not parar.is_set():
+        time.sleep(rng.uniform(*intervalo_ms) / 1000.0)
+        agora = time.perf_counter()
+        pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=int(rng.choice(teclas)), t=agora))
+        if agora >= proximo_enter:
+            pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_RETURN))
+            proximo_enter = agora + 1.0
+    pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_ESCAPE))
+
+def _vsync_simulado(hz):
+    # Troca de buffers bloqueante como a de um monitor a hz: termina a GPU e espera o
+    # próximo múltiplo do período (o instante em que o quadro iria para a tela)
+    import pygame
+    from OpenGL.GL import glFinish
+    original, periodo, origem = pygame.display.flip, 1.0 / hz, time.perf_counter()
+    def flip():
+        original()
+        glFinish()
+        agora = time.perf_counter()
+        time.sleep(periodo - (agora - origem) % periodo)
+    pygame.display.flip = flip
+    return original
+
+def medir(args, modo):
+    import pygame
+    import opcoes
+    jogo_mod = __import__(args.modulo)
+    configurar(modo == "baixa", args.fila_gpu)
+    ativar()
+    original = _vsync_simulado(args.vsync_simulado) if args.vsync_simulado else None
+    periodo_vsync = 1000.0 / args.vsync_simulado if args.vsync_simulado else None
+    clock = opcoes.relogio(args.fps, modo == "baixa", periodo_vsync)
+    parar = threading.Event()
+    pygame.event.clear()
+    injetor = threading.Thread(target=_injetar, args=(parar, args.segundos, args.semente, args.intervalo_ms))
+    injetor.start()
+    quadros, inicio = [0], time.perf_counter()
+    flip = pygame.display.flip
+    def contar():
+        flip()
+        quadros[0] += 1
+    pygame.display.flip = contar
+    try:
+        semente = args.semente
+        while jogo_mod.loop_jogo(args.display, 3600, args.nivel, semente, clock) == "RESTART":
+            semente += 1
+    finally:
+        parar.set()
+        injetor.join()
+        pygame.display.flip = original or flip
+    resultado = percentis() or {"amostras": 0}
+    resultado["fps"] = quadros[0] / (time.perf_counter() - inicio)
+    desativar()
+    return resultado
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latência tecla -> tela do Space Dodge, sem janela")
+    parser.add_argument("--modos", nargs="+", default=["normal", "baixa"], choices=("normal", "baixa"))
+    parser.add_argument("--modulo", default="game", choices=("game", "b2"))
+    parser.add_argument("--nivel", type=int, default=1, choices=(1, 2, 3))
+    parser.add_argument("--segundos", type=float, default=15.0, help="duração da injeção em cada modo")
+    parser.add_argument("--intervalo-ms", type=float, nargs=2, default=(80.0, 250.0), metavar=("MIN", "MAX"),
+                        help="intervalo aleatório entre teclas injetadas")
+    parser.add_argument("--fps", type=int, default=0, help="limite de quadros (como no jogo)")
+    parser.add_argument("--vsync-simulado", type=float, metavar="HZ",
+                        help="o flip bloqueia até o próximo vsync de um monitor a HZ")
+    parser.add_argument("--fila-gpu", type=int, metavar="N", help="máximo de quadros enfileirados no driver")
+    parser.add_argument("--software", action="store_true", help="força o rasterizador de software do Mesa")
+    parser.add_argument("--semente", type=int, default=1234)
+    parser.add_argument("--saida", help="arquivo JSON com o resultado (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    # Antes de importar pygame/OpenGL, como no benchmark.py
+    os.environ.setdefault("SDL_VIDEODRIVER", "offscreen")
+    os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+    if args.software:
+        os.environ["LIBGL_ALWAYS_SOFTWARE"] = "1"
+        os.environ.setdefault("GALLIUM_DRIVER", "llvmpipe")
+    import pygame
+    import fundo
+    import opcoes
+    import render
+    import texturas
+    pygame.init()
+    args.display = (1280, 720)
+    opcoes.abrir_janela(args.display, vsync=False)
+    render.iniciar("fixo")
+    fundo.init_opengl()
+    fundo.init_all_textures()
+    texturas.esperar()
+
+    resultado = {"parametros": {k: v for k, v in vars(args).items() if k != "display"}, "modos": {}}
+    try:
+        for modo in args.modos:
+            r = resultado["modos"][modo] = medir(args, modo)
+            if r["amostras"]:
+                t = r["evento_tela"]
+                print(f"{modo:<7} {r['amostras']:5d} teclas  {r['fps']:6.1f} fps  tecla -> tela p50 {t['p50']:6.1f} "
+                      f"p95 {t['p95']:6.1f} p99 {t['p99']:6.1f} ms  (tecla -> tick p50 {r['evento_tick']['p50']:5.1f} ms)",
+                      file=sys.stderr)
+    finally:
+        texturas.encerrar()
+        pygame.quit()
+
+    saida = json.dumps(resultado, indent=2)
+    if args.saida:
+        with open(args.saida, "w") as f: f.write(saida)
+    else:
+        print(saida)
+    return 0
+
+if __name__ == "__main__":
+    # Pelo módulo importado: o jogo marca eventos e flips em "latencia", não em "__main__"
+    import latencia
+    sys.exit(latencia.main())
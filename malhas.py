@@ -0,0 +1,55 @@
+import numpy as np
+
+# Vértices intercalados no formato GL_T2F_N3F_V3F: s, t, nx, ny, nz, x, y, z
+
+def esfera(raio, fatias=20, pilhas=20):
+    # Mesma parametrização do gluSphere (eixo polar em z, textura s=fatia, t=1-pilha)
+    rho = (np.arange(pilhas + 1) * (np.pi / pilhas))[:, None]
+    theta = ((np.arange(fatias + 1) % fatias) * (2 * np.pi / fatias))[None, :]
+
+    dados = np.empty((pilhas + 1, fatias + 1, 8), dtype=np.float32)
+    dados[..., 0] = (np.arange(fatias + 1) / fatias)[None, :]
+    dados[..., 1] = (1.0 - np.arange(pilhas + 1) / pilhas)[:, None]
+    dados[..., 2] = -np.sin(theta) * np.sin(rho)
+    dados[..., 3] = np.cos(theta) * np.sin(rho)
+    dados[..., 4] = np.cos(rho)
+    dados[..., 5:8] = dados[..., 2:5] * raio
+
+    return dados.reshape(-1, 8), _indices_grade(pilhas, fatias)
+
+def disco(interno, externo, fatias=40):
+    # Equivalente ao gluDisk com um único anel (loops=1)
+    ang = (np.arange(fatias + 1) % fatias) * (2 * np.pi / fatias)
+    raios = np.array([interno, externo])[:, None]
+
+    dados = np.zeros((2, fatias + 1, 8), dtype=np.float32)
+    dados[..., 0] = 0.5 + np.sin(ang) * raios / externo / 2
+    dados[..., 1] = 0.5 + np.cos(ang) * raios / externo / 2
+    dados[..., 4] = 1.0
+    dados[..., 5] = raios * np.sin(ang)
+    dados[..., 6] = raios * np.cos(ang)
+
+    return dados.reshape(-1, 8), _indices_grade(1, fatias)
+
+def grade(cols, rows, tamanho, y):
+    # Linhas do tabuleiro centrado na origem, formato GL_V3F (pares de vértices)
+    sx, sz = cols * tamanho, rows * tamanho
+    xs = -sx / 2 + np.arange(cols + 1) * tamanho
+    zs = -sz / 2 + np.arange(rows + 1) * tamanho
+
+    verticais = np.zeros((cols + 1, 2, 3), dtype=np.float32)
+    verticais[:, :, 0] = xs[:, None]
+    verticais[:, 0, 2], verticais[:, 1, 2] = -sz / 2, sz / 2
+    horizontais = np.zeros((rows + 1, 2, 3), dtype=np.float32)
+    horizontais[:, :, 2] = zs[:, None]
+    horizontais[:, 0, 0], horizontais[:, 1, 0] = -sx / 2, sx / 2
+
+    dados = np.concatenate([verticais.reshape(-1, 3), horizontais.reshape(-1, 3)])
+    dados[:, 1] = y
+    return dados
+
+def _indices_grade(linhas, colunas):
+    # Dois triângulos por célula de uma grade (linhas+1)x(colunas+1) de vértices
+    a = (np.arange(linhas)[:, None] * (colunas + 1) + np.arange(colunas)[None, :]).ravel()
+    b = a + colunas + 1
+    return np.stack([a, b, a + 1, a + 1, b, b + 1], axis=1).astype(np.uint32).ravel()
@@ -0,0 +1,39 @@
+import numpy as np
+
+# Matrizes 4x4 na convenção de vetor coluna (p' = M @ p), as mesmas que gluPerspective,
+# gluLookAt, gluOrtho2D e glTranslate montam. Para o GL (coluna-maior) basta transpor.
+
+def perspectiva(fovy, aspecto, perto, longe):
+    f = 1.0 / np.tan(np.radians(fovy) / 2)
+    m = np.zeros((4, 4))
+    m[0, 0] = f / aspecto
+    m[1, 1] = f
+    m[2, 2] = (longe + perto) / (perto - longe)
+    m[2, 3] = 2 * longe * perto / (perto - longe)
+    m[3, 2] = -1.0
+    return m
+
+def olhar(olho, alvo, cima=(0.0, 1.0, 0.0)):
+    olho = np.asarray(olho, dtype=float)
+    frente = np.asarray(alvo, dtype=float) - olho
+    frente /= np.linalg.norm(frente)
+    lado = np.cross(frente, cima)
+    lado /= np.linalg.norm(lado)
+    m = np.eye(4)
+    m[0, :3], m[1, :3], m[2, :3] = lado, np.cross(lado, frente), -frente
+    m[:3, 3] = -m[:3, :3] @ olho
+    return m
+
+def ortografica(esquerda, direita, baixo, topo, perto=-1.0, longe=1.0):
+    m = np.eye(4)
+    m[0, 0] = 2 / (direita - esquerda)
+    m[1, 1] = 2 / (topo - baixo)
+    m[2, 2] = -2 / (longe - perto)
+    m[:3, 3] = (-(direita + esquerda) / (direita - esquerda), -(topo + baixo) / (topo - baixo),
+                -(longe + perto) / (longe - perto))
+    return m
+
+def translacao(x, y, z):
+    m = np.eye(4)
+    m[:3, 3] = x, y, z
+    return m
@@ -0,0 +1,99 @@
+import numpy as np
+
+# Meteoros em struct-of-arrays: posição e velocidade em arrays paralelos de inteiros,
+# só os n primeiros elementos são válidos. A capacidade dobra quando enche.
+# "nivel" é estado só de desenho (nível de detalhe do último quadro, -1 = ainda não
+# desenhado) e não entra na simulação.
+
+CAMPOS = ("x", "z", "dx", "dz", "nivel")
+LADO_INDICE = 16   # casas por lado das células do índice espacial
+MARGEM = 2         # meteoros fora do tabuleiro que descartar_fora ainda mantém
+
+def novo(capacidade=64):
+    m = {c: np.zeros(capacidade, dtype=np.int32) for c in CAMPOS}
+    m["n"] = 0
+    m["ocupacao"] = None
+    m["indice"] = None   # ordem por célula do índice espacial; None = desatualizado
+    m["adicionados"] = 0  # total já inserido: os k últimos do array são os k mais novos
+    return m
+
+def _crescer(m, minimo):
+    cap = len(m["x"])
+    while cap < minimo: cap *= 2
+    for c in CAMPOS:
+        novo_arr = np.zeros(cap, dtype=np.int32)
+        novo_arr[:m["n"]] = m[c][:m["n"]]
+        m[c] = novo_arr
+
+def adicionar(m, x, z, dx, dz):
+    # Aceita escalares ou arrays do mesmo tamanho: um lote inteiro por chamada
+    x, z = np.atleast_1d(x), np.atleast_1d(z)
+    n, k = m["n"], len(x)
+    if n + k > len(m["x"]): _crescer(m, n + k)
+    m["x"][n:n+k] = x
+    m["z"][n:n+k] = z
+    m["dx"][n:n+k] = dx
+    m["dz"][n:n+k] = dz
+    m["nivel"][n:n+k] = -1
+    m["n"] = n + k
+    m["adicionados"] += k
+    m["indice"] = None
+
+def vivos(m):
+    n = m["n"]
+    return m["x"][:n], m["z"][:n], m["dx"][:n], m["dz"][:n]
+
+def mover(m):
+    x, z, dx, dz = vivos(m)
+    x += dx
+    z += dz
+    m["indice"] = None
+
+def ocupacao(m, cols, rows):
+    # Bitmap rows x cols das casas ocupadas neste passo; reaproveita o mesmo buffer
+    grade = m["ocupacao"]
+    if grade is None or grade.shape != (rows, cols):
+        grade = m["ocupacao"] = np.zeros((rows, cols), dtype=bool)
+    else:
+        grade.fill(False)
+    x, z, _, _ = vivos(m)
+    # Vistos como unsigned, valores negativos ficam enormes: um teste só por eixo
+    dentro = (x.view(np.uint32) < cols) & (z.view(np.uint32) < rows)
+    grade[z[dentro], x[dentro]] = True
+    return grade
+
+def descartar_fora(m, cols, rows, margem=MARGEM):
+    x, z, _, _ = vivos(m)
+    manter = ((x + margem).view(np.uint32) < cols + 2 * margem) & ((z + margem).view(np.uint32) < rows + 2 * margem)
+    k = int(np.count_nonzero(manter))
+    if k == m["n"]: return
+    for c in CAMPOS:
+        m[c][:k] = m[c][:m["n"]][manter]
+    m["n"] = k
+    m["indice"] = None
+
+def _indexar(m):
+    # Meteoros ordenados pela célula do índice (linha a linha); só é refeito depois que
+    # as posições mudam, uma vez por passo da simulação e não por quadro
+    x, z, _, _ = vivos(m)
+    cx = np.maximum(x + MARGEM, 0) // LADO_INDICE
+    cz = np.maximum(z + MARGEM, 0) // LADO_INDICE
+    largura = int(cx.max()) + 1 if len(cx) else 1
+    chaves = cz * largura + cx
+    ordem = np.argsort(chaves, kind="stable")
+    m["indice"] = (ordem, chaves[ordem], largura)
+
+def na_regiao(m, x0, z0, x1, z1):
+    # Índices dos meteoros vivos nas células do índice que tocam as casas [x0, x1] x [z0, z1]
+    # (inclusivo); pode trazer alguns vizinhos de fora, nunca deixa um de dentro
+    if m["indice"] is None: _indexar(m)
+    ordem, chaves, largura = m["indice"]
+    if x1 < x0 or z1 < z0: return ordem[:0]
+    cx0 = max(0, (x0 + MARGEM) // LADO_INDICE)
+    cx1 = min(largura - 1, (x1 + MARGEM) // LADO_INDICE)
+    if cx1 < cx0: return ordem[:0]
+    faixas = []
+    for cz in range(max(0, (z0 + MARGEM) // LADO_INDICE), (z1 + MARGEM) // LADO_INDICE + 1):
+        i, j = np.searchsorted(chaves, (cz * largura + cx0, cz * largura + cx1 + 1))
+        if j > i: faixas.append(ordem[i:j])
+    return np.concatenate(faixas) if faixas else ordem[:0]
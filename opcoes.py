@@ -0,0 +1,97 @@
+import argparse
+from types import SimpleNamespace
+import pygame
+from pygame.locals import DOUBLEBUF, OPENGL
+import cache_fundo
+import captura
+import latencia
+import qualidade
+import render
+import tabuleiro
+
+# --texturas -> argumento progressivo de fundo.init_all_textures
+PROGRESSIVO = {"auto": None, "progressivo": True, "inteiro": False}
+
+def ler_argumentos(argv=None, descricao="Space Dodge"):
+    parser = argparse.ArgumentParser(description=descricao)
+    parser.add_argument("--perfil", action="store_true",
+                        help="mede o tempo de cada fase do quadro (F3 mostra os percentis)")
+    parser.add_argument("--perfil-saida", default="perfil.csv",
+                        help="arquivo .csv ou .json gravado com o perfil ao sair")
+    parser.add_argument("--texturas", choices=PROGRESSIVO, default="auto",
+                        help="envio das texturas à GPU: progressivo (mipmaps do menor ao maior), "
+                             "inteiro, ou auto (progressivo só para as imagens grandes)")
+    parser.add_argument("--orcamento-texturas", type=float, metavar="MB",
+                        help="limite de memória de textura na GPU; as maiores texturas são reduzidas para caber")
+    parser.add_argument("--render", choices=render.MODOS, default="fixo",
+                        help="backend de desenho: pipeline fixo ou shaders GLSL (requer OpenGL 3.3; "
+                             "sem suporte volta para o fixo)")
+    parser.add_argument("--replays", default="replays", metavar="PASTA",
+                        help="onde cada partida é gravada para replay.py (vazio = não grava)")
+    parser.add_argument("--tabuleiro", type=int, nargs=2, default=(8, 8), metavar=("COLS", "ROWS"),
+                        help=f"casas do tabuleiro ({tabuleiro.MINIMO} a {tabuleiro.MAXIMO} por lado)")
+    parser.add_argument("--autopiloto", action="store_true",
+                        help="o jogo se joga sozinho e recomeça ao terminar (demonstração)")
+    parser.add_argument("--cache-fundo", action="store_true",
+                        help="desenha o sistema solar numa textura com resolução e taxa menores "
+                             "e só a copia nos outros quadros (requer OpenGL 3.3)")
+    parser.add_argument("--cache-fundo-escala", type=float, default=cache_fundo.ESCALA_PADRAO, metavar="FRACAO",
+                        help="resolução do cache em relação à janela (0 a 1)")
+    parser.add_argument("--cache-fundo-hz", type=float, default=cache_fundo.HZ_PADRAO, metavar="HZ",
+                        help="atualizações do cache por segundo (0 = todo quadro)")
+    parser.add_argument("--qualidade", action="store_true",
+                        help="ajusta a qualidade (malhas, lua e anéis, texto, resolução do fundo) "
+                             "para manter a taxa de --qualidade-alvo; cada troca é impressa")
+    parser.add_argument("--qualidade-alvo", type=float, default=60.0, metavar="FPS",
+                        help="quadros por segundo que o governador de qualidade tenta manter")
+    parser.add_argument("--fps", type=int, default=0,
+                        help="limite de quadros por segundo (0 = sem limite; a simulação roda em ticks fixos)")
+    parser.add_argument("--sem-vsync", dest="vsync", action="store_false",
+                        help="não sincroniza a troca de buffers com o monitor")
+    parser.add_argument("--hz-monitor", type=float, default=60.0,
+                        help="taxa do monitor, usada pelo --baixa-latencia com vsync e sem --fps")
+    parser.add_argument("--baixa-latencia", action="store_true",
+                        help="dorme antes de ler o teclado em vez de depois, e termina a GPU antes da troca")
+    parser.add_argument("--fila-gpu", type=int, metavar="N",
+                        help="máximo de quadros enfileirados no driver (0 = glFinish a cada quadro)")
+    parser.add_argument("--latencia", action="store_true",
+                        help="mede a latência tecla -> tela e imprime os percentis ao sair")
+    parser.add_argument("--gravar", metavar="SAIDA",
+                        help="grava a partida sem travar o quadro: pasta (png), arquivo (raw) ou o {saida} do comando (pipe)")
+    parser.add_argument("--gravar-formato", choices=captura.FORMATOS, default="png",
+                        help="png por quadro, RGBA cru num arquivo, ou RGBA cru na entrada de --gravar-comando")
+    parser.add_argument("--gravar-fps", type=float, default=captura.FPS_PADRAO,
+                        help="quadros gravados por segundo (0 = todos); sem buffer livre o quadro é descartado")
+    parser.add_argument("--gravar-comando", metavar="CMD",
+                        help="codificador para --gravar-formato pipe; aceita {largura} {altura} {fps} {saida}")
+    args = parser.parse_args(argv)
+    if not all(tabuleiro.MINIMO <= n <= tabuleiro.MAXIMO for n in args.tabuleiro):
+        parser.error(f"--tabuleiro: cada lado deve ficar entre {tabuleiro.MINIMO} e {tabuleiro.MAXIMO}")
+    if not 0 < args.cache_fundo_escala <= 1:
+        parser.error("--cache-fundo-escala: deve ficar entre 0 e 1")
+    if args.gravar_formato == "pipe" and args.gravar and not args.gravar_comando:
+        parser.error("--gravar-formato pipe: falta o --gravar-comando")
+    return args
+
+def abrir_janela(display, vsync=True):
+    try:
+        return pygame.display.set_mode(display, DOUBLEBUF | OPENGL, vsync=int(vsync))
+    except pygame.error:
+        return pygame.display.set_mode(display, DOUBLEBUF | OPENGL)   # driver sem vsync
+
+def relogio(fps=0, baixa_latencia=False, periodo_vsync_ms=None):
+    # Clock do pygame com o limite de --fps; os laços só chamam tick() e usam o dt.
+    # O governador de qualidade recebe o tempo de trabalho do quadro, sem a espera do limite
+    if baixa_latencia:
+        r = latencia.relogio(1000.0 / fps, False) if fps else latencia.relogio(periodo_vsync_ms, True)
+        def tick_baixa():
+            dt = r.tick()
+            qualidade.registrar(r.trabalho())
+            return dt
+        return SimpleNamespace(tick=tick_baixa)
+    clock = pygame.time.Clock()
+    def tick():
+        dt = clock.tick(fps)
+        qualidade.registrar(clock.get_rawtime())
+        return dt
+    return SimpleNamespace(tick=tick)
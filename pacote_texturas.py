@@ -0,0 +1,113 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import numpy as np
+
+# Pacote com as texturas de assets/ já decodificadas: RGBA invertido na vertical (a
+# ordem que o glTexImage2D espera), mipmaps opcionais e um índice JSON com offsets.
+# Em tempo de execução o arquivo é mapeado em memória e os níveis são lidos direto
+# dele, sem PIL (o envio à GPU fica em texturas.py).
+# Cada entrada guarda o hash do arquivo de origem; entradas desatualizadas são ignoradas
+# e a textura volta a ser carregada pelo caminho antigo.
+#
+#   python pacote_texturas.py [--mips]
+
+MAGICO = b"TXPK"
+VERSAO = 1
+ALINHAMENTO = 64
+CABECALHO = struct.Struct("<4sIII")   # mágico, versão, tamanho do índice, início dos dados
+PASTA_ASSETS = "assets"
+ARQUIVO_PADRAO = os.path.join(PASTA_ASSETS, "texturas.pack")
+EXTENSOES = (".png", ".jpg", ".jpeg")
+
+def hash_arquivo(caminho):
+    with open(caminho, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def _alinhar(n):
+    return (n + ALINHAMENTO - 1) // ALINHAMENTO * ALINHAMENTO
+
+def niveis_mip(img, mips=True):
+    # Nível 0 e, com mips, metades sucessivas até 1x1
+    yield img
+    while mips and (img.width > 1 or img.height > 1):
+        img = img.resize((max(1, img.width // 2), max(1, img.height // 2)), resample=_box())
+        yield img
+
+def _box():
+    from PIL import Image
+    return Image.Resampling.BOX
+
+def construir(pasta=PASTA_ASSETS, saida=ARQUIVO_PADRAO, mips=False):
+    # PIL só é necessário aqui, no passo de build
+    from PIL import Image
+    nomes = sorted(n for n in os.listdir(pasta) if n.lower().endswith(EXTENSOES))
+
+    blobs, indice, offset = [], {}, 0
+    for nome in nomes:
+        caminho = os.path.join(pasta, nome)
+        img = Image.open(caminho).convert("RGBA").transpose(Image.Transpose.FLIP_TOP_BOTTOM)
+        niveis = []
+        for nivel in niveis_mip(img, mips):
+            # Offsets relativos ao início da área de dados
+            niveis.append((offset, nivel.width, nivel.height))
+            blobs.append((offset, nivel.tobytes()))
+            offset = _alinhar(offset + nivel.width * nivel.height * 4)
+        indice[nome] = {"hash": hash_arquivo(caminho), "niveis": niveis}
+
+    indice_json = json.dumps({"texturas": indice}).encode()
+    inicio_dados = _alinhar(CABECALHO.size + len(indice_json))
+    with open(saida, "wb") as f:
+        f.write(CABECALHO.pack(MAGICO, VERSAO, len(indice_json), inicio_dados))
+        f.write(indice_json)
+        for rel, dados in blobs:
+            f.seek(inicio_dados + rel)
+            f.write(dados)
+    return saida
+
+def abrir(caminho=ARQUIVO_PADRAO, pasta=PASTA_ASSETS):
+    # Devolve o pacote mapeado, ou None se não existir / for de outra versão
+    if not os.path.exists(caminho): return None
+    with open(caminho, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return None
+    magico, versao, tam, inicio_dados = CABECALHO.unpack_from(mm, 0)
+    if magico != MAGICO or versao != VERSAO:
+        mm.close()
+        return None
+    indice = json.loads(mm[CABECALHO.size:CABECALHO.size + tam])["texturas"]
+    return {"mmap": mm, "indice": indice, "inicio": inicio_dados, "pasta": pasta}
+
+def entrada_valida(pacote, nome):
+    # Só usa a versão empacotada se o arquivo de origem não mudou desde a construção
+    entrada = pacote["indice"].get(nome)
+    if entrada is None: return None
+    caminho = os.path.join(pacote["pasta"], nome)
+    if not os.path.exists(caminho) or hash_arquivo(caminho) != entrada["hash"]:
+        return None
+    return entrada
+
+def ler_niveis(pacote, nome):
+    # Lista de arrays (altura, largura, 4), do nível 0 ao menor, ou None se a entrada não vale
+    entrada = entrada_valida(pacote, nome)
+    if entrada is None: return None
+    # Views direto sobre o arquivo mapeado: nenhuma cópia no lado Python
+    return [np.frombuffer(pacote["mmap"], dtype=np.uint8, count=w * h * 4, offset=pacote["inicio"] + offset).reshape(h, w, 4)
+            for offset, w, h in entrada["niveis"]]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Empacota as texturas de assets/ já decodificadas")
+    parser.add_argument("--pasta", default=PASTA_ASSETS)
+    parser.add_argument("--saida", default=ARQUIVO_PADRAO)
+    parser.add_argument("--mips", action="store_true", help="inclui a cadeia de mipmaps pré-gerada")
+    args = parser.parse_args(argv)
+    caminho = construir(args.pasta, args.saida, args.mips)
+    print(f"Pacote gravado em {caminho} ({os.path.getsize(caminho) / 1e6:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
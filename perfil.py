@@ -0,0 +1,174 @@
+from OpenGL.GL import *
+import ctypes
+import json
+import time
+import numpy as np
+import texto
+
+# Perfil por fase do quadro. Cada loop chama marcar("fase") ao entrar numa fase
+# (o que fecha a anterior) e fim_quadro() depois do flip. Desativado, marcar()
+# só testa uma flag, então as chamadas podem ficar no código de produção.
+
+FASES = ("eventos", "texturas", "simulacao", "cenario", "grade", "nave", "meteoros", "hud", "flip")
+CONTADORES = ("triangulos",)   # somados com somar() ao longo do quadro
+LATENCIA_GPU = 3   # quadros até ler as queries sem travar o pipeline
+
+_ativo = False
+_p = None
+
+def ativar(capacidade=600, gpu=True, saida=None):
+    global _ativo, _p
+    n = len(FASES)
+    _p = {
+        "cpu": np.full((capacidade, n), np.nan),
+        "gpu": np.full((capacidade, n), np.nan),
+        "quadro": 0,
+        "atual": [np.nan] * n,
+        "contadores": np.zeros((capacidade, len(CONTADORES))),
+        "contagem": [0] * len(CONTADORES),
+        "indice_contador": {c: i for i, c in enumerate(CONTADORES)},
+        "fase": None, "t": 0.0,
+        "indice": {f: i for i, f in enumerate(FASES)},
+        "queries": None, "usadas": None, "query_aberta": False,
+        "overlay": False, "texto": [], "saida": saida,
+    }
+    if gpu and _suporta_timer_query():
+        _p["queries"] = np.asarray(glGenQueries(LATENCIA_GPU * n)).reshape(LATENCIA_GPU, n)
+        _p["usadas"] = np.zeros((LATENCIA_GPU, n), dtype=bool)
+    _ativo = True
+
+def desativar():
+    global _ativo
+    if _ativo and _p["queries"] is not None:
+        glDeleteQueries(_p["queries"].size, _p["queries"].ravel().tolist())
+    _ativo = False
+
+def ativo():
+    return _ativo
+
+def somar(contador, n):
+    if _ativo: _p["contagem"][_p["indice_contador"][contador]] += n
+
+def total_contador(contador):
+    # Soma das amostras guardadas e do quadro ainda aberto
+    i = _p["indice_contador"][contador]
+    return float(_p["contadores"][:, i].sum() + _p["contagem"][i])
+
+def _suporta_timer_query():
+    try:
+        major, minor = map(int, glGetString(GL_VERSION).split()[0].split(b".")[:2])
+    except Exception:
+        return False
+    return (major, minor) >= (3, 3) and bool(glBeginQuery)
+
+def _fechar_fase(t):
+    i = _p["fase"]
+    if i is None: return
+    a = _p["atual"][i]
+    _p["atual"][i] = (0.0 if a != a else a) + (t - _p["t"]) * 1000.0   # nan = fase ainda não visitada
+    if _p["query_aberta"]:
+        glEndQuery(GL_TIME_ELAPSED)
+        _p["query_aberta"] = False
+
+def marcar(fase):
+    if not _ativo: return
+    t = time.perf_counter()
+    _fechar_fase(t)
+    i = _p["indice"][fase]
+    _p["fase"], _p["t"] = i, t
+    if _p["queries"] is not None:
+        # Uma fase repetida no mesmo quadro só tem a primeira ocorrência medida na GPU
+        slot = _p["quadro"] % LATENCIA_GPU
+        if not _p["usadas"][slot, i]:
+            glBeginQuery(GL_TIME_ELAPSED, int(_p["queries"][slot, i]))
+            _p["usadas"][slot, i] = True
+            _p["query_aberta"] = True
+
+def _ler_gpu(slot, quadro):
+    # Lê as queries de um quadro antigo; se ainda não ficaram prontas, descarta
+    linha = _p["gpu"][quadro % len(_p["gpu"])]
+    valor = ctypes.c_uint64()
+    for i in np.flatnonzero(_p["usadas"][slot]):
+        q = int(_p["queries"][slot, i])
+        if glGetQueryObjectiv(q, GL_QUERY_RESULT_AVAILABLE):
+            glGetQueryObjectui64v(q, GL_QUERY_RESULT, ctypes.byref(valor))
+            linha[i] = valor.value / 1e6
+    _p["usadas"][slot] = False
+
+def fim_quadro():
+    if not _ativo: return
+    _fechar_fase(time.perf_counter())
+    _p["fase"] = None
+
+    q = _p["quadro"]
+    _p["cpu"][q % len(_p["cpu"])] = _p["atual"]
+    _p["contadores"][q % len(_p["contadores"])] = _p["contagem"]
+    _p["contagem"] = [0] * len(CONTADORES)
+    _p["gpu"][q % len(_p["gpu"])] = np.nan   # preenchida LATENCIA_GPU quadros depois
+    _p["atual"] = [np.nan] * len(FASES)
+    _p["quadro"] = q + 1
+
+    if _p["queries"] is not None and q + 1 >= LATENCIA_GPU:
+        antigo = q + 1 - LATENCIA_GPU
+        _ler_gpu(antigo % LATENCIA_GPU, antigo)
+
+def _validas(tipo):
+    n = min(_p["quadro"], len(_p[tipo]))
+    return _p[tipo][:n]
+
+def percentis(tipo="cpu"):
+    # {fase: (p50, p95, p99)} em ms, ignorando fases sem amostras
+    dados = _validas(tipo)
+    resumo = {}
+    for i, fase in enumerate(FASES):
+        col = dados[:, i]
+        col = col[~np.isnan(col)]
+        if len(col):
+            resumo[fase] = tuple(float(v) for v in np.percentile(col, (50, 95, 99)))
+    return resumo
+
+def alternar_overlay():
+    if _ativo: _p["overlay"] = not _p["overlay"]
+
+def desenhar_overlay(display):
+    if not _ativo or not _p["overlay"]: return
+    # Os percentis só são recalculados a cada 30 quadros
+    if _p["quadro"] % 30 == 0 or not _p["texto"]:
+        gpu = percentis("gpu")
+        linhas = ["fase        p50    p95    p99  (ms cpu | gpu p50)"]
+        for fase, (p50, p95, p99) in percentis("cpu").items():
+            g = f"{gpu[fase][0]:6.2f}" if fase in gpu else "     -"
+            linhas.append(f"{fase:<10}{p50:6.2f} {p95:6.2f} {p99:6.2f}  | {g}")
+        ultimo = _p["contadores"][(_p["quadro"] - 1) % len(_p["contadores"])]
+        linhas.append("  ".join(f"{c}: {int(v)}" for c, v in zip(CONTADORES, ultimo)))
+        _p["texto"] = linhas
+    for i, linha in enumerate(_p["texto"]):
+        texto.desenhar(linha, 10, display[1] - 80 - i * 18, display, 16, (255, 255, 0, 255), dinamico=True)
+
+def exportar(caminho=None):
+    # CSV (uma linha por quadro) ou JSON (quadros + percentis), pela extensão do arquivo
+    if not _ativo: return None
+    caminho = caminho or _p["saida"] or "perfil.csv"
+    cpu, gpu, contadores = _validas("cpu"), _validas("gpu"), _validas("contadores")
+    inicio = _p["quadro"] - len(cpu)
+    ordem = (np.arange(len(cpu)) + inicio) % len(_p["cpu"]) if len(cpu) == len(_p["cpu"]) else np.arange(len(cpu))
+    cpu, gpu, contadores = cpu[ordem], gpu[ordem], contadores[ordem]
+
+    if caminho.endswith(".json"):
+        with open(caminho, "w") as f:
+            json.dump({
+                "fases": FASES,
+                "cpu_ms": np.where(np.isnan(cpu), None, cpu).tolist(),
+                "gpu_ms": np.where(np.isnan(gpu), None, gpu).tolist(),
+                "contadores": dict(zip(CONTADORES, contadores.T.astype(int).tolist())),
+                "percentis_cpu": percentis("cpu"),
+                "percentis_gpu": percentis("gpu"),
+            }, f, indent=1)
+    else:
+        with open(caminho, "w") as f:
+            f.write(",".join(["quadro"] + [f"{x}_cpu_ms" for x in FASES] + [f"{x}_gpu_ms" for x in FASES]
+                             + list(CONTADORES)) + "\n")
+            for k, (c, g, n) in enumerate(zip(cpu, gpu, contadores)):
+                valores = ["" if np.isnan(v) else f"{v:.4f}" for v in np.concatenate([c, g])]
+                f.write(",".join([str(inicio + k)] + valores + [str(int(v)) for v in n]) + "\n")
+    return caminho
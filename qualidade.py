@@ -0,0 +1,127 @@
+import time
+import numpy as np
+import cache_fundo
+import detalhe
+import fundo
+import texto
+
+# Governador de qualidade. Olha uma janela dos últimos tempos de quadro e desce ou sobe
+# um nível de qualidade para manter o tempo de quadro alvo. Com histerese: desce quando
+# o p90 da janela passa do alvo com folga e só sobe com o p90 bem abaixo dele; depois de
+# cada troca a janela recomeça e os primeiros quadros são ignorados.
+# Com vsync ou --fps no alvo o tempo de quadro nunca fica "bem abaixo", então, parado no
+# alvo por ESPERA_SUBIR_MS, ele também experimenta subir. Se a primeira decisão depois
+# de uma subida for descer de novo, a espera dobra (até ESPERA_MAXIMA_MS) e nenhuma
+# subida acontece durante ela, então o aparelho assenta no nível que aguenta.
+# Cada troca é impressa e guardada em historico(); resumo() dá o tempo em cada nível.
+#
+#   python game.py --qualidade --qualidade-alvo 60
+
+# Do melhor para o pior. detalhe: fator do raio projetado na escolha das malhas das
+# esferas (detalhe.definir_fator); filhos: lua e anéis de Saturno; texto_ms: intervalo
+# mínimo entre remontagens de um texto dinâmico (HUD, overlay); escala: resolução
+# interna do cenário de fundo (cache_fundo; None = a da linha de comando)
+NIVEIS = (
+    {"detalhe": 1.0, "filhos": True, "texto_ms": 0, "escala": None},
+    {"detalhe": 0.5, "filhos": True, "texto_ms": 0, "escala": None},
+    {"detalhe": 0.5, "filhos": False, "texto_ms": 100, "escala": 0.75},
+    {"detalhe": 0.25, "filhos": False, "texto_ms": 250, "escala": 0.5},
+    {"detalhe": 0.1, "filhos": False, "texto_ms": 500, "escala": 0.35},
+)
+JANELA = 90                 # quadros considerados
+CARENCIA = 20               # quadros ignorados depois de uma troca
+FOLGA_DESCE = 0.15          # desce com p90 > alvo * (1 + FOLGA_DESCE)
+FOLGA_SOBE = 0.30           # sobe com p90 < alvo * (1 - FOLGA_SOBE)
+NO_ALVO = 0.05              # p90 até alvo * (1 + NO_ALVO) conta como "no alvo" para experimentar subir
+ESPERA_SUBIR_MS = 5000.0
+ESPERA_MAXIMA_MS = 120000.0
+
+_ativo = False
+_q = None
+
+def ativar(alvo_fps=60, nivel=0, registro=print):
+    global _ativo, _q
+    _q = {
+        "alvo": 1000.0 / alvo_fps, "nivel": nivel, "tempos": np.zeros(JANELA), "n": 0, "ignorar": CARENCIA,
+        "no_alvo_ms": 0.0, "espera": ESPERA_SUBIR_MS, "subiu": False, "bloqueio_ms": 0.0,
+        "relogio_ms": 0.0,
+        "por_nivel": np.zeros(len(NIVEIS)), "historico": [], "registro": registro,
+    }
+    _aplicar(NIVEIS[nivel])
+    _ativo = True
+
+def desativar():
+    global _ativo
+    if _ativo: _aplicar(NIVEIS[0])
+    _ativo = False
+
+def ativo():
+    return _ativo
+
+def nivel():
+    return _q["nivel"] if _ativo else 0
+
+def _aplicar(n):
+    detalhe.definir_fator(n["detalhe"])
+    fundo.mostrar_filhos(n["filhos"])
+    texto.definir_intervalo(n["texto_ms"])
+    cache_fundo.forcar_escala(n["escala"])
+
+def _trocar(novo, p90, motivo):
+    q = _q
+    antigo, q["nivel"] = q["nivel"], novo
+    _aplicar(NIVEIS[novo])
+    q["n"], q["ignorar"], q["no_alvo_ms"] = 0, CARENCIA, 0.0
+    if novo > antigo and q["subiu"]:
+        # A primeira decisão depois de subir foi descer: espera mais antes de tentar de novo
+        q["espera"] = min(q["espera"] * 2, ESPERA_MAXIMA_MS)
+        q["bloqueio_ms"] = q["relogio_ms"] + q["espera"]
+    q["subiu"] = novo < antigo
+    evento = {"t_ms": q["relogio_ms"], "de": antigo, "para": novo, "p90_ms": p90, "alvo_ms": q["alvo"],
+              "motivo": motivo, "unix": time.time()}
+    q["historico"].append(evento)
+    if q["registro"]:
+        q["registro"](f"qualidade: nível {antigo} -> {novo} ({motivo}; p90 {p90:.1f} ms, "
+                      f"alvo {q['alvo']:.1f} ms, {q['relogio_ms'] / 1000:.1f} s)")
+
+def registrar(ms):
+    # Um tempo de quadro (ms de trabalho, sem a espera do limite de fps); chamado pelo
+    # relógio de opcoes.relogio a cada tick
+    if not _ativo: return
+    q = _q
+    q["relogio_ms"] += ms
+    q["por_nivel"][q["nivel"]] += ms
+    if q["ignorar"] > 0:
+        q["ignorar"] -= 1
+        return
+    q["tempos"][q["n"] % JANELA] = ms
+    q["n"] += 1
+    if q["n"] < JANELA: return
+
+    p90 = float(np.percentile(q["tempos"], 90))
+    alvo = q["alvo"]
+    if p90 > alvo * (1 + FOLGA_DESCE):
+        if q["nivel"] + 1 < len(NIVEIS): _trocar(q["nivel"] + 1, p90, "lento")
+        return
+    if q["subiu"]:
+        # A janela inteira depois da subida ficou no alvo: a próxima tentativa volta à espera curta
+        q["subiu"], q["espera"] = False, ESPERA_SUBIR_MS
+    if q["nivel"] == 0 or q["relogio_ms"] < q["bloqueio_ms"]:
+        q["no_alvo_ms"] = 0.0
+    elif p90 < alvo * (1 - FOLGA_SOBE):
+        _trocar(q["nivel"] - 1, p90, "folga")
+    elif p90 <= alvo * (1 + NO_ALVO):
+        q["no_alvo_ms"] += ms
+        if q["no_alvo_ms"] >= q["espera"]: _trocar(q["nivel"] - 1, p90, "tentativa")
+    else:
+        q["no_alvo_ms"] = 0.0
+
+def historico():
+    return list(_q["historico"]) if _q else []
+
+def resumo():
+    # Nível em que o aparelho passou mais tempo e a fração de tempo em cada um
+    if not _q or not _q["relogio_ms"]: return None
+    fracao = _q["por_nivel"] / _q["relogio_ms"]
+    return {"alvo_ms": _q["alvo"], "nivel_final": _q["nivel"], "nivel_estavel": int(np.argmax(fracao)),
+            "fracao_por_nivel": fracao.tolist(), "trocas": len(_q["historico"])}
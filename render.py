@@ -0,0 +1,272 @@
+from OpenGL.GL import *
+from OpenGL.GL import shaders
+from OpenGL.GLU import *
+import ctypes
+import numpy as np
+import matrizes
+
+# Backend de desenho: "fixo" é o pipeline fixo de sempre (luz, matrizes e cor no estado
+# do GL); "shader" desenha tudo com GLSL, matrizes calculadas em NumPy e enviadas como
+# uniforms e malhas em VBOs/VAOs. Escolhido na inicialização; sem GL 3.3 ou se os shaders
+# não compilarem, volta para o fixo.
+# Nos dois modos a câmera passa por camera(), e as matrizes ficam disponíveis em
+# matrizes_camera() sem ler o estado do GL.
+
+MODOS = ("fixo", "shader")
+
+# GL_LIGHT0 do pipeline fixo: direcional, vindo da câmera (posição padrão (0, 0, 1, 0))
+LUZ_DIRECAO = (0.0, 0.0, 1.0)
+LUZ_AMBIENTE = 0.2
+LUZ_DIFUSA = 1.0
+AMBIENTE_GLOBAL = 0.2   # GL_LIGHT_MODEL_AMBIENT padrão
+
+# Atributos em locais fixos para todas as malhas servirem aos dois programas
+ATRIBUTOS = {"posicao": 0, "normal": 1, "texcoord": 2, "cor": 3}
+# formato -> (passo em bytes, {atributo: (componentes, offset)}), como no glInterleavedArrays
+FORMATOS = {
+    GL_T2F_N3F_V3F: (32, {"texcoord": (2, 0), "normal": (3, 8), "posicao": (3, 20)}),
+    GL_T2F_V3F: (20, {"texcoord": (2, 0), "posicao": (3, 8)}),
+    GL_C3F_V3F: (24, {"cor": (3, 0), "posicao": (3, 12)}),
+    GL_V3F: (12, {"posicao": (3, 0)}),
+}
+
+VERTEX_ILUMINADO = """
+#version 330
+layout(location = 0) in vec3 posicao;
+layout(location = 1) in vec3 normal;
+layout(location = 2) in vec2 texcoord;
+layout(location = 3) in vec4 cor;
+uniform mat4 modelo_vista;
+uniform mat4 projecao;
+uniform vec4 uv;          // retângulo da imagem no atlas
+uniform float emissao;
+uniform vec3 luz;
+uniform float ambiente;
+uniform float difusa;
+out vec4 cor_vertice;
+out vec2 st;
+void main() {
+    gl_Position = projecao * modelo_vista * vec4(posicao, 1.0);
+    st = uv.xy + texcoord * uv.zw;
+    // Iluminação por vértice, como GL_LIGHT0 + GL_COLOR_MATERIAL no pipeline fixo
+    vec3 n = normalize(mat3(modelo_vista) * normal);
+    vec3 c = emissao + cor.rgb * (ambiente + difusa * max(dot(n, luz), 0.0));
+    cor_vertice = vec4(clamp(c, 0.0, 1.0), cor.a);
+}
+"""
+
+VERTEX_SIMPLES = """
+#version 330
+layout(location = 0) in vec3 posicao;
+layout(location = 2) in vec2 texcoord;
+layout(location = 3) in vec4 cor;
+uniform mat4 modelo_vista;
+uniform mat4 projecao;
+uniform vec4 uv;
+out vec4 cor_vertice;
+out vec2 st;
+void main() {
+    gl_Position = projecao * modelo_vista * vec4(posicao, 1.0);
+    st = uv.xy + texcoord * uv.zw;
+    cor_vertice = cor;
+}
+"""
+
+FRAGMENT = """
+#version 330
+uniform sampler2D textura;
+uniform bool usar_textura;
+in vec4 cor_vertice;
+in vec2 st;
+out vec4 saida;
+void main() {
+    saida = usar_textura ? cor_vertice * texture(textura, st) : cor_vertice;
+}
+"""
+
+UV_INTEIRA = (0.0, 0.0, 1.0, 1.0)
+
+_r = {
+    "modo": "fixo", "programas": {}, "malhas": {}, "fluxo": {},
+    "vista": np.eye(4), "projecao": np.eye(4), "altura": 1, "cor": None,
+}
+
+def programavel():
+    return _r["modo"] == "shader"
+
+def suporta_shaders():
+    try:
+        major, minor = map(int, glGetString(GL_VERSION).split()[0].split(b".")[:2])
+    except Exception:
+        return False
+    return (major, minor) >= (3, 3)
+
+def compilar_programa(vertex, uniforms, fragment=FRAGMENT):
+    programa = shaders.compileProgram(
+        shaders.compileShader(vertex, GL_VERTEX_SHADER),
+        shaders.compileShader(fragment, GL_FRAGMENT_SHADER))
+    return {"id": programa, "valores": {}, **{u: glGetUniformLocation(programa, u) for u in uniforms}}
+
+def iniciar(modo="fixo"):
+    _r["modo"] = "fixo"
+    if modo != "shader": return
+    if not suporta_shaders():
+        print("Backend de shaders indisponível (requer OpenGL 3.3), usando o pipeline fixo")
+        return
+    comuns = ("modelo_vista", "projecao", "uv", "textura", "usar_textura")
+    try:
+        iluminado = compilar_programa(VERTEX_ILUMINADO, comuns + ("emissao", "luz", "ambiente", "difusa"))
+        simples = compilar_programa(VERTEX_SIMPLES, comuns)
+    except Exception as e:
+        print(f"Shaders não compilaram, usando o pipeline fixo: {e}")
+        return
+
+    glUseProgram(iluminado["id"])
+    glUniform3f(iluminado["luz"], *LUZ_DIRECAO)
+    glUniform1f(iluminado["ambiente"], LUZ_AMBIENTE + AMBIENTE_GLOBAL)
+    glUniform1f(iluminado["difusa"], LUZ_DIFUSA)
+    for p in (iluminado, simples):
+        glUseProgram(p["id"])
+        glUniform1i(p["textura"], 0)
+    glUseProgram(0)
+    _r["programas"] = {"iluminado": iluminado, "simples": simples}
+    _r["modo"] = "shader"
+
+# --- Câmera ------------------------------------------------------------------
+
+def camera(display, fovy, perto, longe, olho, alvo, cima=(0, 1, 0)):
+    # Projeção perspectiva + vista; no modo fixo também carrega as matrizes do GL.
+    # Com os mesmos argumentos da chamada anterior as matrizes são as mesmas (câmera
+    # parada no menu e no jogo): nada é recalculado e quem compara pode usar "is"
+    if _r.get("persp", (None,))[0] != (display, fovy, perto, longe):
+        _r["persp"] = ((display, fovy, perto, longe), matrizes.perspectiva(fovy, display[0] / display[1], perto, longe))
+    if _r.get("olhar", (None,))[0] != (olho, alvo, cima):
+        _r["olhar"] = ((olho, alvo, cima), matrizes.olhar(olho, alvo, cima))
+    _r["projecao"], _r["vista"] = _r["persp"][1], _r["olhar"][1]
+    _r["altura"] = display[1]
+    if not programavel():
+        glMatrixMode(GL_PROJECTION); glLoadIdentity()
+        gluPerspective(fovy, display[0] / display[1], perto, longe)
+        glMatrixMode(GL_MODELVIEW); glLoadIdentity()
+        gluLookAt(*olho, *alvo, *cima)
+
+def matrizes_camera():
+    # (vista, projeção, altura do viewport em pixels) da última camera()
+    return _r["vista"], _r["projecao"], _r["altura"]
+
+# --- Malhas ------------------------------------------------------------------
+
+def configurar_atributos(formato):
+    passo, campos = FORMATOS[formato]
+    for nome, (n, offset) in campos.items():
+        loc = ATRIBUTOS[nome]
+        glEnableVertexAttribArray(loc)
+        glVertexAttribPointer(loc, n, GL_FLOAT, GL_FALSE, passo, ctypes.c_void_p(offset))
+
+def compilar_malha(dados, indices, formato=GL_T2F_N3F_V3F, modo=GL_TRIANGLES):
+    # Mesma assinatura do fundo.compilar_malha, mas em VAO + VBO (+ IBO)
+    malha = {"vao": glGenVertexArrays(1), "vbo": glGenBuffers(1), "ibo": None, "modo": modo}
+    glBindVertexArray(malha["vao"])
+    glBindBuffer(GL_ARRAY_BUFFER, malha["vbo"])
+    glBufferData(GL_ARRAY_BUFFER, dados.nbytes, dados, GL_STATIC_DRAW)
+    configurar_atributos(formato)
+    if indices is None:
+        malha["n"] = dados.nbytes // FORMATOS[formato][0]
+    else:
+        malha["ibo"] = glGenBuffers(1)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, malha["ibo"])
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+        malha["n"] = len(indices)
+    glBindVertexArray(0)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
+    glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
+    return malha
+
+def obter_malha(chave, construir):
+    malha = _r["malhas"].get(chave)
+    if malha is None:
+        malha = _r["malhas"][chave] = compilar_malha(*construir())
+    return malha
+
+def _fluxo(formato):
+    # VAO + VBO reaproveitados para dados que mudam todo quadro (texto)
+    f = _r["fluxo"].get(formato)
+    if f is None:
+        f = _r["fluxo"][formato] = {"vao": glGenVertexArrays(1), "vbo": glGenBuffers(1), "ibo": glGenBuffers(1), "quads": 0}
+        glBindVertexArray(f["vao"])
+        glBindBuffer(GL_ARRAY_BUFFER, f["vbo"])
+        configurar_atributos(formato)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, f["ibo"])   # fica registrado no VAO
+        glBindVertexArray(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+    return f
+
+def _indices_quads(n):
+    # Dois triângulos por quad de 4 vértices
+    base = (np.arange(n, dtype=np.uint32) * 4)[:, None]
+    return (base + np.array([0, 1, 2, 0, 2, 3], dtype=np.uint32)).ravel()
+
+# --- Desenho -----------------------------------------------------------------
+
+# Uniforms ficam guardados no próprio programa: só são reenviados quando mudam.
+# Matrizes são comparadas por identidade (camera() cria arrays novos a cada chamada).
+_IDENTIDADE = np.eye(4)
+
+def _matriz(p, nome, m):
+    if p["valores"].get(nome) is not m:
+        glUniformMatrix4fv(p[nome], 1, GL_TRUE, np.asarray(m, dtype=np.float32))
+        p["valores"][nome] = m
+
+def _valor(p, nome, v, enviar):
+    if p["valores"].get(nome) != v:
+        enviar(p[nome], *v)
+        p["valores"][nome] = v
+
+def usar_cor(cor):
+    # Cor constante do vértice quando a malha não traz a sua (como glColor); é estado do
+    # contexto, não do programa, então quem mais a define (instancias) passa por aqui
+    cor = tuple(cor)
+    if _r["cor"] != cor:
+        glVertexAttrib4f(ATRIBUTOS["cor"], *cor)
+        _r["cor"] = cor
+
+def _usar(programa, modelo_vista, projecao, cor, textura, uv):
+    p = _r["programas"][programa]
+    glUseProgram(p["id"])
+    _matriz(p, "modelo_vista", modelo_vista)
+    _matriz(p, "projecao", projecao)
+    _valor(p, "uv", uv or UV_INTEIRA, glUniform4f)
+    _valor(p, "usar_textura", (1 if textura else 0,), glUniform1i)
+    usar_cor(cor)
+    return p
+
+def desenhar(malha, modelo, cor=(1, 1, 1, 1), textura=True, uv=None, emissao=0.0, iluminado=True):
+    # modelo: matriz de modelo no mundo; a vista vem da última camera()
+    p = _usar("iluminado" if iluminado else "simples", _r["vista"] @ modelo, _r["projecao"], cor, textura, uv)
+    if iluminado: _valor(p, "emissao", (emissao,), glUniform1f)
+    glBindVertexArray(malha["vao"])
+    if malha["ibo"] is None:
+        glDrawArrays(malha["modo"], 0, malha["n"])
+    else:
+        glDrawElements(malha["modo"], malha["n"], GL_UNSIGNED_INT, None)
+    glBindVertexArray(0)
+
+def desenhar_quads_2d(dados, display, cor):
+    # dados: (4 * n, 5) em GL_T2F_V3F, coordenadas em pixels; textura já ligada
+    f = _fluxo(GL_T2F_V3F)
+    n = len(dados) // 4
+    if _r.get("orto", (None,))[0] != display:
+        _r["orto"] = (display, matrizes.ortografica(0, display[0], 0, display[1]))
+    _usar("simples", _IDENTIDADE, _r["orto"][1], [c / 255 for c in cor], True, None)
+    glBindVertexArray(f["vao"])
+    glBindBuffer(GL_ARRAY_BUFFER, f["vbo"])
+    glBufferData(GL_ARRAY_BUFFER, dados.nbytes, dados, GL_STREAM_DRAW)
+    if n > f["quads"]:
+        # O buffer de índices só cresce (dobrando), e serve para qualquer n menor
+        f["quads"] = max(n, 2 * f["quads"], 64)
+        indices = _indices_quads(f["quads"])
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, f["ibo"])
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL_STATIC_DRAW)
+    glDrawElements(GL_TRIANGLES, 6 * n, GL_UNSIGNED_INT, None)
+    glBindVertexArray(0)
+    glBindBuffer(GL_ARRAY_BUFFER, 0)
@@ -0,0 +1,181 @@
+import argparse
+import os
+import struct
+import sys
+import time
+import zlib
+import simulacao
+
+# Replays compactos: semente, nível, duração e as teclas de cada partida, com o tick
+# em que foram aplicadas. Como a simulação só depende disso, reproduzir é refazer os
+# mesmos step() e conferir o checksum do estado final gravado no rodapé.
+#
+# Formato: cabeçalho fixo, um varint por tecla ((ticks desde a anterior << 2) | movimento,
+# 1 byte se vier em menos de 32 ticks), rodapé com o total de ticks e o checksum.
+#
+#   python replay.py replays/*.sdr                    # re-simula sem janela e confere
+#   python replay.py --tempo-real replays/x.sdr       # redesenha no ritmo original
+
+MAGICO = b"SDRP"
+VERSAO = 1
+CABECALHO = struct.Struct("<4sBQBHHHH")   # mágico, versão, semente, nível, duração, cols, rows, ms por tick
+RODAPE = struct.Struct("<II")             # ticks simulados, checksum do estado final
+EXTENSAO = ".sdr"
+PASTA_PADRAO = "replays"
+
+def checksum(jogo):
+    # CRC32 de tudo que a simulação usa; o "nivel" dos meteoros é só de desenho e fica fora
+    m, n = jogo["meteoros"], jogo["meteoros"]["n"]
+    crc = zlib.crc32(repr((jogo["ship_x"], jogo["ship_z"], jogo["state"], jogo["tempo"], jogo["acc"],
+                           jogo["ultimo_spawn"], n)).encode())
+    for c in ("x", "z", "dx", "dz"):
+        crc = zlib.crc32(m[c][:n].tobytes(), crc)
+    return zlib.crc32(repr(jogo["rng"].getstate()).encode(), crc)
+
+def _varint(buf, v):
+    while v >= 0x80:
+        buf.append(v & 0x7F | 0x80)
+        v >>= 7
+    buf.append(v)
+
+def _ler_varints(dados):
+    v = desloc = 0
+    for b in dados:
+        v |= (b & 0x7F) << desloc
+        if b & 0x80:
+            desloc += 7
+        else:
+            yield v
+            v = desloc = 0
+
+# --- Gravação -------------------------------------------------------------------
+
+def novo_gravador(jogo, tick_ms=simulacao.TICK_MS):
+    return {"jogo": jogo, "tick_ms": tick_ms, "tick": 0, "ultimo": 0, "eventos": bytearray()}
+
+def registrar(g, entradas):
+    # Uma chamada por tick, com as entradas aplicadas nele
+    for mov in entradas:
+        _varint(g["eventos"], (g["tick"] - g["ultimo"]) << 2 | mov)
+        g["ultimo"] = g["tick"]
+    g["tick"] += 1
+
+def pular(g, ticks):
+    # Vários ticks sem entradas de uma vez (o servidor só avança a sessão quando algo muda)
+    g["tick"] += ticks
+
+def serializar(g):
+    j = g["jogo"]
+    return (CABECALHO.pack(MAGICO, VERSAO, j["semente"], j["nivel"], j["duracao"], j["cols"], j["rows"], g["tick_ms"])
+            + bytes(g["eventos"]) + RODAPE.pack(g["tick"], checksum(j)))
+
+def salvar(g, pasta=PASTA_PADRAO):
+    os.makedirs(pasta, exist_ok=True)
+    nome = f"{time.strftime('%Y%m%d-%H%M%S')}-{g['jogo']['semente']:08x}{EXTENSAO}"
+    caminho = os.path.join(pasta, nome)
+    with open(caminho, "wb") as f:
+        f.write(serializar(g))
+    return caminho
+
+# --- Leitura e reprodução -------------------------------------------------------
+
+def ler(caminho):
+    with open(caminho, "rb") as f:
+        dados = f.read()
+    if len(dados) < CABECALHO.size + RODAPE.size:
+        raise ValueError(f"{caminho}: arquivo truncado")
+    magico, versao, semente, nivel, duracao, cols, rows, tick_ms = CABECALHO.unpack_from(dados)
+    if magico != MAGICO or versao != VERSAO:
+        raise ValueError(f"{caminho}: não é um replay versão {VERSAO}")
+    ticks, crc = RODAPE.unpack_from(dados, len(dados) - RODAPE.size)
+
+    entradas, tick = {}, 0
+    for v in _ler_varints(dados[CABECALHO.size:len(dados) - RODAPE.size]):
+        tick += v >> 2
+        entradas.setdefault(tick, []).append(v & 3)
+    return {"semente": semente, "nivel": nivel, "duracao": duracao, "cols": cols, "rows": rows,
+            "tick_ms": tick_ms, "ticks": ticks, "checksum": crc, "entradas": entradas}
+
+def simular(r):
+    # Mesmos step() do laço do jogo, sem relógio: o mais rápido que a CPU deixar
+    jogo = simulacao.nova_partida(r["nivel"], r["duracao"], r["semente"], r["cols"], r["rows"])
+    entradas, vazio = r["entradas"], []
+    for tick in range(r["ticks"]):
+        if jogo["state"] != "jogando": break   # daqui em diante step() não muda nada
+        simulacao.step(jogo, entradas.get(tick, vazio), r["tick_ms"])
+    return jogo
+
+def novo_reprodutor(r):
+    # Fonte de entradas para o loop_jogo no lugar do teclado; "jogo" é preenchido por ele
+    return {"replay": r, "tick": 0, "jogo": None}
+
+def proximas_entradas(rep):
+    tick = rep["tick"]
+    rep["tick"] += 1
+    return rep["replay"]["entradas"].get(tick, [])
+
+def terminou(rep):
+    return rep["tick"] >= rep["replay"]["ticks"]
+
+def reproduzir(caminho, modulo="game", modo_render="fixo"):
+    # Redesenha a partida em tempo real numa janela; devolve o estado final
+    import importlib
+    import pygame
+    import fundo
+    import opcoes
+    import render
+    import texturas
+    jogo_mod = importlib.import_module(modulo)
+    r = ler(caminho)
+    if r["tick_ms"] != simulacao.TICK_MS:
+        raise ValueError(f"{caminho}: gravado com outro tick; use a reprodução sem janela")
+
+    pygame.init()
+    display = (1280, 720)
+    opcoes.abrir_janela(display)
+    pygame.display.set_caption(f"Space Dodge - replay {os.path.basename(caminho)}")
+    render.iniciar(modo_render)
+    fundo.init_opengl()
+    fundo.init_all_textures()
+    rep = novo_reprodutor(r)
+    try:
+        jogo_mod.loop_jogo(display, r["duracao"], r["nivel"], r["semente"], opcoes.relogio(), reproducao=rep,
+                           cols=r["cols"], rows=r["rows"])
+    finally:
+        texturas.encerrar()
+        pygame.quit()
+    if not terminou(rep):
+        print(f"{caminho}: interrompido no tick {rep['tick']} de {r['ticks']}")
+        return None
+    return rep["jogo"]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reprodução e conferência de replays do Space Dodge")
+    parser.add_argument("arquivos", nargs="+")
+    parser.add_argument("--tempo-real", action="store_true", help="redesenha numa janela no ritmo original")
+    parser.add_argument("--modulo", default="game", choices=("game", "b2"), help="variante do jogo (com --tempo-real)")
+    parser.add_argument("--render", default="fixo", choices=("fixo", "shader"), help="backend de desenho (com --tempo-real)")
+    args = parser.parse_args(argv)
+
+    falhas, inicio = 0, time.perf_counter()
+    for caminho in args.arquivos:
+        try:
+            r = ler(caminho)
+            jogo = reproduzir(caminho, args.modulo, args.render) if args.tempo_real else simular(r)
+        except (OSError, ValueError) as e:
+            print(f"ERRO {e}")
+            falhas += 1
+            continue
+        if jogo is None: continue
+        obtido = checksum(jogo)
+        if obtido != r["checksum"]:
+            print(f"FALHOU {caminho}: checksum {obtido:08x}, esperado {r['checksum']:08x} ({jogo['state']})")
+            falhas += 1
+
+    total = time.perf_counter() - inicio
+    print(f"{len(args.arquivos)} replays, {falhas} falhas, {total:.2f} s "
+          f"({len(args.arquivos) / max(total, 1e-9):.0f} partidas/s)")
+    return 1 if falhas else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+import argparse
+import asyncio
+import json
+import os
+import struct
+import sys
+import time
+import numpy as np
+import meteoros
+import replay
+import simulacao
+import tabuleiro
+
+# Servidor de partidas sem janela, para validar placares e para jogo remoto. Cada
+# sessão é uma partida de simulacao com semente, nível, duração e tabuleiro próprios; o
+# cliente manda os movimentos e recebe o estado a cada passo. Um agendador só avança
+# todas as sessões ativas em ticks de TICK_MS, com as entradas que chegaram desde o
+# tick anterior, exatamente como o loop_jogo, então a partida pode ser conferida depois
+# pelo replay (o checksum do estado final vai na mensagem de fim).
+# Numa sessão os passos (a parte cara) e o fim da partida só acontecem a cada FASES =
+# PASSO_MS / TICK_MS ticks; nos outros, sem entradas, step() só soma o acumulado. Então
+# cada tick só avança as sessões da fase dele e as que receberam movimentos, com os
+# ticks vazios desde a última vez numa chamada só (o replay fica igual ao de tick em
+# tick). Cada sessão nova entra na fase com menos sessões, para os passos de milhares
+# delas não caírem todos no mesmo tick.
+#
+#   python servidor.py --porta 7777
+#   python servidor.py --unix /tmp/space-dodge.sock --replays replays
+#
+# Protocolo binário, little-endian, uma mensagem atrás da outra; a primeira letra é o tipo.
+# Uma conexão pode ter várias sessões.
+#   cliente -> servidor
+#     N etiqueta:u32 semente:u64 nivel:u8 duracao:u16 cols:u16 rows:u16   nova sessão
+#     M sessao:u32 movimento:u8                                           movimento (simulacao.ESQUERDA...)
+#     S sessao:u32                                                        abandona a sessão
+#     Q                                                                   estatísticas (e zera a janela)
+#   servidor -> cliente
+#     C etiqueta:u32 sessao:u32                                           sessão criada
+#     R etiqueta:u32                                                      sessão recusada
+#     E sessao:u32 tempo_ms:u32 nave_x:u16 nave_z:u16 n:u32               estado, seguido de n
+#       meteoros (x:i16 z:i16 dx:i8 dz:i8); mandado depois de cada passo ou movimento
+#     F sessao:u32 resultado:u8 tempo_ms:u32 ticks:u32 checksum:u32        fim da partida (RESULTADOS)
+#     Q tamanho:u32 seguido de JSON                                       estatísticas
+
+NOVA = struct.Struct("<cIQBHHH")
+MOVER = struct.Struct("<cIB")
+SAIR = struct.Struct("<cI")
+CONSULTA = struct.Struct("<c")
+CRIADA = struct.Struct("<cII")
+RECUSADA = struct.Struct("<cI")
+ESTADO = struct.Struct("<cIIHHI")
+FIM = struct.Struct("<cIBIII")
+TAMANHO = struct.Struct("<cI")
+METEORO = np.dtype([("x", "<i2"), ("z", "<i2"), ("dx", "i1"), ("dz", "i1")])
+MENSAGENS = {b"N": NOVA, b"M": MOVER, b"S": SAIR, b"Q": CONSULTA}
+RESULTADOS = {"Vitoria": 1, "Derrota": 2, "abandonada": 3}
+
+FASES = simulacao.PASSO_MS // simulacao.TICK_MS
+MAX_SESSOES = 1500         # acima disso novas sessões são recusadas (p99 da CPU do tick ~6 ms com 1000 sessões)
+DURACAO_MAXIMA = 3600      # segundos
+LIMITE_SAIDA = 256 * 1024  # bytes esperando na conexão: acima disso os estados dela são pulados (o fim não)
+JANELA = 6000              # ticks guardados para as estatísticas (60 s)
+
+def _nova_estatistica():
+    return {"inicio": time.perf_counter(), "cpu": time.process_time(), "ticks": 0, "descartados": 0,
+            "amostras": np.zeros((3, JANELA)), "recebidas": 0, "estados": 0, "pulados": 0, "bytes": 0,
+            "encerradas": 0, "recusadas": 0}
+
+def novo_servidor(max_sessoes=MAX_SESSOES, replays=None):
+    return {
+        "sessoes": {}, "proxima": 1, "tick": 0,
+        "fases": [{} for _ in range(FASES)],   # sessões que dão o passo nos ticks t % FASES == fase
+        "entradas": {},                         # sessões com movimentos para o próximo tick
+        "max_sessoes": max_sessoes, "replays": replays, "estatisticas": _nova_estatistica(),
+    }
+
+# --- Sessões ----------------------------------------------------------------------
+
+def _valida(nivel, duracao, cols, rows):
+    return (nivel in (1, 2, 3) and 1 <= duracao <= DURACAO_MAXIMA
+            and all(tabuleiro.MINIMO <= n <= tabuleiro.MAXIMO for n in (cols, rows)))
+
+def criar_sessao(sv, conexao, semente, nivel, duracao, cols, rows):
+    # None se recusada; senão o id. Na fase menos ocupada: a partida começa depois do
+    # próximo tick dela, e o primeiro passo vem FASES ticks depois
+    if len(sv["sessoes"]) >= sv["max_sessoes"] or not _valida(nivel, duracao, cols, rows):
+        sv["estatisticas"]["recusadas"] += 1
+        return None
+    fases = sv["fases"]
+    fase = min(range(FASES), key=lambda f: len(fases[f]))
+    jogo = simulacao.nova_partida(nivel, duracao, semente, cols, rows)
+    sid = sv["proxima"]
+    sv["proxima"] += 1
+    s = sv["sessoes"][sid] = fases[fase][sid] = {
+        "id": sid, "jogo": jogo, "gravador": replay.novo_gravador(jogo), "pendentes": [],
+        "conexao": conexao, "fase": fase,
+        "tick": sv["tick"] + (fase - sv["tick"]) % FASES,   # último tick simulado
+    }
+    conexao["sessoes"].add(sid)
+    return sid
+
+def mover(sv, s, movimento):
+    s["pendentes"].append(movimento)
+    sv["entradas"][s["id"]] = s
+
+def _encerrar(sv, s, resultado):
+    # Tira a sessão do agendador e põe a mensagem de fim na saída da conexão
+    del sv["sessoes"][s["id"]], sv["fases"][s["fase"]][s["id"]]
+    sv["entradas"].pop(s["id"], None)
+    conexao, jogo, g = s["conexao"], s["jogo"], s["gravador"]
+    conexao["sessoes"].discard(s["id"])
+    conexao["saida"] += FIM.pack(b"F", s["id"], RESULTADOS[resultado], jogo["tempo"] + jogo["acc"],
+                                 g["tick"], replay.checksum(jogo))
+    sv["estatisticas"]["encerradas"] += 1
+    if sv["replays"] and resultado != "abandonada":
+        # O arquivo é escrito numa thread: abrir um arquivo por partida dentro do tick atrasava os outros
+        caminho = os.path.join(sv["replays"], f"{s['id']:08d}-{jogo['semente']:08x}{replay.EXTENSAO}")
+        asyncio.get_running_loop().run_in_executor(None, _gravar, caminho, replay.serializar(g))
+
+def _gravar(caminho, dados):
+    with open(caminho, "wb") as f:
+        f.write(dados)
+
+def _estado(s):
+    jogo = s["jogo"]
+    x, z, dx, dz = meteoros.vivos(jogo["meteoros"])
+    m = np.empty(len(x), dtype=METEORO)
+    m["x"], m["z"], m["dx"], m["dz"] = x, z, dx, dz
+    return ESTADO.pack(b"E", s["id"], jogo["tempo"], jogo["ship_x"], jogo["ship_z"], len(m)) + m.tobytes()
+
+def _avancar(s, t):
+    # Simula a sessão até o tick t, que recebe as entradas pendentes. Os ticks vazios
+    # desde o último simulado não passam de um passo, então vão num step() só
+    jogo, g, pendentes = s["jogo"], s["gravador"], s["pendentes"]
+    vazios = t - s["tick"] - 1
+    if vazios:
+        simulacao.step(jogo, (), vazios * simulacao.TICK_MS)
+        replay.pular(g, vazios)
+    simulacao.step(jogo, pendentes, simulacao.TICK_MS)
+    replay.registrar(g, pendentes)
+    s["tick"] = t
+    if pendentes: s["pendentes"] = []
+
+def tick(sv):
+    # As sessões da fase do tick e as que têm movimentos; os estados de cada conexão
+    # saem depois numa escrita só (_enviar)
+    sv["tick"] += 1
+    t, est, fim = sv["tick"], sv["estatisticas"], []
+    fase = sv["fases"][t % FASES]
+    entradas, sv["entradas"] = sv["entradas"], {}
+    ativas = list(fase.values())
+    ativas += [s for sid, s in entradas.items() if sid not in fase]
+    for s in ativas:
+        if s["tick"] >= t:
+            # Ainda não começou: as entradas esperam o primeiro tick dela
+            if s["pendentes"]: sv["entradas"][s["id"]] = s
+            continue
+        jogo, pendentes = s["jogo"], s["pendentes"]
+        tempo = jogo["tempo"]
+        _avancar(s, t)
+        if jogo["state"] != "jogando":
+            fim.append(s)
+        elif pendentes or jogo["tempo"] != tempo:
+            conexao = s["conexao"]
+            if conexao["atrasada"]:
+                est["pulados"] += 1
+            else:
+                conexao["saida"] += _estado(s)
+                est["estados"] += 1
+    for s in fim:
+        _encerrar(sv, s, s["jogo"]["state"])
+
+def _enviar(sv, conexoes):
+    est = sv["estatisticas"]
+    for conexao in conexoes:
+        if conexao["saida"]:
+            est["bytes"] += len(conexao["saida"])
+            conexao["escritor"].write(conexao["saida"])
+            conexao["saida"].clear()
+        conexao["atrasada"] = conexao["escritor"].transport.get_write_buffer_size() > LIMITE_SAIDA
+
+def estatisticas(sv):
+    # Desde a consulta anterior: atraso de cada tick em relação à grade de TICK_MS,
+    # tempo de trabalho dele (no relógio e em CPU: a diferença é o processo esperando a
+    # vez na CPU), CPU do processo e contadores; zera a janela
+    est, agora = sv["estatisticas"], time.perf_counter()
+    n = min(est["ticks"], JANELA)
+    atraso, trabalho, cpu = est["amostras"][:, :n]
+    def _p(a):
+        if not n: return None
+        return {"p50": float(np.percentile(a, 50)), "p99": float(np.percentile(a, 99)), "max": float(a.max())}
+    r = {
+        "sessoes": len(sv["sessoes"]), "tick_ms": simulacao.TICK_MS, "ticks": est["ticks"],
+        "ticks_descartados": est["descartados"], "ticks_atrasados": int(np.count_nonzero(atraso > simulacao.TICK_MS)),
+        "atraso_ms": _p(atraso), "trabalho_ms": _p(trabalho), "trabalho_cpu_ms": _p(cpu),
+        "parede_s": agora - est["inicio"], "cpu_s": time.process_time() - est["cpu"],
+        "mensagens_recebidas": est["recebidas"], "estados_enviados": est["estados"],
+        "estados_pulados": est["pulados"], "bytes_enviados": est["bytes"],
+        "partidas_encerradas": est["encerradas"], "sessoes_recusadas": est["recusadas"],
+    }
+    sv["estatisticas"] = _nova_estatistica()
+    return r
+
+# --- Rede -------------------------------------------------------------------------
+
+async def agendador(sv, conexoes):
+    # Ticks na grade de TICK_MS do relógio do loop. Atrasado, recupera os ticks
+    # perdidos em seguida (como o acumulado do loop_jogo); além de ATRASO_MAX_MS o
+    # tempo é descartado
+    loop = asyncio.get_running_loop()
+    periodo = simulacao.TICK_MS / 1000
+    previsto = loop.time()
+    while True:
+        previsto += periodo
+        espera = previsto - loop.time()
+        await asyncio.sleep(max(espera, 0))
+        atraso = loop.time() - previsto
+        if atraso * 1000 > simulacao.ATRASO_MAX_MS:
+            perdidos = int(atraso / periodo)
+            sv["estatisticas"]["descartados"] += perdidos
+            previsto += perdidos * periodo
+            atraso -= perdidos * periodo
+        inicio, inicio_cpu = time.perf_counter(), time.thread_time()
+        tick(sv)
+        _enviar(sv, conexoes)
+        est = sv["estatisticas"]
+        est["amostras"][:, est["ticks"] % JANELA] = (atraso * 1000, (time.perf_counter() - inicio) * 1000,
+                                                     (time.thread_time() - inicio_cpu) * 1000)
+        est["ticks"] += 1
+
+async def atender(sv, conexoes, leitor, escritor):
+    conexao = {"escritor": escritor, "saida": bytearray(), "atrasada": False, "sessoes": set()}
+    conexoes.append(conexao)
+    try:
+        while True:
+            tipo = await leitor.read(1)
+            formato = MENSAGENS.get(tipo)
+            if formato is None: break   # fim da conexão ou mensagem desconhecida
+            campos = formato.unpack(tipo + await leitor.readexactly(formato.size - 1))
+            sv["estatisticas"]["recebidas"] += 1
+            if tipo == b"M":
+                s = sv["sessoes"].get(campos[1])
+                if s is not None and s["conexao"] is conexao and campos[2] in simulacao.MOVIMENTOS:
+                    mover(sv, s, campos[2])
+                continue
+            if tipo == b"N":
+                sid = criar_sessao(sv, conexao, *campos[2:])
+                escritor.write(CRIADA.pack(b"C", campos[1], sid) if sid else RECUSADA.pack(b"R", campos[1]))
+            elif tipo == b"S":
+                s = sv["sessoes"].get(campos[1])
+                if s is not None and s["conexao"] is conexao: _encerrar(sv, s, "abandonada")
+            else:
+                dados = json.dumps(estatisticas(sv)).encode()
+                escritor.write(TAMANHO.pack(b"Q", len(dados)) + dados)
+            if conexao["saida"]:   # o fim de uma sessão abandonada
+                escritor.write(conexao["saida"])
+                conexao["saida"].clear()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        conexoes.remove(conexao)
+        for sid in list(conexao["sessoes"]):
+            _encerrar(sv, sv["sessoes"][sid], "abandonada")
+        escritor.close()
+
+async def servir(host="127.0.0.1", porta=7777, unix=None, max_sessoes=MAX_SESSOES, replays=None):
+    if replays: os.makedirs(replays, exist_ok=True)
+    sv, conexoes = novo_servidor(max_sessoes, replays), []
+    atendente = lambda leitor, escritor: atender(sv, conexoes, leitor, escritor)
+    if unix:
+        servidor = await asyncio.start_unix_server(atendente, path=unix)
+    else:
+        servidor = await asyncio.start_server(atendente, host, porta)
+    print(f"servidor: {unix or f'{host}:{porta}'}, até {max_sessoes} sessões, tick de {simulacao.TICK_MS} ms",
+          file=sys.stderr)
+    async with servidor:
+        await asyncio.gather(servidor.serve_forever(), agendador(sv, conexoes))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de partidas do Space Dodge sem janela")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=7777)
+    parser.add_argument("--unix", metavar="CAMINHO", help="socket Unix no lugar do TCP")
+    parser.add_argument("--max-sessoes", type=int, default=MAX_SESSOES)
+    parser.add_argument("--replays", metavar="PASTA", help="grava o replay de cada partida terminada")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(servir(args.host, args.porta, args.unix, args.max_sessoes, args.replays))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.unix and os.path.exists(args.unix): os.remove(args.unix)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
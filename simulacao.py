@@ -0,0 +1,100 @@
+import random
+import meteoros
+
+# Regras do jogo sem pygame nem OpenGL: o tempo só avança pelo dt passado a step(),
+# então quem chama escolhe o relógio (pygame.time.Clock no jogo, passos fixos nos testes).
+
+PASSO_MS = 200        # os meteoros andam uma casa a cada passo
+TICK_MS = 10          # passo fixo do laço do jogo: entrada aplicada e step() chamado a cada tick
+ATRASO_MAX_MS = 250   # num quadro muito lento, o tempo além disso é descartado em vez de simulado
+
+LARGURA_FAIXA = 8     # tabuleiros maiores que 8x8 sorteiam um lote por faixa de 8 casas
+
+ESQUERDA, DIREITA, CIMA, BAIXO = range(4)
+MOVIMENTOS = {ESQUERDA: (-1, 0), DIREITA: (1, 0), CIMA: (0, -1), BAIXO: (0, 1)}
+
+def intervalo_spawn(nivel):
+    return 800 if nivel < 3 else 400
+
+def nova_partida(nivel, duracao, semente=None, cols=8, rows=8):
+    # Sem semente, sorteia uma: toda partida fica reproduzível a partir do replay
+    if semente is None: semente = random.getrandbits(32)
+    return {
+        "nivel": nivel, "duracao": duracao, "cols": cols, "rows": rows,
+        "semente": semente, "rng": random.Random(semente),
+        "ship_x": cols // 2, "ship_z": 0,
+        "meteoros": meteoros.novo(),
+        "state": "jogando",
+        "tempo": 0,           # ms simulados até o último passo
+        "acc": 0,             # ms acumulados desde o último passo
+        "ultimo_spawn": None,
+    }
+
+def tempo_restante(jogo):
+    return max(0, jogo["duracao"] - int((jogo["tempo"] + jogo["acc"]) / 1000.0))
+
+def mover_nave(jogo, mov):
+    dx, dz = MOVIMENTOS[mov]
+    nx, nz = jogo["ship_x"] + dx, jogo["ship_z"] + dz
+    if 0 <= nx < jogo["cols"] and 0 <= nz < jogo["rows"]:
+        jogo["ship_x"], jogo["ship_z"] = nx, nz
+
+def _spawn(jogo):
+    # Sorteia o lote do passo (vertical + horizontal opcional) e insere de uma vez; a
+    # densidade de meteoros fica a mesma do 8x8 em qualquer tamanho de tabuleiro
+    rng, cols, rows = jogo["rng"], jogo["cols"], jogo["rows"]
+    xs, zs, dxs, dzs = [], [], [], []
+    for _ in range(max(1, max(cols, rows) // LARGURA_FAIXA)):
+        xs.append(rng.randint(0, cols-1)); zs.append(rows); dxs.append(0); dzs.append(-1)
+        if jogo["nivel"] >= 2 and rng.choice([True, False]):
+            if rng.choice([0, 1]) == 0:
+                start_x, move_x = -1, 1
+            else:
+                start_x, move_x = cols, -1
+            xs.append(start_x); zs.append(rng.randint(0, rows-1)); dxs.append(move_x); dzs.append(0)
+    meteoros.adicionar(jogo["meteoros"], xs, zs, dxs, dzs)
+
+def _passo(jogo):
+    cols, rows, m = jogo["cols"], jogo["rows"], jogo["meteoros"]
+    meteoros.mover(m)
+    if meteoros.ocupacao(m, cols, rows)[jogo["ship_z"], jogo["ship_x"]]:
+        jogo["state"] = "Derrota"
+    meteoros.descartar_fora(m, cols, rows)
+
+    # Meteoros novos nascem na borda e só andam no passo seguinte
+    if jogo["ultimo_spawn"] is None or jogo["tempo"] - jogo["ultimo_spawn"] >= intervalo_spawn(jogo["nivel"]):
+        _spawn(jogo)
+        jogo["ultimo_spawn"] = jogo["tempo"]
+
+def step(jogo, entradas, dt):
+    if jogo["state"] != "jogando": return jogo
+    for mov in entradas:
+        mover_nave(jogo, mov)
+
+    fim = jogo["duracao"] * 1000
+    jogo["acc"] += dt
+    while jogo["acc"] >= PASSO_MS and jogo["tempo"] + PASSO_MS < fim:
+        jogo["acc"] -= PASSO_MS
+        jogo["tempo"] += PASSO_MS
+        _passo(jogo)
+        if jogo["state"] != "jogando": return jogo
+
+    if jogo["tempo"] + jogo["acc"] >= fim:
+        jogo["state"] = "Vitoria"
+    return jogo
+
+def meteoros_interpolados(jogo, atraso_ms=0, indices=slice(None)):
+    # Posições contínuas (em casas) dos meteoros atraso_ms antes do tempo simulado: entre
+    # dois passos cada meteoro anda em linha reta da casa atual para a próxima, e chega
+    # nela no instante do passo (quando a colisão é testada). indices escolhe um
+    # subconjunto (ex.: meteoros.na_regiao)
+    xs, zs, dxs, dzs = (a[indices] for a in meteoros.vivos(jogo["meteoros"]))
+    f = (jogo["acc"] - atraso_ms) / PASSO_MS if jogo["state"] == "jogando" else 0.0
+    return xs + dxs * f, zs + dzs * f
+
+def simular(nivel, duracao, semente=None, politica=None, cols=8, rows=8):
+    # Partida inteira em passos fixos; politica(jogo) devolve a lista de movimentos do passo
+    jogo = nova_partida(nivel, duracao, semente, cols, rows)
+    while jogo["state"] == "jogando":
+        step(jogo, politica(jogo) if politica else (), PASSO_MS)
+    return jogo
@@ -0,0 +1,62 @@
+import math
+import numpy as np
+
+# Tabuleiros maiores que o 8x8 original (até 512x512): tamanhos oferecidos no menu,
+# câmera que acompanha a nave e a parte do tabuleiro que cabe na tela, usada para
+# desenhar só os blocos da grade e os meteoros que podem aparecer.
+
+TAMANHOS = (8, 16, 32, 64, 128, 256, 512)
+MINIMO, MAXIMO = TAMANHOS[0], TAMANHOS[-1]
+LADO_BLOCO = 32                      # casas por lado de cada bloco da grade
+OFFSET_CAMERA = (0.0, 30.0, 50.0)    # olho em relação ao alvo, como a câmera fixa do 8x8
+SUAVIZACAO_MS = 150.0                # constante de tempo da câmera seguindo a nave
+VAZIA = (0, 0, -1, -1)               # faixa de casas sem nenhuma casa
+
+def grande(cols, rows):
+    # Maior que o tabuleiro que a câmera fixa enquadra inteiro
+    return cols > MINIMO or rows > MINIMO
+
+def proximo_tamanho(atual, delta):
+    # Tamanho seguinte/anterior de TAMANHOS a partir de um lado qualquer
+    if delta > 0: return next((t for t in TAMANHOS if t > atual), MAXIMO)
+    return next((t for t in reversed(TAMANHOS) if t < atual), MINIMO)
+
+def seguir(alvo, destino, dt):
+    # Aproximação exponencial: a mesma trajetória da câmera em qualquer taxa de quadros
+    k = 1.0 - math.exp(-dt / SUAVIZACAO_MS)
+    return tuple(a + (d - a) * k for a, d in zip(alvo, destino))
+
+def olho(alvo):
+    return tuple(a + o for a, o in zip(alvo, OFFSET_CAMERA))
+
+# Cantos do cubo de clip (índice = 4*z + 2*y + x) e as 12 arestas entre eles
+_CANTOS = np.array([(x, y, z, 1.0) for z in (-1, 1) for y in (-1, 1) for x in (-1, 1)])
+_ARESTAS = np.array([(0, 1), (2, 3), (4, 5), (6, 7), (0, 2), (1, 3), (4, 6), (5, 7),
+                     (0, 4), (1, 5), (2, 6), (3, 7)])
+
+def regiao_visivel(vista_proj, y):
+    # Retângulo (x0, z0, x1, z1) no mundo que contém o corte do frustum pelo plano y:
+    # as arestas do frustum que atravessam o plano dão os vértices do corte.
+    # None se o plano não aparece.
+    cantos = _CANTOS @ np.linalg.inv(vista_proj).T
+    cantos = cantos[:, :3] / cantos[:, 3:]
+    a, b = cantos[_ARESTAS[:, 0]], cantos[_ARESTAS[:, 1]]
+    da, db = a[:, 1] - y, b[:, 1] - y
+    cruza = (da * db <= 0) & (da != db)
+    if not cruza.any(): return None
+    t = da[cruza] / (da[cruza] - db[cruza])
+    p = a[cruza] + (b[cruza] - a[cruza]) * t[:, None]
+    return p[:, 0].min(), p[:, 2].min(), p[:, 0].max(), p[:, 2].max()
+
+def casas_visiveis(regiao, cols, rows, tamanho, margem=1):
+    # Região do mundo -> faixa de casas (x0, z0, x1, z1), inclusiva, limitada ao
+    # tabuleiro mais a margem (meteoros entrando pelas bordas)
+    if regiao is None: return VAZIA
+    wx0, wz0, wx1, wz1 = regiao
+    cx, cz = (cols - 1) / 2.0, (rows - 1) / 2.0
+    x0 = max(-margem, math.floor(wx0 / tamanho + cx) - margem)
+    z0 = max(-margem, math.floor(wz0 / tamanho + cz) - margem)
+    x1 = min(cols - 1 + margem, math.ceil(wx1 / tamanho + cx) + margem)
+    z1 = min(rows - 1 + margem, math.ceil(wz1 / tamanho + cz) + margem)
+    if x0 > x1 or z0 > z1: return VAZIA
+    return x0, z0, x1, z1
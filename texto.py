@@ -0,0 +1,182 @@
+import pygame
+from OpenGL.GL import *
+from OpenGL.GLU import *
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+import render
+
+FACE = 'arial'
+MAX_TEXTURAS = 64   # strings distintas mantidas na GPU antes de descartar a menos usada
+ATLAS_CHARS = [chr(c) for c in range(32, 127)] + list("ÁÂÃÀÇÉÊÍÓÔÕÚáâãàçéêíóôõú")
+
+_texturas = OrderedDict()   # (face, tamanho, negrito, texto) -> (tex_id, w, h)
+_atlas = {}                 # (face, tamanho, negrito) -> dados do atlas de glifos
+# Último texto dinâmico de cada posição: (x, y, tamanho, negrito) -> (ms, texto, tex_id, dados).
+# O mesmo texto reaproveita os quads; um texto novo só é montado depois de _intervalo["ms"]
+# (0 = sempre), o que o governador de qualidade.py aumenta em aparelhos lentos
+_recentes = {}
+_intervalo = {"ms": 0}
+
+def definir_intervalo(ms):
+    _intervalo["ms"] = ms
+
+@lru_cache(maxsize=None)
+def fonte(face, tamanho, negrito=True):
+    try:
+        return pygame.font.SysFont(face, tamanho, bold=negrito)
+    except:
+        return pygame.font.Font(None, tamanho)
+
+def _enviar_superficie(surface):
+    # Glifos brancos: a cor final vem de glColor (GL_MODULATE)
+    data = pygame.image.tostring(surface, "RGBA", True)
+    w, h = surface.get_size()
+    tex_id = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, tex_id)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, w, h, 0, GL_RGBA, GL_UNSIGNED_BYTE, data)
+    return tex_id, w, h
+
+def textura_texto(texto, tamanho, negrito=True, face=FACE):
+    chave = (face, tamanho, negrito, texto)
+    tex = _texturas.get(chave)
+    if tex is not None:
+        _texturas.move_to_end(chave)
+        return tex
+
+    surface = fonte(face, tamanho, negrito).render(texto, True, (255, 255, 255))
+    tex = _texturas[chave] = _enviar_superficie(surface)
+    if len(_texturas) > MAX_TEXTURAS:
+        _, (antigo, _, _) = _texturas.popitem(last=False)
+        glDeleteTextures([antigo])
+    return tex
+
+def atlas(tamanho, negrito=True, face=FACE):
+    chave = (face, tamanho, negrito)
+    if chave in _atlas: return _atlas[chave]
+
+    font = fonte(face, tamanho, negrito)
+    glifos = [(c, font.render(c, True, (255, 255, 255))) for c in ATLAS_CHARS]
+    altura = font.get_height()
+    largura = 512
+    x = y = 0
+    posicoes = []
+    for c, surf in glifos:
+        w = surf.get_width()
+        if x + w > largura: x, y = 0, y + altura + 1
+        posicoes.append((c, x, y, w))
+        x += w + 1
+    total_h = y + altura
+
+    folha = pygame.Surface((largura, total_h), pygame.SRCALPHA)
+    for (c, gx, gy, w), (_, surf) in zip(posicoes, glifos):
+        folha.blit(surf, (gx, gy))
+    tex_id, _, _ = _enviar_superficie(folha)
+
+    # Coordenadas de textura já invertidas em y (tostring com flip)
+    tabela = {}
+    for c, gx, gy, w in posicoes:
+        t0 = (total_h - gy - altura) / total_h
+        tabela[c] = (w, gx / largura, t0, (gx + w) / largura, t0 + altura / total_h)
+    _atlas[chave] = (tex_id, altura, tabela, font, {})
+    return _atlas[chave]
+
+def _avanco(font, pares, a, b):
+    # Avanço de a quando seguido de b, já com kerning; medido uma vez por par
+    d = pares.get((a, b))
+    if d is None:
+        d = pares[(a, b)] = font.size(a + b)[0] - font.size(b)[0]
+    return d
+
+def _quads_atlas(texto, x, y, altura, tabela, font, pares):
+    # Um quad por caractere, enviados juntos em um único glDrawArrays
+    dados = np.zeros((len(texto) * 4, 5), dtype=np.float32)   # GL_T2F_V3F
+    cx = x
+    for i, c in enumerate(texto):
+        w, s0, t0, s1, t1 = tabela[c]
+        dados[i*4:i*4+4, :4] = ((s0, t0, cx, y), (s1, t0, cx + w, y),
+                                (s1, t1, cx + w, y + altura), (s0, t1, cx, y + altura))
+        if i + 1 < len(texto): cx += _avanco(font, pares, c, texto[i + 1])
+    return dados
+
+def desenhar(texto, x, y, display, tamanho=32, cor=(255, 255, 255, 255), dinamico=False, negrito=True):
+    if not texto: return
+
+    dados = None
+    if dinamico:
+        posicao, agora = (x, y, tamanho, negrito), pygame.time.get_ticks()
+        recente = _recentes.get(posicao)
+        if recente is not None and (recente[1] == texto or agora - recente[0] < _intervalo["ms"]):
+            _, _, tex_id, dados = recente
+        else:
+            tex_id, altura, tabela, font, pares = atlas(tamanho, negrito)
+            if all(c in tabela for c in texto):
+                dados = _quads_atlas(texto, x, y, altura, tabela, font, pares)
+                if len(_recentes) > MAX_TEXTURAS: _recentes.clear()
+                _recentes[posicao] = (agora, texto, tex_id, dados)
+    if dados is None:
+        tex_id, w, h = textura_texto(texto, tamanho, negrito)
+
+    if render.programavel():
+        if dados is None:
+            dados = np.array([(0, 0, x, y, 0), (1, 0, x + w, y, 0), (1, 1, x + w, y + h, 0), (0, 1, x, y + h, 0)],
+                             dtype=np.float32)
+        glDisable(GL_DEPTH_TEST)
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glBindTexture(GL_TEXTURE_2D, tex_id)
+        render.desenhar_quads_2d(dados, display, cor)
+        glDisable(GL_BLEND)
+        glEnable(GL_DEPTH_TEST)
+        return
+
+    glMatrixMode(GL_PROJECTION)
+    glPushMatrix()
+    glLoadIdentity()
+    gluOrtho2D(0, display[0], 0, display[1])
+    glMatrixMode(GL_MODELVIEW)
+    glPushMatrix()
+    glLoadIdentity()
+
+    glPushAttrib(GL_ENABLE_BIT | GL_CURRENT_BIT | GL_COLOR_BUFFER_BIT)
+    glDisable(GL_DEPTH_TEST)
+    glDisable(GL_LIGHTING)
+    glDisable(GL_COLOR_MATERIAL) # senão glColor altera o material das esferas
+    glEnable(GL_TEXTURE_2D)
+    glEnable(GL_BLEND)
+    glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+    glColor4ub(*cor)
+    glBindTexture(GL_TEXTURE_2D, tex_id)
+
+    if dados is None:
+        glBegin(GL_QUADS)
+        glTexCoord2f(0, 0); glVertex2f(x, y)
+        glTexCoord2f(1, 0); glVertex2f(x + w, y)
+        glTexCoord2f(1, 1); glVertex2f(x + w, y + h)
+        glTexCoord2f(0, 1); glVertex2f(x, y + h)
+        glEnd()
+    else:
+        glPushClientAttrib(GL_CLIENT_VERTEX_ARRAY_BIT)
+        glInterleavedArrays(GL_T2F_V3F, 0, dados)
+        glDrawArrays(GL_QUADS, 0, len(dados))
+        glPopClientAttrib()
+
+    glPopAttrib()
+    glMatrixMode(GL_PROJECTION)
+    glPopMatrix()
+    glMatrixMode(GL_MODELVIEW)
+    glPopMatrix()
+
+def limpar():
+    for tex_id, _, _ in _texturas.values():
+        glDeleteTextures([tex_id])
+    _texturas.clear()
+    for tex_id, *_ in _atlas.values():
+        glDeleteTextures([tex_id])
+    _atlas.clear()
+    _recentes.clear()
@@ -0,0 +1,294 @@
+from OpenGL.GL import *
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+import numpy as np
+from PIL import Image
+import atlas
+import pacote_texturas
+
+# Carregamento assíncrono das texturas. registrar(cfg) põe um placeholder 1x1 em
+# cfg["id"] na hora e carregar() planeja e dispara a leitura/decodificação num pool de
+# threads; o envio à GPU acontece na thread do GL, em processar(), dentro de um
+# orçamento de tempo por quadro. Quando a textura termina de subir, cfg["id"] passa a
+# apontar para ela.
+# No modo progressivo os mipmaps sobem do menor para o maior: a textura aparece
+# borrada logo no começo e ganha detalhe a cada quadro.
+# Texturas registradas com um grupo de atlas são empacotadas juntas (atlas.py) e
+# ganham cfg["uv"] = (u0, v0, du, dv), o retângulo delas dentro da página. Com um
+# orçamento de memória, as texturas que mais ocupam são reduzidas à metade até caber.
+
+ORCAMENTO_MS = 4.0
+LINHAS_POR_ENVIO = 128            # faixas de glTexSubImage2D: nenhum envio sozinho trava o quadro
+PIXELS_PROGRESSIVO = 1_000_000    # no modo automático, imagens desse tamanho para cima são progressivas
+COR_PLACEHOLDER = (128, 128, 128, 255)
+LADO_ATLAS = 4096                 # limitado também pelo GL_MAX_TEXTURE_SIZE
+LADO_MINIMO = 16                  # o orçamento não reduz texturas abaixo disso
+
+_estado = None
+
+def iniciar(pacote=pacote_texturas.ARQUIVO_PADRAO, progressivo=None, orcamento_mb=None, trabalhadores=4):
+    # progressivo: None decide pelo tamanho da imagem, True/False força para todas
+    # orcamento_mb: memória de textura máxima na GPU (None = sem limite)
+    global _estado
+    encerrar()
+    placeholder = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, placeholder)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+    glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, 1, 1, 0, GL_RGBA, GL_UNSIGNED_BYTE, bytes(COR_PLACEHOLDER))
+    _estado = {
+        "pool": ThreadPoolExecutor(trabalhadores, thread_name_prefix="texturas"),
+        "pacote": pacote_texturas.abrir(pacote) if pacote else None,
+        "progressivo": progressivo,
+        "orcamento": orcamento_mb * 1024 * 1024 if orcamento_mb else None,
+        "lado_atlas": min(LADO_ATLAS, int(glGetIntegerv(GL_MAX_TEXTURE_SIZE))),
+        "placeholder": placeholder,
+        "registradas": [],     # (cfg, grupo de atlas)
+        "decodificando": [],   # trabalhos no pool, em ordem de registro
+        "envios": [],          # textura decodificada subindo para a GPU
+        "relatorio": {},
+    }
+
+def encerrar():
+    global _estado
+    if _estado: _estado["pool"].shutdown(wait=False, cancel_futures=True)
+    _estado = None
+
+def registrar(cfg, grupo=None):
+    # grupo: nome do atlas onde a textura deve entrar (None = textura própria)
+    cfg["id"], cfg["uv"] = _estado["placeholder"], None
+    _estado["registradas"].append((cfg, grupo))
+
+# --- Planejamento ---------------------------------------------------------------
+
+def _reduzir(tamanho, reducao):
+    # Mesmo arredondamento da cadeia de mipmaps (pacote_texturas.niveis_mip)
+    w, h = tamanho
+    for _ in range(reducao):
+        w, h = max(1, w // 2), max(1, h // 2)
+    return w, h
+
+def _tem_mips_no_pacote(nome):
+    pacote = _estado["pacote"]
+    entrada = pacote["indice"].get(nome) if pacote else None
+    return bool(entrada) and len(entrada["niveis"]) > 1
+
+def _bytes_previstos(item):
+    w, h = _reduzir(item["tamanho"], item["reducao"])
+    if item["atlas"]:
+        return (w + 2 * atlas.MARGEM) * (h + 2 * atlas.MARGEM) * 4
+    return w * h * 4 * (4 / 3 if item["mips"] else 1)
+
+def _paginas(itens):
+    # {grupo: [páginas]}. Só texturas pequenas (até meia página) entram no atlas; as
+    # grandes continuam avulsas, a não ser que o orçamento as reduza
+    grupos = {}
+    for item in itens:
+        tamanho = _reduzir(item["tamanho"], item["reducao"])
+        pequena = max(tamanho) + 2 * atlas.MARGEM <= _estado["lado_atlas"] // 2
+        item["atlas"] = item["grupo"] if item["grupo"] and pequena else None
+        if item["atlas"]: grupos.setdefault(item["atlas"], {})[item["nome"]] = tamanho
+    paginas = {}
+    for grupo, tamanhos in grupos.items():
+        paginas[grupo], fora = atlas.empacotar(tamanhos, _estado["lado_atlas"])
+        for item in itens:
+            if item["atlas"] == grupo and item["nome"] in fora: item["atlas"] = None
+    return paginas
+
+def _total_previsto(itens, paginas):
+    avulsas = sum(_bytes_previstos(i) for i in itens if not i["atlas"])
+    return avulsas + sum(p["largura"] * p["altura"] * 4 for ps in paginas.values() for p in ps)
+
+def _planejar():
+    e = _estado
+    itens = []
+    for cfg, grupo in e["registradas"]:
+        caminho = os.path.join(pacote_texturas.PASTA_ASSETS, cfg["tex"])
+        tamanho = None
+        if os.path.exists(caminho):
+            try:
+                with Image.open(caminho) as img: tamanho = img.size   # só lê o cabeçalho
+            except Exception:
+                pass
+        prog = e["progressivo"] if e["progressivo"] is not None else bool(tamanho) and tamanho[0] * tamanho[1] >= PIXELS_PROGRESSIVO
+        itens.append({
+            "cfg": cfg, "nome": cfg["tex"], "tamanho": tamanho, "reducao": 0,
+            "grupo": grupo if tamanho else None, "atlas": None,
+            "progressivo": prog, "mips": prog or _tem_mips_no_pacote(cfg["tex"]),
+        })
+
+    conhecidos = [i for i in itens if i["tamanho"]]
+    paginas = _paginas(conhecidos)
+    while e["orcamento"] is not None and _total_previsto(conhecidos, paginas) > e["orcamento"]:
+        # Reduz à metade a textura que mais ocupa (no atlas, isso reempacota o grupo)
+        candidatos = [i for i in conhecidos if min(_reduzir(i["tamanho"], i["reducao"])) > LADO_MINIMO]
+        if not candidatos: break
+        max(candidatos, key=_bytes_previstos)["reducao"] += 1
+        paginas = _paginas(conhecidos)
+    return itens, paginas
+
+def carregar():
+    # Dispara a decodificação de tudo o que foi registrado
+    e = _estado
+    itens, paginas = _planejar()
+    pool, pacote = e["pool"], e["pacote"]
+    membros = {}
+    for item in itens:
+        futuro = pool.submit(_decodificar, pacote, item["nome"], item["reducao"], item["mips"] and not item["atlas"])
+        if item["atlas"]:
+            membros.setdefault(item["atlas"], []).append((item, futuro))
+        else:
+            e["decodificando"].append({"futuro": futuro, "alvos": [item], "progressivo": item["progressivo"], "pagina": None})
+
+    for grupo, ps in paginas.items():
+        for k, pagina in enumerate(ps):
+            nesta = [(i, f) for i, f in membros[grupo] if i["nome"] in pagina["posicoes"]]
+            # Enviada depois dos membros: quando roda, todos já saíram da fila do pool
+            futuro = pool.submit(_montar_pagina, pagina, [(i["nome"], f) for i, f in nesta])
+            e["decodificando"].append({"futuro": futuro, "alvos": [i for i, _ in nesta], "progressivo": False,
+                                       "pagina": (f"atlas:{grupo}:{k}", pagina)})
+    e["registradas"] = []
+
+# --- Pool -------------------------------------------------------------------
+
+def _decodificar(pacote, nome, reducao, mips):
+    # Roda no pool: lista de níveis (arrays altura x largura x 4, de baixo para cima) ou None
+    niveis = pacote_texturas.ler_niveis(pacote, nome) if pacote else None
+    if niveis is None:
+        caminho = os.path.join(pacote_texturas.PASTA_ASSETS, nome)
+        if not os.path.exists(caminho): return None
+        img = Image.open(caminho).convert("RGBA").transpose(Image.Transpose.FLIP_TOP_BOTTOM)
+        if reducao: img = img.resize(_reduzir(img.size, reducao), resample=Image.Resampling.BOX)
+        niveis = [np.asarray(img)]
+    elif len(niveis) > reducao:
+        niveis = niveis[reducao:]   # mip-trim: os níveis menores já estão no pacote
+    else:
+        img = Image.fromarray(niveis[0])
+        niveis = [np.asarray(img.resize(_reduzir(img.size, reducao), resample=Image.Resampling.BOX))]
+
+    if not mips: return niveis[:1]
+    if len(niveis) == 1:
+        niveis = [np.asarray(n) for n in pacote_texturas.niveis_mip(Image.fromarray(niveis[0]))]
+    return niveis
+
+def _montar_pagina(pagina, membros):
+    imagens = {}
+    for nome, futuro in membros:
+        niveis = futuro.result()
+        if niveis is not None: imagens[nome] = niveis[0]
+    return [atlas.compor(pagina, imagens)], imagens
+
+# --- Thread do GL -----------------------------------------------------------------
+
+def _anotar(nome, niveis, reducao, **extra):
+    _estado["relatorio"][nome] = dict({"largura": niveis[0].shape[1], "altura": niveis[0].shape[0], "niveis": len(niveis),
+                                       "reducao": reducao, "bytes": sum(n.nbytes for n in niveis), "atlas": None}, **extra)
+
+def _preparar(trabalho):
+    alvos = trabalho["alvos"]
+    try:
+        r = trabalho["futuro"].result()
+    except Exception as ex:
+        print(f"Erro ao carregar textura {', '.join(i['nome'] for i in alvos)}: {ex}")
+        r = False
+    if not r:
+        if r is None: print(f"Erro: {alvos[0]['nome']} não encontrado.")
+        for item in alvos: item["cfg"]["id"] = None
+        return
+
+    if trabalho["pagina"]:
+        niveis, imagens = r
+        nome_pagina, pagina = trabalho["pagina"]
+        destinos = []
+        for item in alvos:
+            img = imagens.get(item["nome"])
+            if img is None:
+                print(f"Erro: {item['nome']} não encontrado.")
+                item["cfg"]["id"] = None
+                continue
+            h, w = img.shape[:2]
+            destinos.append((item["cfg"], atlas.uv(pagina, item["nome"], (w, h))))
+            _anotar(item["nome"], [img], item["reducao"], atlas=nome_pagina,
+                    bytes=(w + 2 * atlas.MARGEM) * (h + 2 * atlas.MARGEM) * 4)
+        _anotar(nome_pagina, niveis, 0, membros=[i["nome"] for i in alvos])
+    else:
+        niveis = r
+        item = alvos[0]
+        destinos = [(item["cfg"], None)]
+        _anotar(item["nome"], niveis, item["reducao"])
+
+    progressivo = trabalho["progressivo"] and len(niveis) > 1
+    tex = glGenTextures(1)
+    glBindTexture(GL_TEXTURE_2D, tex)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR_MIPMAP_LINEAR if len(niveis) > 1 else GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_BASE_LEVEL, len(niveis) - 1 if progressivo else 0)
+    glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAX_LEVEL, len(niveis) - 1)
+    # Só aloca; o conteúdo sobe em faixas nos próximos quadros
+    for i, n in enumerate(niveis):
+        glTexImage2D(GL_TEXTURE_2D, i, GL_RGBA, n.shape[1], n.shape[0], 0, GL_RGBA, GL_UNSIGNED_BYTE, None)
+
+    ordem = list(range(len(niveis)))
+    _estado["envios"].append({
+        "destinos": destinos, "tex": tex, "niveis": niveis, "progressivo": progressivo,
+        "ordem": ordem[::-1] if progressivo else ordem, "pos": 0, "linha": 0,
+    })
+
+def _publicar(envio):
+    for cfg, uv in envio["destinos"]:
+        cfg["id"], cfg["uv"] = envio["tex"], uv
+
+def _enviar_faixa(envio):
+    # Sobe até LINHAS_POR_ENVIO linhas do nível atual; devolve True quando a textura terminou
+    k = envio["ordem"][envio["pos"]]
+    dados = envio["niveis"][k]
+    altura, largura = dados.shape[:2]
+    y = envio["linha"]
+    y2 = min(altura, y + LINHAS_POR_ENVIO)
+    glBindTexture(GL_TEXTURE_2D, envio["tex"])
+    glTexSubImage2D(GL_TEXTURE_2D, k, 0, y, largura, y2 - y, GL_RGBA, GL_UNSIGNED_BYTE, dados[y:y2])
+    envio["linha"] = y2
+    if y2 < altura: return False
+
+    envio["pos"] += 1
+    envio["linha"] = 0
+    if envio["progressivo"]:
+        # Todos os níveis de k até o menor já estão completos: k vira a base visível
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_BASE_LEVEL, k)
+        _publicar(envio)
+    if envio["pos"] < len(envio["ordem"]): return False
+    _publicar(envio)
+    return True
+
+def processar(orcamento_ms=ORCAMENTO_MS):
+    # Uma vez por quadro, na thread do GL, antes de desenhar. Devolve quantas texturas faltam
+    e = _estado
+    if e is None or not (e["decodificando"] or e["envios"]): return 0
+    limite = time.perf_counter() + orcamento_ms / 1000.0
+    glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+    while time.perf_counter() < limite:
+        if not e["envios"]:
+            # Uma textura por vez: a alocação dos níveis também entra no orçamento
+            pronta = next((d for d in e["decodificando"] if d["futuro"].done()), None)
+            if pronta is None: break
+            e["decodificando"].remove(pronta)
+            _preparar(pronta)
+            continue
+        if _enviar_faixa(e["envios"][0]): e["envios"].pop(0)
+    return len(e["decodificando"]) + len(e["envios"])
+
+def pendentes():
+    return len(_estado["decodificando"]) + len(_estado["envios"]) if _estado else 0
+
+def esperar():
+    # Carrega tudo de uma vez (benchmark, ferramentas sem janela)
+    while processar(float("inf")):
+        time.sleep(0.001)
+
+def relatorio():
+    # Bytes ocupados na GPU por textura; membros de atlas apontam para a página e não
+    # entram no total (a página já conta)
+    texturas = dict(_estado["relatorio"]) if _estado else {}
+    total = sum(t["bytes"] for t in texturas.values() if not t["atlas"])
+    return {"texturas": texturas, "total_bytes": total}